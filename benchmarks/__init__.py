@@ -0,0 +1,23 @@
+"""
+Benchmarks reproducibles del API de usuarios.
+
+No es una batería de pruebas: mide tiempos para comparar el rendimiento antes y después de un cambio. Cada
+módulo se ejecuta desde la raíz del repositorio con `python -m benchmarks.<módulo>` y usa la misma base de datos
+que el API (variables PGSQL_* del archivo .env):
+
+- seed: Carga N usuarios sintéticos y reproducibles en la tabla 'users'.
+- micro: Microbenchmarks de la serialización (User.to_JSON, DateFormat.convert_date) y de UserModel.
+- load: Generador de carga que mide rendimiento y latencias de cada ruta con el cliente de pruebas de Flask o
+  contra un servidor real.
+- compare: Compara dos archivos de resultados.
+
+Los resultados se guardan como JSON en benchmarks/results/ (o en la ruta indicada con --output).
+"""
+
+import os
+import sys
+
+# Los módulos del API se importan como en src/app.py (por ejemplo `from models.UserModel import UserModel`).
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
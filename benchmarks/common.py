@@ -0,0 +1,143 @@
+"""
+Utilidades compartidas por los benchmarks: estadísticas de tiempos, datos del entorno y escritura de resultados.
+"""
+
+import datetime
+import json
+import os
+import platform
+import subprocess
+
+from database.db import get_connection
+from models.UserModel import UserCursor, select_users
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(values, p):
+    """
+    Calcula un percentil con interpolación lineal entre posiciones.
+
+    Parámetros:
+    values (list): Valores ordenados de menor a mayor.
+    p (float): Percentil entre 0 y 100.
+
+    Retorna:
+    float or None: Valor del percentil, o None si no hay valores.
+    """
+    if not values:
+        return None
+    position = p / 100 * (len(values) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(seconds):
+    """
+    Resume una lista de duraciones.
+
+    Parámetros:
+    seconds (list): Duraciones en segundos.
+
+    Retorna:
+    dict: Conteo, media, mínimo, máximo y percentiles 50, 95 y 99, en milisegundos.
+    """
+    values = sorted(seconds)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * 1000,
+        "min_ms": values[0] * 1000,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000,
+    }
+
+
+def sample_users(count, seed=42):
+    """
+    Elige una muestra reproducible de usuarios de la tabla sin leerla completa (TABLESAMPLE ... REPEATABLE).
+
+    Parámetros:
+    count (int): Número aproximado de usuarios de la muestra.
+    seed (int): Semilla de la muestra.
+
+    Retorna:
+    list: Objetos User completos.
+    """
+    with get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = 'users'::regclass")
+            estimated = max(cursor.fetchone()[0], 1)
+        # Se pide el doble del porcentaje necesario para compensar la variación del muestreo.
+        percent = min(100.0, count * 200.0 / estimated)
+        with connection.cursor(cursor_factory=UserCursor) as cursor:
+            cursor.execute(
+                select_users() + " TABLESAMPLE BERNOULLI (%s) REPEATABLE (%s) ORDER BY id LIMIT %s",
+                (percent, seed, count),
+            )
+            users = cursor.fetchall()
+    if not users:
+        raise SystemExit("La tabla users está vacía; cargue datos con python -m benchmarks.seed")
+    return users
+
+
+def environment():
+    """
+    Recoge los datos del entorno que afectan a los resultados, para poder compararlos entre ejecuciones.
+
+    Retorna:
+    dict: Versión de Python y PostgreSQL, sistema, núcleos, commit de git y número de usuarios de la tabla.
+    """
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_commit"] = None
+    try:
+        with get_connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SHOW server_version")
+            info["postgresql"] = cursor.fetchone()[0]
+            cursor.execute("SELECT count(*) FROM users")
+            info["users"] = cursor.fetchone()[0]
+    except Exception as ex:
+        info["database_error"] = str(ex)
+    return info
+
+
+def write_results(benchmark, settings, results, output=None):
+    """
+    Escribe los resultados de un benchmark como JSON.
+
+    Parámetros:
+    benchmark (str): Nombre del benchmark ("seed", "micro" o "load").
+    settings (dict): Parámetros con los que se ejecutó.
+    results (list): Resultados, uno por caso medido; cada uno con una clave "name".
+    output (str, opcional): Ruta del archivo; por defecto, benchmarks/results/<benchmark>-<fecha>.json.
+
+    Retorna:
+    str: Ruta del archivo escrito.
+    """
+    started = datetime.datetime.now(datetime.timezone.utc)
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, "%s-%s.json" % (benchmark, started.strftime("%Y%m%dT%H%M%SZ")))
+    document = {
+        "benchmark": benchmark,
+        "created_at": started.isoformat(),
+        "environment": environment(),
+        "settings": settings,
+        "results": results,
+    }
+    with open(output, "w") as file:
+        json.dump(document, file, indent=2)
+    return output
@@ -0,0 +1,86 @@
+"""
+Compara dos archivos de resultados del mismo benchmark (por ejemplo, antes y después de un cambio).
+
+Para cada caso presente en ambos archivos muestra la métrica principal y la variación en porcentaje: el tiempo por
+llamada (best_us) en micro, las solicitudes por segundo y el p99 en load, y las filas por segundo en seed.
+
+Uso:
+    python -m benchmarks.compare benchmarks/results/micro-A.json benchmarks/results/micro-B.json
+"""
+
+import argparse
+import json
+
+# Métricas que se comparan en cada benchmark: (clave, ruta dentro del resultado, True si más alto es mejor).
+METRICS = {
+    "micro": (("us", ("best_us",), False),),
+    "load": (("req/s", ("requests_per_second",), True), ("p99 ms", ("latency", "p99_ms"), False)),
+    "seed": (("filas/s", ("rows_per_second",), True),),
+}
+
+
+def _value(result, path):
+    for key in path:
+        if not isinstance(result, dict):
+            return None
+        result = result.get(key)
+    return result
+
+
+def compare(before, after):
+    """
+    Compara los resultados de dos ejecuciones.
+
+    Parámetros:
+    before (dict): Documento de resultados de referencia.
+    after (dict): Documento de resultados a comparar.
+
+    Retorna:
+    list: Tuplas (caso, métrica, valor antes, valor después, variación en % o None, True si mejoró o None).
+    """
+    if before["benchmark"] != after["benchmark"]:
+        raise ValueError(
+            "Los archivos son de benchmarks distintos: %s y %s" % (before["benchmark"], after["benchmark"])
+        )
+    previous = {result["name"]: result for result in before["results"]}
+    rows = []
+    for result in after["results"]:
+        reference = previous.get(result["name"])
+        if reference is None:
+            continue
+        for label, path, higher_is_better in METRICS.get(after["benchmark"], ()):
+            old, new = _value(reference, path), _value(result, path)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else None
+            improved = None if not change else (change > 0) == higher_is_better
+            rows.append((result["name"], label, old, new, change, improved))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dos archivos de resultados de un benchmark.")
+    parser.add_argument("before", help="Resultados de referencia.")
+    parser.add_argument("after", help="Resultados a comparar.")
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+    for name, label, old, new, change, improved in compare(before, after):
+        print(
+            "%-36s %-8s %12.2f -> %12.2f  %s%s"
+            % (
+                name,
+                label,
+                old,
+                new,
+                "%+.1f %%" % change if change is not None else "",
+                {True: "  mejor", False: "  peor", None: ""}[improved],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
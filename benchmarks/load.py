@@ -0,0 +1,263 @@
+"""
+Generador de carga para las rutas del API.
+
+Para cada ruta, `--concurrency` hilos envían solicitudes sin pausa durante `--duration` segundos. Se mide el
+rendimiento (solicitudes por segundo), los percentiles de latencia y los códigos de estado. Hay dos modos:
+
+- client: Usa el cliente de pruebas de Flask dentro del mismo proceso. Mide el costo del API (rutas, modelo,
+  serialización) sin la red ni el servidor HTTP.
+- server: Envía solicitudes HTTP reales. Sin --url levanta un servidor de Werkzeug con varios hilos en un puerto
+  libre de este proceso; con --url mide un servidor ya en marcha (por ejemplo `python src/serve.py`).
+
+Las rutas de escritura (POST, PUT y DELETE de usuarios) solo se ejecutan con --writes, porque modifican la tabla.
+
+Uso:
+    python -m benchmarks.load --mode client --duration 5
+    python -m benchmarks.load --mode server --url http://localhost:5000 --concurrency 32
+"""
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+
+import benchmarks  # noqa: F401  Agrega src/ a sys.path.
+from benchmarks.common import sample_users, summarize, write_results
+from app import create_app
+
+
+def routes(users, writes=False):
+    """
+    Construye los casos de carga. Cada caso es un nombre y una función que, dado un generador aleatorio, retorna
+    la solicitud a enviar como (método, ruta, cuerpo JSON o None).
+
+    Parámetros:
+    users (list): Muestra de usuarios existentes, para las rutas por id y las búsquedas.
+    writes (bool): Si es True, incluye las rutas que modifican la tabla.
+
+    Retorna:
+    list: Tuplas (nombre, función).
+    """
+    # Las rutas de varios ids toman hasta 100 de la muestra; se repiten ids si la tabla tiene menos usuarios.
+    ids = [user.id for user in users]
+    ids = ids * (100 // len(ids) + 1)
+    surnames = [user.primer_apellido for user in users]
+
+    def search_term(rng):
+        # Prefijo de un apellido existente, como lo escribiría alguien que busca.
+        return urllib.parse.quote(rng.choice(surnames)[:4])
+
+    def new_user(rng):
+        return {
+            "cedula_identidad": "B%d" % rng.randrange(10**12),
+            "nombre": "Carga",
+            "primer_apellido": "Benchmark",
+            "segundo_apellido": "Sintético",
+            "fecha_nacimiento": "1990-01-%02d" % rng.randrange(1, 29),
+        }
+
+    cases = [
+        ("GET /estado/", lambda rng: ("GET", "/estado/", None)),
+        ("GET /usuarios/<id>", lambda rng: ("GET", "/usuarios/" + rng.choice(ids), None)),
+        ("GET /usuarios/<id>?fields", lambda rng: ("GET", "/usuarios/%s?fields=id,nombre" % rng.choice(ids), None)),
+        ("GET /usuarios/?ids", lambda rng: ("GET", "/usuarios/?ids=" + ",".join(rng.sample(ids, 20)), None)),
+        ("POST /usuarios/lote", lambda rng: ("POST", "/usuarios/lote", {"ids": rng.sample(ids, 100)})),
+        ("GET /usuarios/?limit=100", lambda rng: ("GET", "/usuarios/?limit=100", None)),
+        ("GET /usuarios/buscar", lambda rng: ("GET", "/usuarios/buscar?q=" + search_term(rng), None)),
+        ("GET /usuarios/promedio-edad", lambda rng: ("GET", "/usuarios/promedio-edad", None)),
+        ("GET /usuarios/edades/histograma", lambda rng: ("GET", "/usuarios/edades/histograma", None)),
+        ("GET /usuarios/edades/percentiles", lambda rng: ("GET", "/usuarios/edades/percentiles", None)),
+        ("GET /usuarios/", lambda rng: ("GET", "/usuarios/", None)),
+        ("GET /usuarios/?stream=1", lambda rng: ("GET", "/usuarios/?stream=1", None)),
+    ]
+    if writes:
+        cases += [
+            ("POST /usuarios/", lambda rng: ("POST", "/usuarios/", new_user(rng))),
+            ("PUT /usuarios/<id>", lambda rng: ("PUT", "/usuarios/" + rng.choice(ids), new_user(rng))),
+            # Elimina un id inexistente: mide la escritura sin ir vaciando la tabla.
+            ("DELETE /usuarios/<id>", lambda rng: ("DELETE", "/usuarios/" + str(uuid.uuid4()), None)),
+        ]
+    return cases
+
+
+class TestClientTransport:
+    """
+    Envía las solicitudes con el cliente de pruebas de Flask; cada hilo usa su propio cliente.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        # Consume el cuerpo completo, también en las respuestas transmitidas por partes.
+        for _ in response.response:
+            pass
+        response.close()
+        return response.status_code
+
+
+class HttpTransport:
+    """
+    Envía solicitudes HTTP reales; cada hilo reutiliza su conexión mientras el servidor la mantenga abierta.
+    """
+
+    def __init__(self, url):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.prefix = parsed.path.rstrip("/")
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        headers = {"Accept-Encoding": "identity"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        for attempt in (1, 2):
+            connection = getattr(self.local, "connection", None)
+            if connection is None:
+                connection = self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                connection.request(method, self.prefix + path, body=data, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.will_close:
+                    connection.close()
+                    self.local.connection = None
+                return response.status
+            except (http.client.HTTPException, ConnectionError):
+                # El servidor cerró una conexión reutilizada; se reintenta una vez con una conexión nueva.
+                connection.close()
+                self.local.connection = None
+                if attempt == 2:
+                    raise
+
+
+def start_server(app):
+    """
+    Levanta un servidor de Werkzeug con un hilo por solicitud en un puerto libre, sin registrar cada solicitud.
+
+    Retorna:
+    tuple: (servidor, URL base).
+    """
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:%d" % server.server_port
+
+
+def run_case(name, build, transport, concurrency, duration, seed):
+    """
+    Ejecuta un caso de carga con varios hilos durante el tiempo indicado.
+
+    Retorna:
+    dict: Nombre, solicitudes, solicitudes por segundo, códigos de estado, errores y percentiles de latencia.
+    """
+    latencies = [[] for _ in range(concurrency)]
+    statuses = [{} for _ in range(concurrency)]
+    errors = [0] * concurrency
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random("%s-%s-%d" % (seed, name, index))
+        while time.perf_counter() < deadline:
+            method, path, body = build(rng)
+            started = time.perf_counter()
+            try:
+                status = transport.request(method, path, body)
+            except Exception:
+                errors[index] += 1
+                continue
+            latencies[index].append(time.perf_counter() - started)
+            statuses[index][status] = statuses[index].get(status, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies for value in values]
+    status_counts = {}
+    for counts in statuses:
+        for status, count in counts.items():
+            status_counts[str(status)] = status_counts.get(str(status), 0) + count
+    result = {
+        "name": name,
+        "requests": len(all_latencies),
+        "seconds": elapsed,
+        "requests_per_second": len(all_latencies) / elapsed if elapsed else None,
+        "statuses": status_counts,
+        "errors": sum(errors),
+        "latency": summarize(all_latencies),
+    }
+    latency = result["latency"]
+    print(
+        "%-36s %9.1f req/s  p50 %8.2f ms  p95 %8.2f ms  p99 %8.2f ms  %s"
+        % (
+            name,
+            result["requests_per_second"] or 0,
+            latency.get("p50_ms") or 0,
+            latency.get("p95_ms") or 0,
+            latency.get("p99_ms") or 0,
+            status_counts,
+        )
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide rendimiento y latencias de las rutas del API.")
+    parser.add_argument("--mode", choices=("client", "server"), default="client", help="Modo (por defecto client).")
+    parser.add_argument("--url", help="URL de un servidor ya en marcha (modo server).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Hilos concurrentes (por defecto 8).")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por ruta (por defecto 10).")
+    parser.add_argument("--routes", nargs="*", help="Subcadenas de los nombres de las rutas a medir.")
+    parser.add_argument("--writes", action="store_true", help="Incluye las rutas que modifican la tabla.")
+    parser.add_argument("--sample", type=int, default=1000, help="Usuarios de muestra (por defecto 1000).")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla (por defecto 42).")
+    parser.add_argument("--output", help="Archivo JSON de resultados.")
+    args = parser.parse_args()
+
+    app = create_app("production")
+    users = sample_users(args.sample, args.seed)
+    server = None
+    if args.mode == "client":
+        transport = TestClientTransport(app)
+    else:
+        url = args.url
+        if url is None:
+            server, url = start_server(app)
+        transport = HttpTransport(url)
+
+    results = []
+    try:
+        for name, build in routes(users, args.writes):
+            if args.routes and not any(pattern in name for pattern in args.routes):
+                continue
+            results.append(run_case(name, build, transport, args.concurrency, args.duration, args.seed))
+    finally:
+        if server is not None:
+            server.shutdown()
+    print("Resultados en %s" % write_results("load", vars(args), results, args.output))
+
+
+if __name__ == "__main__":
+    main()
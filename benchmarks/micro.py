@@ -0,0 +1,144 @@
+"""
+Microbenchmarks de la serialización de usuarios y de los métodos de UserModel.
+
+Cada caso se ejecuta `--repeat` veces; en cada repetición se llama `number` veces seguidas y se toma el tiempo por
+llamada. Se informa la mejor repetición (la menos afectada por ruido) y la mediana. Los casos de la base de datos
+usan usuarios reales de la tabla, elegidos con una semilla fija.
+
+Uso:
+    python -m benchmarks.micro
+    python -m benchmarks.micro --only serialization --repeat 7
+"""
+
+import argparse
+import datetime
+import random
+import statistics
+import time
+
+import benchmarks  # noqa: F401  Agrega src/ a sys.path.
+from benchmarks.common import sample_users, write_results
+from app import create_app
+from database.db import get_connection
+from models.UserModel import UserModel
+from models.entities.User import User
+from utils.DateFormat import DateFormat
+
+
+def measure(name, function, number, repeat):
+    """
+    Mide el tiempo por llamada de una función.
+
+    Parámetros:
+    name (str): Nombre del caso.
+    function (callable): Función sin argumentos a medir.
+    number (int): Llamadas por repetición.
+    repeat (int): Número de repeticiones.
+
+    Retorna:
+    dict: Nombre, llamadas y microsegundos por llamada (mejor repetición y mediana).
+    """
+    function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - started) / number)
+    result = {
+        "name": name,
+        "number": number,
+        "repeat": repeat,
+        "best_us": min(timings) * 1e6,
+        "median_us": statistics.median(timings) * 1e6,
+    }
+    print("%-32s %12.2f us  (mediana %.2f us)" % (name, result["best_us"], result["median_us"]))
+    return result
+
+
+def serialization_cases(app, users):
+    """
+    Casos que no usan la base de datos: formato de fechas y conversión de usuarios a JSON.
+    """
+    user = users[0]
+    date = datetime.date(1987, 6, 15)
+    batch = users[:1000]
+    row = tuple(getattr(user, field) for field in User.FIELDS)
+    encode = app.json.encoder()
+    encode_projection = app.json.encoder(("id", "nombre"))
+    return [
+        ("DateFormat.convert_date", lambda: DateFormat.convert_date(date), 100000),
+        ("User.to_JSON", lambda: user.to_JSON(), 50000),
+        ("User.to_JSON(fields)", lambda: user.to_JSON(("id", "nombre")), 50000),
+        ("User(*row)", lambda: User(*row), 100000),
+        ("encoder(User)", lambda: encode(user), 100000),
+        ("encoder(User, fields)", lambda: encode_projection(user), 100000),
+        ("dumps_users(%d)" % len(batch), lambda: app.json.dumps_users(batch), 100),
+        ("json.dumps(to_JSON) x%d" % len(batch), lambda: app.json.dumps([u.to_JSON() for u in batch]), 20),
+    ]
+
+
+def database_cases(users, seed):
+    """
+    Casos de UserModel contra la base de datos configurada.
+    """
+    rng = random.Random(seed)
+    ids = [user.id for user in users]
+    surnames = [user.primer_apellido for user in users]
+
+    def find():
+        return UserModel.find(rng.choice(ids))
+
+    def search():
+        return UserModel.search([rng.choice(surnames)[:4]], 20)
+
+    def ping():
+        with get_connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    return [
+        ("get_connection + SELECT 1", ping, 2000),
+        ("UserModel.version", UserModel.version, 2000),
+        ("UserModel.find", find, 2000),
+        ("UserModel.find_json", lambda: UserModel.find_json(rng.choice(ids)), 2000),
+        ("UserModel.find_many(100)", lambda: UserModel.find_many(rng.sample(ids, min(100, len(ids)))), 200),
+        ("UserModel.page(100)", lambda: UserModel.page(100), 500),
+        ("UserModel.search", search, 200),
+        ("UserModel.averageAge", UserModel.averageAge, 200),
+        ("UserModel.all", UserModel.all, 3),
+        ("UserModel.all_json", UserModel.all_json, 3),
+        ("UserModel.stream", lambda: sum(len(batch) for batch in UserModel.stream(1000)), 3),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de serialización y de UserModel.")
+    parser.add_argument("--only", choices=("serialization", "database"), help="Ejecuta solo un grupo de casos.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por caso (por defecto 5).")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplica el número de llamadas por repetición.")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla para elegir usuarios (por defecto 42).")
+    parser.add_argument("--output", help="Archivo JSON de resultados.")
+    args = parser.parse_args()
+
+    app = create_app("production")
+    users = sample_users(1000, args.seed)
+    cases = []
+    if args.only in (None, "serialization"):
+        cases += serialization_cases(app, users)
+    if args.only in (None, "database"):
+        cases += database_cases(users, args.seed)
+
+    results = []
+    with app.app_context():
+        for name, function, number in cases:
+            try:
+                results.append(measure(name, function, max(1, int(number * args.scale)), args.repeat))
+            except Exception as ex:
+                # Un caso que falla (por ejemplo, sin las migraciones de búsqueda) no detiene el resto.
+                print("%-32s error: %s" % (name, str(ex).splitlines()[0]))
+                results.append({"name": name, "error": str(ex)})
+    print("Resultados en %s" % write_results("micro", vars(args), results, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Carga usuarios sintéticos en la tabla 'users' de la base de datos configurada (variables PGSQL_*).
+
+Los datos son reproducibles: con la misma semilla y el mismo número de usuarios se generan exactamente las mismas
+filas (ids, cédulas, nombres con y sin acentos, apellidos y fechas de nacimiento entre 1940 y 2010). Las filas se
+envían con COPY FROM STDIN en lotes, así que cargar millones de usuarios toma segundos o pocos minutos.
+
+Uso:
+    python -m benchmarks.seed --users 100000 --truncate --migrations
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import itertools
+import os
+import random
+import subprocess
+import time
+import uuid
+
+import benchmarks
+from benchmarks.common import write_results
+from database.db import get_connection
+
+SQL_DIR = os.path.join(benchmarks.SRC_DIR, "database", "sql")
+# Migraciones del proyecto, en el orden en que las indica el README.
+MIGRATIONS = ("users_indexes.sql", "users_version.sql", "users_birth_counts.sql", "users_search.sql")
+
+NAMES = (
+    "José", "María", "Juan", "Ana", "Luis", "Carmen", "Pedro", "Lucía", "Andrés", "Sofía", "Jorge", "Valentina",
+    "Miguel", "Camila", "Carlos", "Daniela", "Raúl", "Inés", "Tomás", "Mónica", "Sebastián", "Martín", "Elena",
+    "Rocío", "Héctor", "Beatriz", "Germán", "Verónica", "Óscar", "Patricia",
+)
+SURNAMES = (
+    "Pérez", "Gómez", "Rodríguez", "Suárez", "Núñez", "Martínez", "López", "García", "Fernández", "González",
+    "Sánchez", "Ramírez", "Torres", "Flores", "Rivera", "Vargas", "Castro", "Ortiz", "Muñoz", "Rojas", "Díaz",
+    "Cabrera", "Mendoza", "Quispe", "Mamani", "Gutiérrez", "Chávez", "Ávila", "Romero", "Herrera", "Jiménez",
+    "Aguilar", "Morales", "Vásquez", "Ibáñez", "Peña",
+)
+FIRST_BIRTH = datetime.date(1940, 1, 1)
+BIRTH_DAYS = (datetime.date(2010, 12, 31) - FIRST_BIRTH).days
+
+
+def generate(count, seed=42):
+    """
+    Genera usuarios sintéticos reproducibles.
+
+    Parámetros:
+    count (int): Número de usuarios.
+    seed (int): Semilla del generador aleatorio.
+
+    Retorna:
+    generator: Tuplas (id, cedula_identidad, nombre, primer_apellido, segundo_apellido, fecha_nacimiento). Las
+    cédulas son únicas y consecutivas.
+    """
+    rng = random.Random(seed)
+    for index in range(count):
+        # El id es un UUID versión 4 derivado de la semilla, para que se repita entre ejecuciones.
+        yield (
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            str(1000000 + index),
+            # Algunos usuarios tienen dos nombres, como es habitual.
+            rng.choice(NAMES) if rng.random() < 0.7 else rng.choice(NAMES) + " " + rng.choice(NAMES),
+            rng.choice(SURNAMES),
+            # Un 5 % de los usuarios no tiene segundo apellido.
+            rng.choice(SURNAMES) if rng.random() >= 0.05 else None,
+            FIRST_BIRTH + datetime.timedelta(days=rng.randrange(BIRTH_DAYS)),
+        )
+
+
+def create_table(cursor):
+    """
+    Crea la tabla 'users' con src/database/sql/users.sql si todavía no existe.
+    """
+    cursor.execute("SELECT to_regclass('users')")
+    if cursor.fetchone()[0] is None:
+        with open(os.path.join(SQL_DIR, "users.sql")) as file:
+            cursor.execute(file.read())
+
+
+def run_migrations(psql="psql"):
+    """
+    Aplica las migraciones del proyecto con psql, igual que indica el README. Se usa psql porque los índices se
+    crean con CONCURRENTLY, que no puede ejecutarse dentro de una transacción.
+    """
+    from decouple import config
+
+    env = dict(os.environ, PGPASSWORD=config("PGSQL_PASSWORD"))
+    base = [psql, "-v", "ON_ERROR_STOP=1", "-q", "-h", config("PGSQL_HOST"), "-U", config("PGSQL_USER")]
+    base += ["-d", config("PGSQL_DATABASE")]
+    for name in MIGRATIONS:
+        subprocess.run(base + ["-f", os.path.join(SQL_DIR, name)], env=env, check=True)
+
+
+def seed(count, seed=42, batch_size=50000, truncate=False):
+    """
+    Carga `count` usuarios sintéticos en la tabla 'users'.
+
+    Parámetros:
+    count (int): Número de usuarios.
+    seed (int): Semilla del generador.
+    batch_size (int): Filas por COPY y por transacción.
+    truncate (bool): Si es True, vacía la tabla antes de cargar.
+
+    Retorna:
+    dict: Filas cargadas, segundos y filas por segundo.
+    """
+    started = time.perf_counter()
+    with get_connection() as connection, connection.cursor() as cursor:
+        create_table(cursor)
+        if truncate:
+            cursor.execute("TRUNCATE users")
+        connection.commit()
+
+        rows = generate(count, seed)
+        for start in range(0, count, batch_size):
+            buffer = io.StringIO()
+            # El módulo csv escribe None como "", así que FORCE_NULL convierte en NULL el segundo apellido vacío
+            # (el generador nunca produce cadenas vacías).
+            csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(itertools.islice(rows, batch_size))
+            buffer.seek(0)
+            cursor.copy_expert(
+                "COPY users (id, cedula_identidad, nombre, primer_apellido, segundo_apellido, fecha_nacimiento)"
+                " FROM STDIN WITH (FORMAT csv, FORCE_NULL (segundo_apellido))",
+                buffer,
+            )
+            connection.commit()
+            print("%d / %d usuarios" % (min(start + batch_size, count), count), flush=True)
+
+        # VACUUM no puede ejecutarse dentro de una transacción.
+        connection.raw.autocommit = True
+        cursor.execute("VACUUM ANALYZE users")
+        connection.raw.autocommit = False
+
+    seconds = time.perf_counter() - started
+    return {"name": "seed", "rows": count, "seconds": seconds, "rows_per_second": count / seconds if seconds else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga usuarios sintéticos reproducibles en la tabla users.")
+    parser.add_argument("--users", type=int, default=100000, help="Número de usuarios (por defecto 100000).")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla del generador (por defecto 42).")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Filas por COPY (por defecto 50000).")
+    parser.add_argument("--truncate", action="store_true", help="Vacía la tabla antes de cargar.")
+    parser.add_argument("--migrations", action="store_true", help="Aplica después las migraciones con psql.")
+    parser.add_argument("--psql", default=os.environ.get("PSQL", "psql"), help="Ejecutable de psql.")
+    parser.add_argument("--output", help="Archivo JSON de resultados.")
+    args = parser.parse_args()
+
+    result = seed(args.users, args.seed, args.batch_size, args.truncate)
+    if args.migrations:
+        run_migrations(args.psql)
+    path = write_results("seed", vars(args), [result], args.output)
+    print("%.0f usuarios por segundo; resultados en %s" % (result["rows_per_second"], path))
+
+
+if __name__ == "__main__":
+    main()
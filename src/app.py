@@ -3,9 +3,9 @@ from flask import Flask
 from config import config
 from routes import User
 from routes import System
-
-# Crea una nueva instancia de Flask.
-app = Flask(__name__)
+from database import replicas
+from utils.JSONProvider import UserJSONProvider
+from utils.Metrics import Metrics
 
 
 # Define el manejador de error para el error 404 (página no encontrada).
@@ -13,16 +13,33 @@ def page_not_found(error):
     return "<h1>Not found page</h1>", 404
 
 
-# Comprueba si este archivo se está ejecutando directamente y no está siendo importado.
-if __name__ == "__main__":
-    # Configura la aplicación con la configuración de desarrollo.
-    app.config.from_object(config["development"])
+# Define la fábrica de la aplicación: crea y configura una instancia de Flask para el entorno indicado.
+# No abre conexiones a la base de datos, por lo que puede precargarse en un proceso maestro antes de
+# bifurcar (fork) los procesos trabajadores.
+def create_app(config_name="development"):
+    # Crea una nueva instancia de Flask.
+    app = Flask(__name__)
+    # Configura la aplicación con la configuración del entorno indicado.
+    app.config.from_object(config[config_name])
+    # Usa el proveedor JSON con codificadores precompilados para los usuarios.
+    app.json = UserJSONProvider(app)
     # Registra el blueprint para las rutas de usuarios.
     app.register_blueprint(User.main, url_prefix="/usuarios")
     # Registra el blueprint para las rutas del sistema.
     app.register_blueprint(System.main, url_prefix="/estado")
     # Registra el manejador de error para el error 404.
     app.register_error_handler(404, page_not_found)
-    # Inicia la aplicación.
-    # app.run()
+    # Mide la duración y el código de estado de cada solicitud (ver /estado/metrics).
+    Metrics.init_app(app)
+    # Da a cada cliente la consistencia de leer sus propias escrituras cuando hay réplicas de lectura.
+    replicas.init_app(app)
+    return app
+
+
+# Comprueba si este archivo se está ejecutando directamente y no está siendo importado.
+if __name__ == "__main__":
+    # Crea la aplicación con la configuración de desarrollo.
+    app = create_app("development")
+    # Inicia la aplicación con el servidor de desarrollo.
+    # Para producción use `python src/serve.py` (ver README).
     app.run(host='0.0.0.0', port=5000)
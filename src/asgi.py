@@ -0,0 +1,467 @@
+"""
+Expone el API como una aplicación ASGI, para servidores asíncronos como uvicorn o hypercorn (por ejemplo,
+`uvicorn --app-dir src asgi:app`). El entorno se elige con la variable APP_ENV (por defecto "production").
+
+Las rutas de usuarios más usadas (listado, paginación, búsqueda por id y por lista de ids, promedio de edad,
+creación, actualización y eliminación) tienen aquí una variante asíncrona que consulta PostgreSQL con
+AsyncUserModel: mientras una consulta espera a la base de datos, el bucle de eventos sigue atendiendo otras
+solicitudes, así que un solo proceso mantiene muchas consultas lentas en curso sin un hilo por cada una.
+
+Cada solicitud se atiende dentro de un contexto de solicitud de la aplicación Flask de `app.create_app()`, así que
+las vistas asíncronas leen los parámetros, validan, serializan (UserJSONProvider), comprimen, miden y responden
+los errores exactamente igual que las rutas síncronas de routes/User.py, y sus respuestas son idénticas.
+
+El resto de rutas (exportación, carga masiva, búsqueda por texto, histograma, percentiles y /estado) se atienden con
+la aplicación Flask síncrona en un hilo aparte, sin bloquear el bucle de eventos.
+"""
+
+import asyncio
+import io
+import sys
+import time
+import uuid
+
+from decouple import config as env
+from flask import current_app, g, jsonify, request
+from werkzeug.exceptions import ClientDisconnected
+
+from app import create_app
+from database import replicas
+from database.aio import get_async_pool
+from models import UserMirror
+from models.AgeStatsModel import AgeStatsModel
+from models.AsyncUserModel import AsyncUserModel
+from models.entities.User import User
+from routes.User import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT, _age_variant, _as_of, _fields, _ids
+from utils.Admission import Admission
+from utils.Cursor import Cursor
+from utils.HttpCache import HttpCache
+
+flask_app = create_app(env("APP_ENV", default="production"))
+
+# Vistas asíncronas por endpoint de la aplicación Flask. Las rutas se resuelven con el mapa de URLs de Flask, así
+# que una vista asíncrona reemplaza a la síncrona del mismo endpoint (misma regla y mismos métodos).
+_views = {}
+
+
+def _view(endpoint):
+    # Registra una vista asíncrona para un endpoint del Blueprint de usuarios.
+    def decorator(function):
+        _views["user_blueprint." + endpoint] = function
+        return function
+
+    return decorator
+
+
+async def _page_users(fields=None):
+    """
+    Responde una página del listado de usuarios según los parámetros `limit` y `after`, igual que la ruta
+    síncrona.
+
+    Parámetros:
+    fields (tuple, opcional): Campos a incluir; por defecto, todos.
+
+    Retorna:
+    tuple: Respuesta JSON con la lista de usuarios y el código de estado HTTP.
+    """
+    try:
+        limit = int(request.args.get("limit", PAGE_DEFAULT_LIMIT))
+        if limit < 1 or limit > PAGE_MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return jsonify({"message": "El parámetro limit debe ser un entero entre 1 y %d" % PAGE_MAX_LIMIT}), 400
+
+    after = request.args.get("after")
+    try:
+        after = Cursor.decode(after) if after else None
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+
+    users, next_key = await AsyncUserModel.page(limit, after, fields)
+    response = current_app.json.users_response(users, fields)
+    if next_key is not None:
+        token = Cursor.encode(*next_key)
+        response.headers["X-Next-Cursor"] = token
+        response.headers["Link"] = '<%s?limit=%d&after=%s>; rel="next"' % (request.base_url, limit, token)
+    return response, 200
+
+
+@_view("all")
+@HttpCache.conditional(AsyncUserModel.version)
+async def all():
+    """
+    Recupera todos los usuarios, una página o los usuarios de una lista de ids (ver GET /usuarios/). El parámetro
+    `stream` se acepta pero no cambia la respuesta: el listado se envía completo.
+
+    Retorna:
+    list: Lista de diccionarios JSON representando usuarios.
+    """
+    try:
+        fields = _fields()
+        ids = _ids(request.args["ids"].split(",")) if "ids" in request.args else None
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+    try:
+        if ids is not None:
+            return current_app.json.users_response(await AsyncUserModel.find_many(ids, fields), fields)
+        if "limit" in request.args or "after" in request.args:
+            return await _page_users(fields)
+        return current_app.json.users_response(await AsyncUserModel.all(fields), fields)
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+@_view("promedio_edad")
+@HttpCache.conditional(AsyncUserModel.version, variant=_age_variant)
+async def promedio_edad():
+    """
+    Obtiene el promedio de edad de todos los usuarios (ver GET /usuarios/promedio-edad).
+
+    Retorna:
+    dict: Un diccionario con la clave 'promedio_edad' y el valor del promedio de edades calculado.
+    """
+    try:
+        as_of = _as_of()
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+    try:
+        return jsonify({"promedio_edad": AgeStatsModel.average(as_of, await AsyncUserModel.age_counts())})
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+@_view("find")
+@HttpCache.conditional(AsyncUserModel.version)
+async def find(id):
+    """
+    Busca un usuario por su id (ver GET /usuarios/<id>).
+
+    Parámetros:
+    id (str): id del usuario a buscar.
+
+    Retorna:
+    dict or 404: Diccionario JSON representando el usuario encontrado, o respuesta 404 si no se encontró.
+    """
+    try:
+        fields = _fields()
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+    try:
+        user = await AsyncUserModel.find(id, fields)
+        if user is not None:
+            return current_app.json.users_response(user, fields)
+        return jsonify({}), 404
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+@_view("find_many")
+async def find_many():
+    """
+    Busca varios usuarios por su id con una sola consulta (ver POST /usuarios/lote).
+
+    Retorna:
+    list: Lista de diccionarios JSON representando los usuarios encontrados, en el orden de `ids`.
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            raise ValueError("Se esperaba un objeto con la clave ids")
+        fields = _fields(body.get("fields")) if body.get("fields") is not None else _fields()
+        ids = _ids(body.get("ids"))
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+    try:
+        return current_app.json.users_response(await AsyncUserModel.find_many(ids, fields), fields)
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+def _user_from_request(id):
+    # Crea un User con los datos del cuerpo de la solicitud, igual que POST y PUT /usuarios.
+    return User(
+        id,
+        request.json["cedula_identidad"],
+        request.json["nombre"],
+        request.json["primer_apellido"],
+        request.json["segundo_apellido"],
+        request.json["fecha_nacimiento"],
+    )
+
+
+@_view("store")
+async def store():
+    """
+    Agrega un nuevo usuario (ver POST /usuarios/).
+
+    Retorna:
+    str or 404: ID del usuario agregado, o respuesta 404 si ocurrió un error en la inserción.
+    """
+    try:
+        user = _user_from_request(str(uuid.uuid4()))
+        if await AsyncUserModel.store(user) == 1:
+            return jsonify({"id": user.id})
+        return jsonify({"mesage": "Error al insertar el usuario"}), 404
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+@_view("update")
+async def update(id):
+    """
+    Actualiza un usuario existente (ver PUT /usuarios/<id>).
+
+    Parámetros:
+    id (str): id del usuario a actualizar.
+
+    Retorna:
+    str or 404: id del usuario actualizado, o respuesta 404 si el usuario no fue actualizado.
+    """
+    try:
+        user = _user_from_request(id)
+        if await AsyncUserModel.update(user) == 1:
+            return jsonify({"id": user.id})
+        return jsonify({"mesage": "Ningun usuario actualizado."}), 404
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+@_view("delete")
+async def delete(id):
+    """
+    Elimina un usuario (ver DELETE /usuarios/<id>).
+
+    Parámetros:
+    id (str): id del usuario a eliminar.
+
+    Retorna:
+    str or 404: id del usuario eliminado, o respuesta 404 si el usuario no fue eliminado.
+    """
+    try:
+        user = User(id)
+        if await AsyncUserModel.delete(user) == 1:
+            return jsonify({"id": user.id})
+        return jsonify({"mesage": "Ningun usuario eliminado."}), 404
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+class _BodyStream(io.RawIOBase):
+    """
+    Cuerpo de la solicitud como archivo de lectura para la aplicación WSGI, que lo lee por partes desde otro hilo a
+    medida que el servidor ASGI lo recibe.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._pending = b""
+        self._more = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and self._more:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message["type"] == "http.disconnect":
+                self._more = False
+                raise ClientDisconnected()
+            self._pending = message.get("body", b"")
+            self._more = message.get("more_body", False)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+async def _read_body(receive):
+    # Lee el cuerpo completo de la solicitud; las vistas asíncronas solo reciben cuerpos JSON pequeños.
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnected()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def _environ(scope):
+    # Traduce la solicitud ASGI al entorno WSGI que esperan Flask y Werkzeug. El cuerpo se agrega después.
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path) :]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": "HTTP/%s" % scope.get("http_version", "1.1"),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(),
+        # El cuerpo termina donde termina la solicitud ASGI, aunque no tenga Content-Length (chunked).
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope.get("headers", ()):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+        environ[name] = environ[name] + "," + value if name in environ else value
+    return environ
+
+
+async def _send_response(send, response):
+    # Envía una respuesta de Flask ya generada (las vistas asíncronas no transmiten por partes).
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [
+                    (name.encode("latin-1"), value.encode("latin-1")) for name, value in response.headers.to_wsgi_list()
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": response.get_data()})
+    finally:
+        response.close()
+
+
+async def _call_async(view, environ, receive, send):
+    # Atiende la solicitud con una vista asíncrona dentro del contexto de solicitud de Flask. Se ejecutan los
+    # after_request de la aplicación (métricas, compresión, cookie de réplicas y liberación del lugar de admisión)
+    # pero no los before_request, porque el control de admisión síncrono espera con candados que bloquearían el
+    # bucle de eventos; los que hacen falta se repiten aquí, con la variante asíncrona del control de admisión.
+    context = flask_app.request_context(environ)
+    context.push()
+    try:
+        g.metrics_started = time.perf_counter()
+        if replicas.TRACK_WRITES:
+            replicas.read_cookie()
+        try:
+            response = await Admission.admit_async()
+            if response is None:
+                environ["wsgi.input"] = io.BytesIO(await _read_body(receive))
+                response = flask_app.make_response(await view(**request.view_args))
+        except Exception as ex:
+            # Igual que Flask: los errores HTTP (como un cliente desconectado) tienen su respuesta y el resto es 500.
+            try:
+                response = flask_app.make_response(flask_app.handle_user_exception(ex))
+            except Exception as unhandled:
+                response = flask_app.make_response(flask_app.handle_exception(unhandled))
+        response = flask_app.process_response(response)
+    finally:
+        context.pop()
+    await _send_response(send, response)
+
+
+async def _call_wsgi(environ, receive, send):
+    # Atiende la solicitud con la aplicación Flask síncrona en un hilo. El cuerpo se lee y la respuesta se envía por
+    # partes a través del bucle de eventos; el hilo espera a que se envíe cada parte antes de generar la siguiente.
+    loop = asyncio.get_running_loop()
+    environ["wsgi.input"] = _BodyStream(receive, loop)
+
+    def deliver(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    def run():
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            start["status"] = int(status.split(" ", 1)[0])
+            start["headers"] = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+        def send_start():
+            deliver({"type": "http.response.start", "status": start["status"], "headers": start["headers"]})
+
+        result = flask_app(environ, start_response)
+        try:
+            started = False
+            for chunk in result:
+                if not started:
+                    send_start()
+                    started = True
+                if chunk:
+                    deliver({"type": "http.response.body", "body": chunk, "more_body": True})
+            if not started:
+                send_start()
+            deliver({"type": "http.response.body", "body": b""})
+        finally:
+            # Cerrar el resultado ejecuta los call_on_close (por ejemplo, cancela una exportación interrumpida).
+            if hasattr(result, "close"):
+                result.close()
+
+    await asyncio.to_thread(run)
+
+
+async def _lifespan(receive, send):
+    # Al arrancar, crea el pool asíncrono del bucle de eventos y la copia en memoria de los usuarios (si está
+    # activada); al terminar, cierra las conexiones libres del pool.
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            get_async_pool()
+            UserMirror.get_user_mirror()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            get_async_pool().closeall()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """
+    Aplicación ASGI del API.
+
+    Parámetros:
+    scope (dict): Datos de la conexión según la especificación ASGI.
+    receive (callable): Corrutina que retorna el siguiente mensaje del cliente.
+    send (callable): Corrutina que envía un mensaje al cliente.
+    """
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        # Las conexiones WebSocket no están soportadas.
+        return
+
+    environ = _environ(scope)
+    # Se busca la ruta con el mapa de URLs de Flask; las rutas sin vista asíncrona, las que no existen y los métodos
+    # no permitidos los resuelve la aplicación síncrona.
+    try:
+        rule, _ = flask_app.url_map.bind_to_environ(environ).match(return_rule=True)
+        view = _views.get(rule.endpoint)
+    except Exception:
+        view = None
+
+    if view is not None:
+        await _call_async(view, environ, receive, send)
+    else:
+        await _call_wsgi(environ, receive, send)
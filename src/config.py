@@ -15,6 +15,13 @@ class DevelopmentConfig(Config):
     DEBUG = True
 
 
+# Define una clase ProductionConfig que hereda de Config y representa la configuración específica del entorno de producción.
+class ProductionConfig(Config):
+    # En producción se desactiva el modo de depuración: no se exponen trazas y las respuestas JSON son compactas.
+    DEBUG = False
+    TESTING = False
+
+
 # Define un diccionario que mapea los nombres de los entornos a sus respectivas clases de configuración.
 # Esto permite seleccionar fácilmente la configuración correcta en función del entorno actual.
-config = {"development": DevelopmentConfig}
+config = {"development": DevelopmentConfig, "production": ProductionConfig}
@@ -0,0 +1,265 @@
+"""
+Este módulo proporciona un pool de conexiones asíncronas a PostgreSQL para el modo ASGI del API (ver src/asgi.py).
+
+Usa el modo asíncrono de psycopg2 (psycopg2.connect(async_=True)) integrado en el bucle de eventos de asyncio:
+mientras una consulta espera a la base de datos, el bucle atiende otras solicitudes en el mismo hilo, así que un
+proceso puede tener tantas consultas en curso como conexiones tenga el pool, y muchas más solicitudes esperando una
+conexión sin ocupar un hilo cada una.
+
+Limitaciones del modo asíncrono de psycopg2: cada sentencia se confirma sola (autocommit), y no admite COPY,
+cursores con nombre ni sentencias preparadas por conexión. Las lecturas y escrituras de este pool van siempre al
+primario (PGSQL_HOST), sin réplicas ni agrupamiento de escrituras.
+
+Variables de entorno opcionales:
+- PGSQL_ASYNC_POOL_MAX: Número máximo de conexiones del pool asíncrono de cada proceso (por defecto 20).
+- PGSQL_POOL_TIMEOUT y PGSQL_POOL_MAX_LIFETIME: Igual que en el pool de `database.db`.
+"""
+
+import asyncio
+import collections
+import time
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from decouple import config
+
+from database.db import PoolTimeoutError
+from utils.Metrics import Metrics
+
+
+async def wait(connection):
+    """
+    Espera, sin bloquear el bucle de eventos, a que termine la operación en curso de una conexión asíncrona
+    (la conexión inicial o una consulta).
+
+    Parámetros:
+    connection (connection): Conexión de psycopg2 abierta con async_=True.
+
+    Raises:
+    DatabaseError: El error de la operación, si falló.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            return
+        if state == extensions.POLL_READ:
+            add, remove = loop.add_reader, loop.remove_reader
+        elif state == extensions.POLL_WRITE:
+            add, remove = loop.add_writer, loop.remove_writer
+        else:
+            raise psycopg2.OperationalError("Estado inesperado de la conexión: %r" % state)
+
+        ready = loop.create_future()
+        fileno = connection.fileno()
+        # El bucle puede llamar al callback varias veces antes de que esta corrutina lo quite.
+        add(fileno, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            remove(fileno)
+
+
+class AsyncConnection:
+    """
+    Conexión asíncrona prestada por AsyncConnectionPool.
+    """
+
+    __slots__ = ("raw", "created_at")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+
+    async def execute(self, query, params=None):
+        """
+        Ejecuta una consulta y espera su resultado sin bloquear el bucle de eventos.
+
+        Parámetros:
+        query (str): Consulta con parámetros %s o %(nombre)s.
+        params (tuple or dict, opcional): Valores de los parámetros.
+
+        Retorna:
+        cursor: Cursor con el resultado ya recibido; fetchone() y fetchall() no vuelven a consultar el servidor.
+        """
+        cursor = self.raw.cursor()
+        cursor.execute(query, params)
+        await wait(self.raw)
+        return cursor
+
+
+class AsyncConnectionPool:
+    """
+    Pool de conexiones asíncronas con tamaño máximo, tiempo de espera al pedir una conexión y reciclado por tiempo
+    de vida. Pertenece al bucle de eventos en el que se crea y no es seguro entre hilos.
+    """
+
+    def __init__(self, connect_kwargs, maxconn=20, timeout=5.0, max_lifetime=1800.0):
+        """
+        Constructor de la clase AsyncConnectionPool. No abre conexiones: se abren al pedirlas.
+
+        Parámetros:
+        - connect_kwargs (dict): Argumentos para psycopg2.connect().
+        - maxconn (int): Conexiones abiertas como máximo.
+        - timeout (float): Segundos de espera por una conexión libre.
+        - max_lifetime (float): Segundos tras los cuales una conexión se recicla.
+        """
+        if maxconn < 1:
+            raise PoolError("Tamaño de pool inválido: max=%s" % maxconn)
+        self.connect_kwargs = connect_kwargs
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self._idle = collections.deque()
+        self._slots = asyncio.Semaphore(maxconn)
+        self._in_use = 0
+        self._timeouts = 0
+
+    async def _connect(self):
+        raw = psycopg2.connect(async_=True, **self.connect_kwargs)
+        try:
+            await wait(raw)
+        except BaseException:
+            raw.close()
+            raise
+        return AsyncConnection(raw)
+
+    def _expired(self, connection, now):
+        return self.max_lifetime and now - connection.created_at >= self.max_lifetime
+
+    async def getconn(self):
+        """
+        Presta una conexión del pool, esperando como máximo `timeout` segundos a que se libere una.
+
+        Retorna:
+        AsyncConnection: Conexión prestada; debe devolverse con putconn().
+
+        Raises:
+        PoolTimeoutError: Si no se libera ninguna conexión a tiempo.
+        DatabaseError: Si falla la apertura de una nueva conexión.
+        """
+        started = time.perf_counter()
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise PoolTimeoutError("No hay conexiones disponibles tras esperar %.1f segundos" % self.timeout)
+            try:
+                now = time.monotonic()
+                connection = None
+                while self._idle and connection is None:
+                    connection = self._idle.pop()
+                    if connection.raw.closed or self._expired(connection, now):
+                        connection.raw.close()
+                        connection = None
+                if connection is None:
+                    connection = await self._connect()
+            except BaseException:
+                self._slots.release()
+                raise
+            self._in_use += 1
+            return connection
+        finally:
+            Metrics.observe("api_db_connect_duration_seconds", time.perf_counter() - started)
+
+    def putconn(self, connection):
+        """
+        Devuelve una conexión al pool. Se cierra en lugar de reutilizarse si está cerrada, vencida o con una
+        consulta sin terminar (por ejemplo, si se canceló la solicitud mientras esperaba el resultado).
+
+        Parámetros:
+        connection (AsyncConnection): Conexión a devolver.
+        """
+        raw = connection.raw
+        if raw.closed or raw.isexecuting() or self._expired(connection, time.monotonic()):
+            raw.close()
+        else:
+            self._idle.append(connection)
+        self._in_use -= 1
+        self._slots.release()
+
+    def stats(self):
+        """
+        Retorna estadísticas de uso del pool.
+
+        Retorna:
+        dict: Conexiones ocupadas y libres, tamaño máximo y esperas agotadas.
+        """
+        return {"max": self.maxconn, "in_use": self._in_use, "idle": len(self._idle), "timeouts": self._timeouts}
+
+    def closeall(self):
+        """
+        Cierra las conexiones libres. Las conexiones prestadas se cierran al devolverlas si el pool ya no se usa.
+        """
+        while self._idle:
+            self._idle.pop().raw.close()
+
+
+class _Borrowed:
+    # Bloque `async with` que presta una conexión del pool y la devuelve al salir.
+
+    __slots__ = ("pool", "connection")
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.connection = None
+
+    async def __aenter__(self):
+        self.connection = await self.pool.getconn()
+        return self.connection
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.pool.putconn(self.connection)
+        return False
+
+
+_pool = None
+_pool_loop = None
+
+
+def get_async_pool():
+    """
+    Retorna el pool asíncrono del bucle de eventos en curso, creándolo la primera vez. Un bucle nuevo (por
+    ejemplo, en un proceso trabajador del servidor ASGI) crea el suyo.
+
+    Retorna:
+    AsyncConnectionPool: Pool de conexiones asíncronas del bucle actual.
+    """
+    global _pool, _pool_loop
+    loop = asyncio.get_running_loop()
+    if _pool_loop is not loop:
+        _pool = AsyncConnectionPool(
+            {
+                "host": config("PGSQL_HOST"),
+                "user": config("PGSQL_USER"),
+                "password": config("PGSQL_PASSWORD"),
+                "database": config("PGSQL_DATABASE"),
+            },
+            maxconn=config("PGSQL_ASYNC_POOL_MAX", default=20, cast=int),
+            timeout=config("PGSQL_POOL_TIMEOUT", default=5.0, cast=float),
+            max_lifetime=config("PGSQL_POOL_MAX_LIFETIME", default=1800.0, cast=float),
+        )
+        _pool_loop = loop
+    return _pool
+
+
+def get_async_connection():
+    """
+    Presta una conexión asíncrona del pool del bucle de eventos en curso.
+
+    Retorna:
+    _Borrowed: Bloque `async with` que entrega la conexión (AsyncConnection) y la devuelve al salir.
+    """
+    return _Borrowed(get_async_pool())
+
+
+def async_pool_stats():
+    """
+    Retorna las estadísticas del pool asíncrono del proceso, sin crearlo si el proceso no lo usó.
+
+    Retorna:
+    dict or None: Estadísticas del pool (ver AsyncConnectionPool.stats()), o None.
+    """
+    return _pool.stats() if _pool is not None else None
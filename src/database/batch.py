@@ -0,0 +1,255 @@
+"""
+Este módulo agrupa las escrituras concurrentes de un usuario en una sola transacción (group commit).
+
+Cada escritura confirmada por separado espera a que PostgreSQL escriba el WAL en disco, así que con muchas
+escrituras concurrentes el límite es el número de confirmaciones por segundo y no la CPU. Con el agrupamiento
+activado, las escrituras que llegan dentro de una ventana corta se ejecutan en una sola transacción con un solo
+COMMIT. Cada escritura se ejecuta dentro de su propio SAVEPOINT: si una falla (por ejemplo, por una cédula
+duplicada) se deshace solo esa y las demás del lote se confirman igual.
+
+Un lote retiene hasta su COMMIT los candados de fila que toman los triggers de cada escritura: la fila 'users' de
+table_versions (users_version.sql) y una fila de users_birth_counts por fecha de nacimiento
+(users_birth_counts.sql). Dos lotes de procesos distintos, o un lote y una escritura suelta, pueden tomar esos
+candados en orden opuesto y PostgreSQL aborta a uno de ellos por interbloqueo (deadlock). Una escritura abortada
+así no recibe el error: se deshace su SAVEPOINT y, tras el COMMIT del lote, se vuelve a ejecutar sola en su propia
+transacción, que no retiene otros candados y no puede formar el ciclo.
+
+No hay un hilo dedicado: el primer hilo que encuentra escrituras pendientes sin nadie que las ejecute actúa como
+líder, espera la ventana, ejecuta el lote y despierta a los demás, que reciben cada uno su propio resultado o su
+propio error.
+
+Variables de entorno opcionales:
+- PGSQL_WRITE_BATCHING: Si es True, store(), update() y delete() de UserModel agrupan sus escrituras (por defecto
+  False).
+- PGSQL_WRITE_BATCH_WINDOW: Segundos que el líder espera a que lleguen más escrituras antes de ejecutar el lote
+  (por defecto 0.002).
+- PGSQL_WRITE_BATCH_MAX: Número máximo de escrituras por lote; al alcanzarlo el lote se ejecuta sin esperar el
+  resto de la ventana (por defecto 100).
+"""
+
+import os
+import threading
+import time
+
+from decouple import config
+from psycopg2 import errors
+
+from database.db import get_connection
+from database.replicas import current_lsn, remember_write
+from utils.Metrics import Metrics
+
+# Errores de una escritura causados por los candados que retiene el resto del lote; sola se confirmaría.
+RETRYABLE_ERRORS = (errors.DeadlockDetected, errors.SerializationFailure)
+
+
+class _Write:
+    """
+    Escritura pendiente de un lote junto con su resultado.
+    """
+
+    __slots__ = ("query", "params", "done", "result", "error", "lsn")
+
+    def __init__(self, query, params):
+        self.query = query
+        self.params = params
+        self.done = False
+        self.result = None
+        self.error = None
+        self.lsn = None
+
+
+class WriteBatcher:
+    """
+    Agrupa escrituras concurrentes en lotes que se confirman con un solo COMMIT.
+    """
+
+    def __init__(self, window=0.002, max_ops=100):
+        """
+        Constructor de la clase WriteBatcher.
+
+        Parámetros:
+        - window (float): Segundos que se espera a que lleguen más escrituras antes de ejecutar un lote.
+        - max_ops (int): Número máximo de escrituras por lote.
+        """
+        if max_ops < 1:
+            raise ValueError("El tamaño máximo del lote debe ser al menos 1")
+        self.window = window
+        self.max_ops = max_ops
+        self._pending = []
+        self._leader = False
+        self._condition = threading.Condition()
+
+    def submit(self, query, params=()):
+        """
+        Ejecuta una escritura como parte del siguiente lote y espera a que el lote se confirme.
+
+        Parámetros:
+        query (str): Sentencia con parámetros posicionales %s; se ejecuta como sentencia preparada.
+        params (tuple): Valores de los parámetros.
+
+        Retorna:
+        int: Número de filas afectadas por esta escritura.
+
+        Raises:
+        Exception: El error de esta escritura, o el error del lote si no pudo confirmarse (en ese caso no se
+                   aplicó ninguna escritura del lote).
+        """
+        write = _Write(query, params)
+        with self._condition:
+            self._pending.append(write)
+            if len(self._pending) >= self.max_ops:
+                # Avisa al líder que espera la ventana de que el lote ya está completo.
+                self._condition.notify_all()
+
+        while True:
+            with self._condition:
+                while not write.done and self._leader:
+                    self._condition.wait()
+                if write.done:
+                    break
+                self._leader = True
+            try:
+                self._flush(self._collect())
+            finally:
+                with self._condition:
+                    self._leader = False
+                    self._condition.notify_all()
+
+        if write.error is not None:
+            raise write.error
+        # La posición del WAL se registra en el hilo de la solicitud, que es el que lee después.
+        remember_write(write.lsn)
+        return write.result
+
+    def _collect(self):
+        # Espera la ventana o hasta completar el lote, y toma las escrituras más antiguas. Si la escritura del
+        # líder no entra en este lote, el líder vuelve a esperar su turno en submit().
+        deadline = time.monotonic() + self.window
+        with self._condition:
+            while len(self._pending) < self.max_ops:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch, self._pending = self._pending[: self.max_ops], self._pending[self.max_ops :]
+        return batch
+
+    def _flush(self, batch):
+        # Ejecuta el lote en una transacción. Cada escritura tiene su propio SAVEPOINT; para ahorrar un viaje a
+        # la base de datos, el RELEASE de una escritura correcta se envía junto con el SAVEPOINT de la siguiente.
+        failed = set()
+        retry = []
+        try:
+            with get_connection() as connection, connection.cursor() as cursor:
+                savepoint = False
+                for write in batch:
+                    if savepoint:
+                        cursor.execute("RELEASE SAVEPOINT write_batch; SAVEPOINT write_batch")
+                    else:
+                        cursor.execute("SAVEPOINT write_batch")
+                    try:
+                        connection.execute_prepared(cursor, write.query, write.params)
+                        write.result = cursor.rowcount
+                        savepoint = True
+                    except Exception as ex:
+                        if connection.closed:
+                            raise
+                        cursor.execute("ROLLBACK TO SAVEPOINT write_batch; RELEASE SAVEPOINT write_batch")
+                        savepoint = False
+                        if isinstance(ex, RETRYABLE_ERRORS):
+                            retry.append(write)
+                        else:
+                            write.error = ex
+                            failed.add(write)
+                connection.commit()
+                lsn = current_lsn(connection)
+                for write in batch:
+                    write.lsn = lsn
+        except Exception as ex:
+            # Sin COMMIT no se aplicó ninguna escritura: todas reciben el error del lote.
+            retry = []
+            for write in batch:
+                if write not in failed:
+                    write.result, write.error = None, ex
+        try:
+            # Las escrituras abortadas por los candados del lote se repiten solas, ya sin el lote confirmado.
+            for write in retry:
+                try:
+                    write.result, write.lsn = _execute(write.query, write.params)
+                except Exception as ex:
+                    write.result, write.error = None, ex
+                    failed.add(write)
+        finally:
+            with self._condition:
+                for write in batch:
+                    write.done = True
+            Metrics.inc("api_db_write_batches_total")
+            Metrics.inc("api_db_write_batch_ops_total", len(batch))
+            Metrics.inc("api_db_write_batch_errors_total", len(failed))
+            Metrics.inc("api_db_write_batch_retries_total", len(retry))
+
+
+_batcher = None
+_batcher_pid = None
+_batcher_lock = threading.Lock()
+
+
+def get_write_batcher():
+    """
+    Retorna el agrupador de escrituras del proceso, o None si el agrupamiento está desactivado.
+
+    Igual que el pool de conexiones, un proceso bifurcado crea su propio agrupador en lugar de usar el del padre.
+
+    Retorna:
+    WriteBatcher or None: Agrupador de escrituras del proceso actual.
+    """
+    global _batcher, _batcher_pid
+    pid = os.getpid()
+    if _batcher_pid != pid:
+        with _batcher_lock:
+            if _batcher_pid != pid:
+                _batcher = None
+                if config("PGSQL_WRITE_BATCHING", default=False, cast=bool):
+                    _batcher = WriteBatcher(
+                        window=config("PGSQL_WRITE_BATCH_WINDOW", default=0.002, cast=float),
+                        max_ops=config("PGSQL_WRITE_BATCH_MAX", default=100, cast=int),
+                    )
+                _batcher_pid = pid
+    return _batcher
+
+
+def _execute(query, params):
+    # Ejecuta una escritura en su propia transacción y la confirma. Retorna las filas afectadas y la posición del WAL.
+    # Si la transacción pierde un interbloqueo con un lote (o con otra escritura), se repite una vez: la otra
+    # transacción ya tiene sus candados y termina.
+    for attempt in (1, 2):
+        try:
+            with get_connection() as connection, connection.cursor() as cursor:
+                connection.execute_prepared(cursor, query, params)
+                affected_rows = cursor.rowcount
+                connection.commit()
+                return affected_rows, current_lsn(connection)
+        except RETRYABLE_ERRORS:
+            if attempt == 2:
+                raise
+
+
+def execute_write(query, params=()):
+    """
+    Ejecuta una escritura y la confirma, en su propia transacción o como parte de un lote si el agrupamiento de
+    escrituras está activado.
+
+    Parámetros:
+    query (str): Sentencia con parámetros posicionales %s; se ejecuta como sentencia preparada.
+    params (tuple): Valores de los parámetros.
+
+    Retorna:
+    int: Número de filas afectadas.
+    """
+    batcher = get_write_batcher()
+    if batcher is not None:
+        return batcher.submit(query, params)
+
+    affected_rows, lsn = _execute(query, params)
+    remember_write(lsn)
+    return affected_rows
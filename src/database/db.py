@@ -1,5 +1,5 @@
 """
-Este módulo proporciona una función para establecer una conexión a una base de datos PostgreSQL utilizando psycopg2.
+Este módulo proporciona un pool de conexiones a una base de datos PostgreSQL utilizando psycopg2.
 
 Requiere la biblioteca psycopg2 y decouple para cargar las variables de entorno de configuración.
 
@@ -8,30 +8,549 @@ Las siguientes variables de entorno deben configurarse en un archivo .env o de o
 - PGSQL_USER: El nombre de usuario para autenticarse en la base de datos.
 - PGSQL_PASSWORD: La contraseña para autenticarse en la base de datos.
 - PGSQL_DATABASE: El nombre de la base de datos a la que conectarse.
+
+Variables opcionales para ajustar el pool de conexiones:
+- PGSQL_POOL_MIN: Número mínimo de conexiones abiertas que se mantienen en el pool (por defecto 1).
+- PGSQL_POOL_MAX: Número máximo de conexiones que el pool puede abrir (por defecto 10).
+- PGSQL_POOL_TIMEOUT: Segundos que se espera por una conexión libre antes de fallar (por defecto 5).
+- PGSQL_POOL_MAX_LIFETIME: Segundos de vida de una conexión antes de reciclarla (por defecto 1800).
+- PGSQL_POOL_CHECK_IDLE: Segundos de inactividad tras los cuales se verifica la conexión con un
+  "SELECT 1" antes de entregarla (por defecto 30).
+- PGSQL_PREPARED_STATEMENTS: Si es True (por defecto), las consultas frecuentes se preparan una vez por
+  conexión física (PREPARE / EXECUTE). Debe desactivarse si entre el API y PostgreSQL hay un pooler en modo
+  transacción (por ejemplo PgBouncer con pool_mode=transaction), que no conserva las sentencias preparadas.
+
+Los cursores de las conexiones del pool miden cada consulta y registran las lentas (ver utils.SlowQueryLog).
 """
 
+import hashlib
+import os
+import re
+import threading
+import time
+
 import psycopg2
-from psycopg2 import DatabaseError
+from psycopg2 import DatabaseError, errors
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, cursor as BaseCursor
+from psycopg2.pool import PoolError
 from decouple import config
 
+from utils.Metrics import Metrics
+from utils.SlowQueryLog import SlowQueryLog
+
+
+class PoolTimeoutError(PoolError):
+    """
+    Se lanza cuando no hay ninguna conexión libre en el pool dentro del tiempo de espera configurado.
+    """
+
+
+class ProfiledCursor(BaseCursor):
+    """
+    Cursor de psycopg2 que mide cada consulta y registra en SlowQueryLog las que superan SLOW_QUERY_THRESHOLD_MS,
+    con sus parámetros y su duración. Es el cursor por defecto de las conexiones del pool.
+    """
+
+    def execute(self, query, vars=None, statement=None):
+        """
+        Ejecuta una consulta igual que el cursor de psycopg2.
+
+        Parámetros:
+        query (str): Consulta a ejecutar.
+        vars (tuple or dict, opcional): Valores de los parámetros.
+        statement (str, opcional): Texto que se registra en lugar de `query`; execute_prepared() indica la consulta
+                                   original en lugar del EXECUTE de la sentencia preparada.
+        """
+        threshold = SlowQueryLog.THRESHOLD
+        if not threshold:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        error = None
+        try:
+            return super().execute(query, vars)
+        except Exception as ex:
+            error = "%s: %s" % (type(ex).__name__, str(ex).strip())
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            if seconds >= threshold:
+                SlowQueryLog.record(statement or query, vars, seconds, error)
+
+
+class _PoolEntry:
+    """
+    Conexión física administrada por el pool junto con los datos necesarios para reciclarla.
+    """
+
+    __slots__ = ("connection", "created_at", "last_used", "prepared", "broken")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        # Nombres de las sentencias preparadas en esta conexión física. Una conexión nueva (por reciclado o
+        # reconexión) empieza vacía y vuelve a preparar cada sentencia la primera vez que la usa.
+        self.prepared = set()
+        # Se marca cuando la sesión perdió su estado (por ejemplo, con DISCARD ALL); el pool la cierra al devolverla.
+        self.broken = False
+
+
+# Sentencias preparadas ya traducidas, por texto de consulta. Dos hilos pueden traducir la misma consulta a la vez;
+# ambos obtienen el mismo resultado, así que no hace falta un candado.
+_statements = {}
+
+
+def _statement(query):
+    """
+    Traduce una consulta con parámetros de psycopg2 (%s) a una sentencia preparada.
+
+    Parámetros:
+    query (str): Consulta con parámetros posicionales %s.
+
+    Retorna:
+    tuple: (nombre, texto del PREPARE, número de parámetros). El nombre se deriva del texto de la consulta, así
+    que es el mismo en todas las conexiones.
+    """
+    statement = _statements.get(query)
+    if statement is None:
+        name = "stmt_" + hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+        count = 0
+
+        def placeholder(match):
+            nonlocal count
+            if match.group(0) == "%%":
+                return "%"
+            count += 1
+            return "$%d" % count
+
+        body = re.sub(r"%%|%s", placeholder, query)
+        statement = _statements[query] = (name, "PREPARE %s AS %s" % (name, body), count)
+    return statement
+
+
+class PooledConnection:
+    """
+    Envoltorio de una conexión prestada por el pool.
+
+    Delega todos los atributos en la conexión de psycopg2. Al llamar a close() (o al salir de un bloque
+    `with`) la conexión se devuelve al pool en lugar de cerrarse.
+    """
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        entry = self.__dict__.get("_entry")
+        if entry is None:
+            raise PoolError("La conexión ya fue devuelta al pool")
+        return getattr(entry.connection, name)
+
+    @property
+    def raw(self):
+        """
+        Retorna la conexión física de psycopg2.
+        """
+        if self._entry is None:
+            raise PoolError("La conexión ya fue devuelta al pool")
+        return self._entry.connection
+
+    def close(self, discard=False):
+        """
+        Devuelve la conexión al pool.
+
+        Parámetros:
+        discard (bool): Si es True la conexión física se cierra en lugar de reutilizarse.
+        """
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool.putconn(entry, discard=discard)
+
+    def execute_prepared(self, cursor, query, params=()):
+        """
+        Ejecuta una consulta como sentencia preparada en esta conexión física, preparándola la primera vez.
+
+        PostgreSQL analiza y planifica la consulta una sola vez por conexión en lugar de en cada ejecución. Si
+        el pool tiene las sentencias preparadas desactivadas, la consulta se ejecuta normalmente. Si la sentencia
+        ya no existe en el servidor y la consulta abría su propia transacción, se vuelve a preparar y se repite.
+
+        Parámetros:
+        cursor (cursor): Cursor de esta conexión con el que se ejecuta la consulta.
+        query (str): Consulta con parámetros posicionales %s.
+        params (tuple): Valores de los parámetros.
+        """
+        entry = self._entry
+        if entry is None:
+            raise PoolError("La conexión ya fue devuelta al pool")
+        if not self._pool.prepare:
+            cursor.execute(query, params)
+            return
+
+        name, prepare, count = _statement(query)
+        connection = entry.connection
+        # Si la consulta abre su propia transacción, un fallo no deshace nada del llamador y se puede repetir.
+        fresh = connection.info.transaction_status == TRANSACTION_STATUS_IDLE
+        execute = "EXECUTE " + name + ("(" + ", ".join(["%s"] * count) + ")" if count else "")
+        for attempt in (1, 2):
+            if name not in entry.prepared:
+                # Las sentencias preparadas pertenecen a la sesión: se conservan aunque la transacción se deshaga.
+                cursor.execute(prepare)
+                entry.prepared.add(name)
+                self._pool._count("statements_prepared")
+            try:
+                if isinstance(cursor, ProfiledCursor):
+                    cursor.execute(execute, params, statement=query)
+                else:
+                    cursor.execute(execute, params)
+                return
+            except errors.InvalidSqlStatementName:
+                # Alguien borró la sentencia en el servidor (DEALLOCATE, o DISCARD ALL de un pooler externo).
+                entry.prepared.discard(name)
+                if not fresh or attempt == 2:
+                    # La transacción del llamador ya está abortada y no se puede consultar qué más se perdió: la
+                    # conexión se descarta al devolverla y el error llega al llamador.
+                    entry.broken = True
+                    raise
+                connection.rollback()
+                self._reconcile(cursor)
+
+    def _reconcile(self, cursor):
+        # Deja en entry.prepared solo las sentencias que siguen preparadas en el servidor. Si no queda ninguna de
+        # las que había, la sesión se reinició (DISCARD ALL también borra la configuración de la sesión), así que
+        # la conexión se sigue usando en esta petición pero el pool la cierra al devolverla.
+        entry = self._entry
+        cursor.execute("SELECT name FROM pg_prepared_statements")
+        names = {row[0] for row in cursor.fetchall()}
+        connection = entry.connection
+        if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        if entry.prepared and not entry.prepared & names:
+            entry.broken = True
+        entry.prepared &= names
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Si ocurrió un error la conexión puede haber quedado en un estado dudoso, por lo que
+        # se descarta si ya está cerrada; la transacción pendiente se deshace al devolverla.
+        discard = exc_type is not None and self._entry is not None and self._entry.connection.closed
+        self.close(discard=discard)
+        return False
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones seguro entre hilos con tamaño mínimo y máximo, tiempo de espera al pedir
+    una conexión, verificación de la conexión al prestarla y reciclado por tiempo de vida.
+    """
+
+    def __init__(
+        self, connect_kwargs, minconn=1, maxconn=10, timeout=5.0, max_lifetime=1800.0, check_idle=30.0, prepare=True
+    ):
+        """
+        Constructor de la clase ConnectionPool.
+
+        Parámetros:
+        - connect_kwargs (dict): Argumentos para psycopg2.connect().
+        - minconn (int): Conexiones que se mantienen abiertas como mínimo.
+        - maxconn (int): Conexiones abiertas como máximo.
+        - timeout (float): Segundos de espera por una conexión libre.
+        - max_lifetime (float): Segundos tras los cuales una conexión se recicla.
+        - check_idle (float): Segundos de inactividad tras los cuales se verifica la conexión.
+        - prepare (bool): Si es True, execute_prepared() usa sentencias preparadas.
+        """
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise PoolError("Tamaño de pool inválido: min=%s max=%s" % (minconn, maxconn))
+
+        self.connect_kwargs = connect_kwargs
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+        self.prepare = prepare
+
+        self._idle = []
+        self._in_use = 0
+        self._opening = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+            "failed_checks": 0,
+            "wait_seconds": 0.0,
+            "statements_prepared": 0,
+        }
+
+        for _ in range(minconn):
+            self._idle.append(self._connect())
+
+    def _connect(self):
+        entry = _PoolEntry(psycopg2.connect(cursor_factory=ProfiledCursor, **self.connect_kwargs))
+        with self._condition:
+            self._stats["connections_opened"] += 1
+        return entry
+
+    def _count(self, name):
+        with self._condition:
+            self._stats[name] += 1
+
+    def _discard(self, entry):
+        try:
+            if not entry.connection.closed:
+                entry.connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._stats["connections_closed"] += 1
+
+    def _expired(self, entry, now):
+        return self.max_lifetime and now - entry.created_at >= self.max_lifetime
+
+    def _is_alive(self, entry, now):
+        connection = entry.connection
+        if connection.closed:
+            return False
+        if now - entry.last_used < self.check_idle:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        """
+        Presta una conexión del pool, esperando como máximo `timeout` segundos.
+
+        Retorna:
+        PooledConnection: Conexión prestada; debe devolverse con close() o un bloque `with`.
+
+        Raises:
+        PoolTimeoutError: Si no se libera ninguna conexión a tiempo.
+        DatabaseError: Si falla la apertura de una nueva conexión.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            entry = None
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise PoolError("El pool de conexiones está cerrado")
+                    if self._idle:
+                        entry = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._in_use + self._opening + len(self._idle) < self.maxconn:
+                        self._opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            "No hay conexiones disponibles tras esperar %.1f segundos" % self.timeout
+                        )
+                    self._condition.wait(remaining)
+
+            if entry is None:
+                # Abre la conexión fuera del candado para no bloquear al resto de hilos.
+                try:
+                    entry = self._connect()
+                except Exception:
+                    with self._condition:
+                        self._opening -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._opening -= 1
+                    self._in_use += 1
+            else:
+                # Recicla las conexiones vencidas y descarta las que no respondan antes de prestarlas.
+                now = time.monotonic()
+                expired = self._expired(entry, now)
+                if expired or not self._is_alive(entry, now):
+                    self._discard(entry)
+                    with self._condition:
+                        if not expired:
+                            self._stats["failed_checks"] += 1
+                        self._in_use -= 1
+                        self._condition.notify()
+                    continue
+
+            with self._condition:
+                self._stats["checkouts"] += 1
+                self._stats["wait_seconds"] += time.monotonic() - started
+            return PooledConnection(self, entry)
+
+    def putconn(self, entry, discard=False):
+        """
+        Devuelve una conexión al pool.
+
+        Parámetros:
+        entry (_PoolEntry): Conexión física a devolver.
+        discard (bool): Si es True la conexión se cierra en lugar de reutilizarse.
+        """
+        connection = entry.connection
+        if not discard and not connection.closed:
+            try:
+                # Deshace cualquier transacción que haya quedado abierta para entregar la conexión limpia.
+                if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except Exception:
+                discard = True
+        if connection.closed or entry.broken or self._expired(entry, time.monotonic()):
+            discard = True
+
+        with self._condition:
+            self._in_use -= 1
+            if not discard and not self._closed:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+                entry = None
+            self._condition.notify()
+
+        if entry is not None:
+            self._discard(entry)
+
+    def stats(self):
+        """
+        Retorna estadísticas de uso del pool.
+
+        Retorna:
+        dict: Diccionario con el tamaño del pool, las conexiones ocupadas y libres y los contadores acumulados.
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update(
+                {
+                    "min": self.minconn,
+                    "max": self.maxconn,
+                    "size": self._in_use + len(self._idle),
+                    "in_use": self._in_use,
+                    "idle": len(self._idle),
+                }
+            )
+        return stats
+
+    def discard_idle(self):
+        """
+        Cierra las conexiones libres sin cerrar el pool; las siguientes se abren de nuevo al pedirlas. Sirve para no
+        prestar conexiones a un servidor que dejó de responder.
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+    def closeall(self):
+        """
+        Cierra todas las conexiones libres e impide nuevos préstamos. Las conexiones prestadas se
+        cierran cuando se devuelven.
+        """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+# Pools heredados de un proceso padre tras un fork. Se conservan sin cerrarlos: sus sockets pertenecen al
+# padre, y cerrarlos (o dejar que el recolector lo haga) terminaría las sesiones del padre.
+_inherited_pools = []
+
+
+def _create_pool(minconn=None, **connect_kwargs):
+    # Crea un pool con la configuración de las variables de entorno. `minconn` reemplaza PGSQL_POOL_MIN y
+    # `connect_kwargs` reemplaza algunos argumentos de conexión (por ejemplo, el host y el puerto de una réplica).
+    return ConnectionPool(
+        dict(
+            {
+                "host": config("PGSQL_HOST"),
+                "user": config("PGSQL_USER"),
+                "password": config("PGSQL_PASSWORD"),
+                "database": config("PGSQL_DATABASE"),
+            },
+            **connect_kwargs
+        ),
+        minconn=config("PGSQL_POOL_MIN", default=1, cast=int) if minconn is None else minconn,
+        maxconn=config("PGSQL_POOL_MAX", default=10, cast=int),
+        timeout=config("PGSQL_POOL_TIMEOUT", default=5.0, cast=float),
+        max_lifetime=config("PGSQL_POOL_MAX_LIFETIME", default=1800.0, cast=float),
+        check_idle=config("PGSQL_POOL_CHECK_IDLE", default=30.0, cast=float),
+        prepare=config("PGSQL_PREPARED_STATEMENTS", default=True, cast=bool),
+    )
+
+
+def get_pool():
+    """
+    Retorna el pool de conexiones del proceso, creándolo la primera vez que se necesita.
+
+    Si el proceso fue bifurcado (fork) después de crear el pool, se crea uno nuevo para no
+    compartir sockets con el proceso padre.
+
+    Retorna:
+    ConnectionPool: Pool de conexiones del proceso actual.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                if _pool is not None:
+                    _inherited_pools.append(_pool)
+                _pool = _create_pool()
+                _pool_pid = pid
+    return _pool
+
+
+def after_fork():
+    """
+    Prepara los recursos de base de datos en un proceso trabajador recién bifurcado: abandona el pool heredado
+    del proceso padre y abre el pool propio del proceso con sus conexiones mínimas.
+    """
+    get_pool()
+
+
+def pool_stats():
+    """
+    Retorna las estadísticas del pool de conexiones del proceso actual.
+
+    Retorna:
+    dict: Estadísticas del pool (ver ConnectionPool.stats()).
+    """
+    return get_pool().stats()
+
 
 def get_connection():
     """
-    Establece una conexión a la base de datos PostgreSQL utilizando los valores de configuración
-    proporcionados en las variables de entorno.
+    Presta una conexión del pool a la base de datos PostgreSQL configurada en las variables de entorno.
+
+    La conexión se devuelve al pool llamando a close() o al salir de un bloque `with`.
 
     Returns:
-        psycopg2.extensions.connection: Objeto de conexión a la base de datos.
+        PooledConnection: Conexión prestada por el pool.
 
     Raises:
         DatabaseError: Si ocurre algún error al establecer la conexión.
+        PoolTimeoutError: Si no hay conexiones libres dentro del tiempo de espera.
     """
+    started = time.perf_counter()
     try:
-        return psycopg2.connect(
-            host=config("PGSQL_HOST"),
-            user=config("PGSQL_USER"),
-            password=config("PGSQL_PASSWORD"),
-            database=config("PGSQL_DATABASE"),
-        )
+        return get_pool().getconn()
     except DatabaseError as ex:
         raise ex
+    finally:
+        Metrics.observe("api_db_connect_duration_seconds", time.perf_counter() - started)
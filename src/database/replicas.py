@@ -0,0 +1,295 @@
+"""
+Este módulo reparte las lecturas entre réplicas de PostgreSQL (replicación en streaming) y deja las escrituras en
+el servidor primario (PGSQL_HOST).
+
+Un hilo de fondo compara cada PGSQL_REPLICA_CHECK_INTERVAL segundos la posición del WAL del primario
+(pg_current_wal_lsn()) con la posición reproducida por cada réplica (pg_last_wal_replay_lsn()). Las lecturas se
+reparten en turnos entre las réplicas disponibles cuyo retraso no supera PGSQL_REPLICA_MAX_LAG bytes; si no hay
+ninguna, van al primario.
+
+Para que un cliente lea sus propias escrituras, después de cada escritura se guarda la posición del WAL del
+primario en una variable de contexto y en la cookie `pg_lsn` de la respuesta. Las lecturas siguientes de ese
+cliente (y las del resto de la misma solicitud) solo van a réplicas que ya reprodujeron esa posición. Con la copia
+en memoria de los usuarios (USERS_MIRROR) también se registra esa posición, aunque no haya réplicas, para que quien
+escribe no lea de una copia que todavía no tiene su escritura (ver models.UserMirror).
+
+Variables de entorno opcionales:
+- PGSQL_REPLICAS: Réplicas separadas por comas, cada una como host o host:puerto (el host puede ser el directorio
+  del socket). Usan el mismo usuario, contraseña y base de datos que el primario. Sin réplicas, todas las
+  consultas van al primario y este módulo no hace nada (salvo registrar las escrituras para USERS_MIRROR).
+- PGSQL_REPLICA_MAX_LAG: Retraso máximo en bytes de WAL para leer de una réplica (por defecto 1048576).
+- PGSQL_REPLICA_CHECK_INTERVAL: Segundos entre mediciones del retraso (por defecto 1).
+- PGSQL_READ_YOUR_WRITES_SECONDS: Segundos de vida de la cookie `pg_lsn` (por defecto 60).
+"""
+
+import contextvars
+import itertools
+import os
+import threading
+import time
+
+from decouple import Csv, config
+from flask import request
+from psycopg2 import DatabaseError
+from psycopg2.pool import PoolError
+
+from database.db import PoolTimeoutError, _create_pool, get_connection
+from utils.Metrics import Metrics
+
+REPLICAS = config("PGSQL_REPLICAS", default="", cast=Csv())
+MAX_LAG = config("PGSQL_REPLICA_MAX_LAG", default=1048576, cast=int)
+CHECK_INTERVAL = config("PGSQL_REPLICA_CHECK_INTERVAL", default=1.0, cast=float)
+READ_YOUR_WRITES_SECONDS = config("PGSQL_READ_YOUR_WRITES_SECONDS", default=60, cast=int)
+COOKIE = "pg_lsn"
+# Si se registra la posición del WAL de cada escritura: con réplicas o con la copia en memoria de los usuarios.
+TRACK_WRITES = any(address.strip() for address in REPLICAS) or config("USERS_MIRROR", default=False, cast=bool)
+
+# Posición mínima del WAL que debe haber reproducido una réplica para atender las lecturas del contexto actual, y
+# posición de la última escritura hecha en el contexto actual (para la cookie de la respuesta).
+_read_after = contextvars.ContextVar("read_after_lsn", default=None)
+_written = contextvars.ContextVar("written_lsn", default=None)
+
+
+def parse_lsn(text):
+    """
+    Convierte una posición del WAL en formato de PostgreSQL ("16/B374D848") en un entero.
+
+    Retorna:
+    int or None: Posición en bytes, o None si el texto no es una posición válida.
+    """
+    high, separator, low = (text or "").partition("/")
+    try:
+        if not separator or len(high) > 8 or len(low) > 8:
+            return None
+        return (int(high, 16) << 32) + int(low, 16)
+    except ValueError:
+        return None
+
+
+def format_lsn(lsn):
+    """
+    Convierte una posición del WAL en bytes al formato de PostgreSQL.
+    """
+    return "%X/%X" % (lsn >> 32, lsn & 0xFFFFFFFF)
+
+
+class Replica:
+    """
+    Réplica de lectura con su pool de conexiones y el resultado de la última medición de su retraso.
+    """
+
+    __slots__ = ("name", "pool", "replay_lsn", "lag", "healthy", "error")
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.replay_lsn = 0
+        self.lag = None
+        # Hasta la primera medición la réplica no recibe lecturas.
+        self.healthy = False
+        self.error = None
+
+
+def _connect_kwargs(address):
+    # "host:puerto" o solo "host"; el host puede ser un directorio de socket, que no lleva ":".
+    # Se limita la espera al conectar, para que una réplica caída no retenga las solicitudes.
+    host, separator, port = address.strip().rpartition(":")
+    if separator and port.isdigit():
+        return {"host": host, "port": int(port), "connect_timeout": 2}
+    return {"host": address.strip(), "connect_timeout": 2}
+
+
+_replicas = None
+_replicas_pid = None
+_replicas_lock = threading.Lock()
+_turn = itertools.count()
+
+
+def get_replicas():
+    """
+    Retorna las réplicas del proceso, creando sus pools y el hilo que mide su retraso la primera vez. Igual que el
+    pool del primario, un proceso bifurcado crea los suyos.
+
+    Retorna:
+    list: Objetos Replica; vacía si no hay réplicas configuradas.
+    """
+    global _replicas, _replicas_pid
+    pid = os.getpid()
+    if _replicas_pid != pid:
+        with _replicas_lock:
+            if _replicas_pid != pid:
+                # Los pools de las réplicas empiezan vacíos, para que una réplica caída no impida arrancar.
+                replicas = [
+                    Replica(address.strip(), _create_pool(minconn=0, **_connect_kwargs(address)))
+                    for address in REPLICAS
+                    if address.strip()
+                ]
+                if replicas:
+                    check(replicas)
+                    threading.Thread(target=_monitor, args=(replicas,), name="replica-lag", daemon=True).start()
+                _replicas, _replicas_pid = replicas, pid
+    return _replicas
+
+
+def check(replicas):
+    """
+    Mide el retraso de cada réplica respecto del primario y marca como disponibles las que no superan MAX_LAG.
+
+    Parámetros:
+    replicas (list): Objetos Replica a medir.
+    """
+    try:
+        with get_connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT pg_current_wal_lsn()::text")
+            primary = parse_lsn(cursor.fetchone()[0])
+    except Exception as ex:
+        # Sin la posición del primario no se puede medir el retraso: se conserva la medición anterior.
+        for replica in replicas:
+            replica.error = "primario: %s" % str(ex).strip()
+        return
+
+    for replica in replicas:
+        try:
+            with replica.pool.getconn() as connection, connection.cursor() as cursor:
+                cursor.execute("SELECT pg_last_wal_replay_lsn()::text")
+                replay = parse_lsn(cursor.fetchone()[0])
+            if replay is None:
+                raise DatabaseError("El servidor no es una réplica en recuperación")
+            replica.replay_lsn = replay
+            replica.lag = max(0, primary - replay)
+            replica.healthy = replica.lag <= MAX_LAG
+            replica.error = None
+        except Exception as ex:
+            replica.healthy = False
+            replica.error = str(ex).strip()
+            # Las conexiones libres a una réplica que no responde probablemente estén rotas.
+            replica.pool.discard_idle()
+
+
+def _monitor(replicas):
+    while True:
+        time.sleep(CHECK_INTERVAL)
+        check(replicas)
+
+
+def get_read_connection():
+    """
+    Presta una conexión para una consulta de solo lectura: de una réplica disponible que ya reprodujo las
+    escrituras del cliente, o del primario si no hay ninguna.
+
+    Retorna:
+    PooledConnection: Conexión prestada; debe devolverse con close() o un bloque `with`.
+    """
+    replicas = get_replicas()
+    if not replicas:
+        return get_connection()
+
+    required = _read_after.get()
+    candidates = [
+        replica for replica in replicas if replica.healthy and (required is None or replica.replay_lsn >= required)
+    ]
+    if candidates:
+        replica = candidates[next(_turn) % len(candidates)]
+        started = time.perf_counter()
+        try:
+            connection = replica.pool.getconn()
+            Metrics.inc("api_db_reads_total", target="replica")
+            return connection
+        except PoolTimeoutError:
+            # La réplica está ocupada, no caída: la lectura va al primario.
+            pass
+        except (DatabaseError, PoolError) as ex:
+            # La réplica no acepta conexiones: deja de recibir lecturas hasta la próxima medición.
+            replica.healthy = False
+            replica.error = str(ex).strip()
+            replica.pool.discard_idle()
+        finally:
+            Metrics.observe("api_db_connect_duration_seconds", time.perf_counter() - started)
+
+    Metrics.inc("api_db_reads_total", target="primary")
+    return get_connection()
+
+
+def current_lsn(connection):
+    """
+    Retorna la posición actual del WAL del primario, después de confirmar una escritura con `connection`. No hace
+    ninguna consulta si no se registran las escrituras (ver TRACK_WRITES).
+
+    La escritura ya está confirmada, así que un error aquí no se propaga: sin la posición, las lecturas siguientes
+    pueden ir a una réplica que todavía no tiene la escritura.
+
+    Retorna:
+    int or None: Posición del WAL, o None si no se registran las escrituras o si no pudo leerse.
+    """
+    if not TRACK_WRITES:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_current_wal_lsn()::text")
+            return parse_lsn(cursor.fetchone()[0])
+    except Exception:
+        return None
+
+
+def remember_write(lsn):
+    """
+    Registra en el contexto actual una escritura confirmada en la posición `lsn` del WAL: las lecturas siguientes
+    del contexto y del cliente (por la cookie) solo irán a réplicas que ya la reprodujeron.
+    """
+    if lsn is None:
+        return
+    for variable in (_read_after, _written):
+        current = variable.get()
+        if current is None or lsn > current:
+            variable.set(lsn)
+
+
+def read_after():
+    """
+    Retorna la posición del WAL que deben tener las lecturas del contexto actual para incluir las escrituras del
+    cliente, o None si el cliente no escribió recientemente.
+    """
+    return _read_after.get()
+
+
+def read_cookie():
+    """
+    Inicia el estado de la solicitud en curso a partir de la cookie `pg_lsn`. Las variables de contexto se
+    reinician en cada solicitud, porque un hilo (o una tarea del bucle de eventos) puede atender varias.
+    """
+    _read_after.set(parse_lsn(request.cookies.get(COOKIE)))
+    _written.set(None)
+
+
+def status():
+    """
+    Retorna el estado de las réplicas del proceso, sin crearlas si el proceso todavía no las usó.
+
+    Retorna:
+    list: Diccionarios con el nombre, si recibe lecturas, el retraso en bytes y el último error de cada réplica.
+    """
+    replicas = _replicas if _replicas_pid == os.getpid() else []
+    return [
+        {"name": replica.name, "healthy": replica.healthy, "lag_bytes": replica.lag, "error": replica.error}
+        for replica in replicas
+    ]
+
+
+def init_app(app):
+    """
+    Registra en la aplicación la lectura y escritura de la cookie `pg_lsn` que da a cada cliente la consistencia
+    de leer sus propias escrituras. Si no se registran las escrituras (ver TRACK_WRITES) no registra nada.
+    """
+    if not TRACK_WRITES:
+        return
+
+    app.before_request(read_cookie)
+
+    @app.after_request
+    def write_cookie(response):
+        lsn = _written.get()
+        if lsn is not None:
+            response.set_cookie(
+                COOKIE, format_lsn(lsn), max_age=READ_YOUR_WRITES_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
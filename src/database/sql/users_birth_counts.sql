@@ -0,0 +1,71 @@
+/*
+Almacén agregado de fechas de nacimiento para las estadísticas de edad del API.
+
+- users_birth_counts: Número de usuarios por fecha de nacimiento. Tiene una fila por fecha distinta, así que su
+  tamaño no depende del número de usuarios (a lo sumo unas decenas de miles de filas).
+- users_birth_counts_apply(): Ajusta los contadores fila a fila en cada INSERT, UPDATE de fecha_nacimiento o DELETE
+  sobre 'users', incluyendo las cargas masivas con COPY.
+- users_birth_counts_truncate(): Vacía el almacén cuando se vacía 'users'.
+
+Las estadísticas (promedio, histograma y percentiles de edad) se calculan en el API a partir de este almacén en
+O(fechas distintas), en lugar de recorrer toda la tabla 'users' en cada solicitud.
+
+Los usuarios sin fecha de nacimiento no se cuentan, igual que AVG() ignora los valores NULL.
+
+Instrucción SQL:
+*/
+
+CREATE TABLE IF NOT EXISTS users_birth_counts (
+    fecha_nacimiento DATE PRIMARY KEY,
+    total BIGINT NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION users_birth_counts_apply() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.fecha_nacimiento IS NOT DISTINCT FROM NEW.fecha_nacimiento THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.fecha_nacimiento IS NOT NULL THEN
+        UPDATE users_birth_counts SET total = total - 1 WHERE fecha_nacimiento = OLD.fecha_nacimiento;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.fecha_nacimiento IS NOT NULL THEN
+        INSERT INTO users_birth_counts (fecha_nacimiento, total) VALUES (NEW.fecha_nacimiento, 1)
+        ON CONFLICT (fecha_nacimiento) DO UPDATE SET total = users_birth_counts.total + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION users_birth_counts_truncate() RETURNS TRIGGER AS $$
+BEGIN
+    TRUNCATE users_birth_counts;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+BEGIN;
+
+-- Bloquea las escrituras sobre 'users' mientras se instalan los triggers y se reconstruye el almacén,
+-- para que ningún cambio quede fuera del conteo.
+LOCK TABLE users IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS users_birth_counts_apply ON users;
+DROP TRIGGER IF EXISTS users_birth_counts_truncate ON users;
+
+CREATE TRIGGER users_birth_counts_apply
+    AFTER INSERT OR UPDATE OF fecha_nacimiento OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION users_birth_counts_apply();
+
+CREATE TRIGGER users_birth_counts_truncate
+    AFTER TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION users_birth_counts_truncate();
+
+TRUNCATE users_birth_counts;
+
+INSERT INTO users_birth_counts (fecha_nacimiento, total)
+SELECT fecha_nacimiento, COUNT(*) FROM users WHERE fecha_nacimiento IS NOT NULL GROUP BY fecha_nacimiento;
+
+COMMIT;
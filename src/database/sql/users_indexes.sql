@@ -0,0 +1,15 @@
+/*
+Índices de soporte para la tabla 'users'.
+
+- users_cedula_id_idx: Índice compuesto sobre (cedula_identidad, id) que respalda la paginación por clave
+  (keyset) de GET /usuarios?limit=&after=. Cada página se obtiene con un predicado
+  "(cedula_identidad, id) > (última cédula, último id)" que recorre el índice desde esa posición, por lo que
+  las páginas profundas cuestan lo mismo que la primera. También sirve al ORDER BY del listado completo.
+
+CONCURRENTLY evita bloquear las escrituras mientras se construye el índice; por eso este archivo no debe
+ejecutarse dentro de una transacción (psql -f lo ejecuta en modo autocommit).
+
+Instrucción SQL:
+*/
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_cedula_id_idx ON users (cedula_identidad, id);
@@ -0,0 +1,71 @@
+/*
+Avisos de cambios en la tabla 'users' para la copia en memoria del API (USERS_MIRROR, ver models/UserMirror.py).
+
+- users_notify_changes(): Envía un NOTIFY al canal 'users_changes' por cada sentencia que modifica 'users', con la
+  versión de la tabla, la fecha de la última modificación y los ids de las filas afectadas.
+- users_notify_insert/update/delete/truncate: Triggers por sentencia. Usan tablas de transición, así que una carga
+  masiva envía un solo aviso en lugar de uno por fila.
+
+El texto de cada aviso es "<versión> <fecha en segundos desde 1970> <ids separados por comas>". Si la sentencia
+afecta a más de 200 filas (un NOTIFY admite hasta 8000 bytes) o es un TRUNCATE, en lugar de los ids se envía "*" y
+el API vuelve a cargar la tabla completa. Los avisos se entregan solo cuando la transacción se confirma.
+
+Requiere users_version.sql: los triggers users_bump_version se disparan antes (los triggers de un mismo evento se
+ejecutan en orden alfabético), así que el aviso lleva la versión ya incrementada por la sentencia.
+
+Instrucción SQL:
+*/
+
+CREATE OR REPLACE FUNCTION users_notify_changes() RETURNS TRIGGER AS $$
+DECLARE
+    current_version BIGINT;
+    current_updated_at TIMESTAMPTZ;
+    changed TEXT[];
+    ids TEXT;
+BEGIN
+    SELECT version, updated_at INTO current_version, current_updated_at FROM table_versions WHERE table_name = 'users';
+
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(id::text) INTO changed FROM (SELECT id FROM users_changed_new LIMIT 201) rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(id::text) INTO changed FROM (
+            SELECT id FROM users_changed_old UNION SELECT id FROM users_changed_new LIMIT 201
+        ) rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(id::text) INTO changed FROM (SELECT id FROM users_changed_old LIMIT 201) rows;
+    END IF;
+
+    IF TG_OP = 'TRUNCATE' OR cardinality(changed) > 200 THEN
+        ids := '*';
+    ELSE
+        ids := COALESCE(array_to_string(changed, ','), '');
+    END IF;
+
+    PERFORM pg_notify(
+        'users_changes',
+        current_version::text || ' ' || extract(epoch FROM current_updated_at)::text || ' ' || ids
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_notify_insert ON users;
+DROP TRIGGER IF EXISTS users_notify_update ON users;
+DROP TRIGGER IF EXISTS users_notify_delete ON users;
+DROP TRIGGER IF EXISTS users_notify_truncate ON users;
+
+CREATE TRIGGER users_notify_insert
+    AFTER INSERT ON users REFERENCING NEW TABLE AS users_changed_new
+    FOR EACH STATEMENT EXECUTE FUNCTION users_notify_changes();
+
+CREATE TRIGGER users_notify_update
+    AFTER UPDATE ON users REFERENCING OLD TABLE AS users_changed_old NEW TABLE AS users_changed_new
+    FOR EACH STATEMENT EXECUTE FUNCTION users_notify_changes();
+
+CREATE TRIGGER users_notify_delete
+    AFTER DELETE ON users REFERENCING OLD TABLE AS users_changed_old
+    FOR EACH STATEMENT EXECUTE FUNCTION users_notify_changes();
+
+CREATE TRIGGER users_notify_truncate
+    AFTER TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION users_notify_changes();
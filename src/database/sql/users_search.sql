@@ -0,0 +1,37 @@
+/*
+Índices de soporte para la búsqueda de usuarios (GET /usuarios/buscar).
+
+- f_unaccent(text): Envoltorio IMMUTABLE de unaccent() con el diccionario explícito. unaccent() por sí sola es
+  STABLE (depende de search_path), así que no puede usarse en un índice de expresión.
+- users_nombre_search_idx, users_primer_apellido_search_idx, users_segundo_apellido_search_idx: Índices sobre
+  lower(f_unaccent(columna)) con text_pattern_ops. Responden tanto la igualdad como los prefijos
+  "LIKE 'texto%'" sin distinguir mayúsculas ni acentos, independientemente de la collation de la base.
+- users_cedula_search_idx: Índice sobre cedula_identidad con varchar_pattern_ops para los prefijos de cédula.
+
+Cada término de la búsqueda se resuelve con un recorrido de rango en estos índices, combinados por el
+planificador (BitmapOr / BitmapAnd), sin leer la tabla completa.
+
+CONCURRENTLY evita bloquear las escrituras mientras se construyen los índices; por eso este archivo no debe
+ejecutarse dentro de una transacción (psql -f lo ejecuta en modo autocommit). Requiere la extensión unaccent
+(incluida en los paquetes contrib de PostgreSQL).
+
+Instrucción SQL:
+*/
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_nombre_search_idx
+    ON users (lower(f_unaccent(nombre)) text_pattern_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_primer_apellido_search_idx
+    ON users (lower(f_unaccent(primer_apellido)) text_pattern_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_segundo_apellido_search_idx
+    ON users (lower(f_unaccent(segundo_apellido)) text_pattern_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_cedula_search_idx
+    ON users (cedula_identidad varchar_pattern_ops);
@@ -0,0 +1,35 @@
+/*
+Contador de versión por tabla para las respuestas condicionales (ETag / Last-Modified) del API.
+
+- table_versions: Guarda, por cada tabla, un número de versión y la fecha de la última modificación.
+- bump_table_version(): Incrementa la versión de la tabla que disparó el trigger.
+- users_bump_version: Trigger por sentencia sobre 'users' que incrementa la versión en cada INSERT, UPDATE,
+  DELETE o TRUNCATE, incluyendo las cargas masivas con COPY.
+
+El incremento ocurre dentro de la misma transacción que la escritura, por lo que la nueva versión solo se
+vuelve visible cuando los cambios se confirman. Consultar la versión es una lectura por clave primaria de una
+sola fila, mucho más barata que el SELECT de la tabla completa.
+
+Instrucción SQL:
+*/
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO table_versions (table_name) VALUES ('users') ON CONFLICT (table_name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE table_versions SET version = version + 1, updated_at = NOW() WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_bump_version ON users;
+
+CREATE TRIGGER users_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
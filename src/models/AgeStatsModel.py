@@ -0,0 +1,171 @@
+import datetime
+
+from database.replicas import get_read_connection
+from utils.Metrics import Metrics
+from . import UserMirror
+
+
+class AgeStatsModel:
+    """
+    Modelo de estadísticas de edad de los usuarios.
+
+    Trabaja sobre el almacén agregado 'users_birth_counts' (número de usuarios por fecha de nacimiento), que un
+    trigger mantiene al día en cada escritura sobre 'users' (ver database/sql/users_birth_counts.sql). El almacén
+    se guarda en memoria junto con la versión de la tabla y solo se vuelve a leer cuando la versión cambia.
+
+    Cada consulta reduce primero el almacén a una distribución edad -> número de usuarios en O(fechas distintas)
+    y calcula el promedio, el histograma o los percentiles sobre esa distribución, que tiene a lo sumo unas
+    pocas decenas de edades distintas.
+
+    Métodos de Clase:
+    - counts(): Recupera el almacén agregado de fechas de nacimiento.
+    - distribution(as_of): Recupera la distribución de edades a una fecha.
+    - average(as_of): Calcula el promedio de edades a una fecha.
+    - histogram(as_of, width): Agrupa las edades en intervalos de `width` años.
+    - percentiles(as_of, ps): Calcula los percentiles de edad indicados.
+    """
+
+    # Última lectura del almacén como una tupla (versión de la tabla, contadores), reemplazada de una sola vez.
+    _cache = (None, ())
+
+    @classmethod
+    @Metrics.instrument("age_counts")
+    def counts(self):
+        """
+        Recupera el almacén agregado de fechas de nacimiento, leyéndolo de la base de datos solo si la tabla
+        'users' cambió desde la última lectura.
+
+        Retorna:
+        tuple: Tuplas (fecha de nacimiento, número de usuarios) ordenadas por fecha.
+        """
+        # Con USERS_MIRROR al día, los contadores se calculan una vez por versión a partir de la copia en memoria.
+        snapshot = UserMirror.current("age_counts")
+        if snapshot is not None:
+            return snapshot.counts()
+        try:
+            with get_read_connection() as connection, connection.cursor() as cursor:
+                connection.execute_prepared(cursor, "SELECT version FROM table_versions WHERE table_name = 'users'")
+                row = cursor.fetchone()
+                version = row[0] if row is not None else None
+                cached_version, cached_counts = self._cache
+                if version is not None and version == cached_version:
+                    return cached_counts
+
+                cursor.execute(
+                    "SELECT fecha_nacimiento, total FROM users_birth_counts WHERE total > 0 ORDER BY fecha_nacimiento"
+                )
+                counts = tuple(cursor.fetchall())
+
+            AgeStatsModel._cache = (version, counts)
+            return counts
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    def distribution(self, as_of=None, counts=None):
+        """
+        Recupera la distribución de edades (en años cumplidos) de los usuarios a una fecha. Los usuarios nacidos
+        después de esa fecha no se cuentan.
+
+        Parámetros:
+        as_of (date, opcional): Fecha a la que se calculan las edades; por defecto, hoy.
+        counts (iterable, opcional): Tuplas (fecha de nacimiento, número de usuarios); por defecto, el almacén.
+
+        Retorna:
+        list: Tuplas (edad, número de usuarios) ordenadas por edad.
+        """
+        as_of = as_of or datetime.date.today()
+        if counts is None:
+            counts = self.counts()
+
+        ages = {}
+        for birth, total in counts:
+            if birth > as_of:
+                continue
+            # Misma regla que AGE() de PostgreSQL: se resta un año si aún no llegó el cumpleaños.
+            age = as_of.year - birth.year - ((as_of.month, as_of.day) < (birth.month, birth.day))
+            ages[age] = ages.get(age, 0) + total
+        return sorted(ages.items())
+
+    @classmethod
+    def average(self, as_of=None, counts=None):
+        """
+        Calcula el promedio de edades de los usuarios a una fecha.
+
+        Parámetros:
+        as_of (date, opcional): Fecha a la que se calculan las edades; por defecto, hoy.
+        counts (iterable, opcional): Tuplas (fecha de nacimiento, número de usuarios); por defecto, el almacén.
+
+        Retorna:
+        float or None: Promedio de edades, o None si no hay usuarios.
+        """
+        distribution = self.distribution(as_of, counts)
+        total = sum(count for _, count in distribution)
+        if total == 0:
+            return None
+        return sum(age * count for age, count in distribution) / total
+
+    @classmethod
+    def histogram(self, as_of=None, width=10, counts=None):
+        """
+        Agrupa las edades de los usuarios en intervalos de `width` años, desde el intervalo de la menor edad
+        hasta el de la mayor, incluyendo los intervalos vacíos intermedios.
+
+        Parámetros:
+        as_of (date, opcional): Fecha a la que se calculan las edades; por defecto, hoy.
+        width (int): Ancho de cada intervalo en años.
+        counts (iterable, opcional): Tuplas (fecha de nacimiento, número de usuarios); por defecto, el almacén.
+
+        Retorna:
+        list: Diccionarios con las claves 'desde', 'hasta' y 'total' de cada intervalo.
+        """
+        distribution = self.distribution(as_of, counts)
+        if not distribution:
+            return []
+
+        first = distribution[0][0] // width
+        buckets = [0] * (distribution[-1][0] // width - first + 1)
+        for age, count in distribution:
+            buckets[age // width - first] += count
+
+        return [
+            {"desde": (first + index) * width, "hasta": (first + index + 1) * width - 1, "total": total}
+            for index, total in enumerate(buckets)
+        ]
+
+    @classmethod
+    def percentiles(self, as_of=None, ps=(50, 90), counts=None):
+        """
+        Calcula percentiles de edad con interpolación lineal entre posiciones, igual que percentile_cont()
+        de PostgreSQL sobre la lista completa de edades.
+
+        Parámetros:
+        as_of (date, opcional): Fecha a la que se calculan las edades; por defecto, hoy.
+        ps (iterable): Percentiles a calcular, entre 0 y 100.
+        counts (iterable, opcional): Tuplas (fecha de nacimiento, número de usuarios); por defecto, el almacén.
+
+        Retorna:
+        dict: Diccionario percentil -> edad (float), o percentil -> None si no hay usuarios.
+        """
+        distribution = self.distribution(as_of, counts)
+        total = sum(count for _, count in distribution)
+        if total == 0:
+            return {p: None for p in ps}
+
+        def value_at(position):
+            # Retorna la edad en la posición indicada (desde 0) de la lista ordenada de edades.
+            seen = 0
+            for age, count in distribution:
+                seen += count
+                if position < seen:
+                    return age
+            return distribution[-1][0]
+
+        result = {}
+        for p in ps:
+            position = p / 100 * (total - 1)
+            lower = int(position)
+            low_age = value_at(lower)
+            high_age = value_at(lower + 1) if lower + 1 < total else low_age
+            result[p] = low_age + (high_age - low_age) * (position - lower)
+        return result
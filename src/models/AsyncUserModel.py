@@ -0,0 +1,312 @@
+import uuid
+
+from database import replicas
+from database.aio import get_async_connection
+from utils.Metrics import Metrics
+from . import UserMirror
+from .AgeStatsModel import AgeStatsModel
+from .UserModel import DELETE_USER, INSERT_USER, UPDATE_USER, VERSION_QUERY, select_users, user_factory
+
+
+async def _fetch_users(connection, query, params=None):
+    # Ejecuta una consulta sobre 'users' y convierte las filas en objetos User, igual que UserCursor.
+    cursor = await connection.execute(query, params)
+    return list(map(user_factory(cursor.description), cursor.fetchall()))
+
+
+async def _remember_write(connection):
+    # Igual que replicas.current_lsn() y remember_write() en UserModel: registra la posición del WAL después de una
+    # escritura, para que el cliente no lea después de la copia en memoria una versión anterior.
+    if not replicas.TRACK_WRITES:
+        return
+    try:
+        row = (await connection.execute("SELECT pg_current_wal_lsn()::text")).fetchone()
+    except Exception:
+        return
+    replicas.remember_write(replicas.parse_lsn(row[0]))
+
+
+class AsyncUserModel:
+    """
+    Variante asíncrona de UserModel para el modo ASGI (ver src/asgi.py).
+
+    Cada operación espera a la base de datos sin bloquear el bucle de eventos, con una conexión prestada del pool
+    de `database.aio`. Las consultas son las mismas de UserModel y los resultados tienen la misma forma, así que
+    las rutas asíncronas serializan y validan igual que las síncronas. Con USERS_MIRROR, las lecturas se atienden
+    desde la copia en memoria del proceso mientras esté al día (ver models.UserMirror).
+
+    A diferencia de UserModel, las lecturas van siempre al primario y cada escritura se confirma sola, sin
+    réplicas ni agrupamiento de escrituras. Las escrituras se registran igual para que quien escribe lea sus
+    propias escrituras aunque la copia en memoria vaya retrasada.
+
+    Métodos de Clase:
+    - all(fields): Recupera todos los usuarios de la base de datos.
+    - page(limit, after, fields): Recupera una página de usuarios usando paginación por clave (keyset).
+    - version(): Recupera el contador de versión de la tabla 'users'.
+    - find(id, fields): Busca un usuario por su id en la base de datos.
+    - find_many(ids, fields): Busca varios usuarios por id con una sola consulta.
+    - age_counts(): Recupera el almacén agregado de fechas de nacimiento (ver AgeStatsModel.counts()).
+    - store(user): Agrega un nuevo usuario a la base de datos.
+    - update(user): Actualiza un usuario existente en la base de datos.
+    - delete(user): Elimina un usuario de la base de datos.
+    """
+
+    @classmethod
+    @Metrics.instrument("all")
+    async def all(self, fields=None):
+        """
+        Recupera todos los usuarios de la base de datos.
+
+        Parámetros:
+        fields (iterable, opcional): Campos a seleccionar; por defecto, todos.
+
+        Retorna:
+        list: Lista de objetos User.
+        """
+        snapshot = UserMirror.current("all", ordered=True)
+        if snapshot is not None:
+            return list(snapshot.ordered)
+        try:
+            async with get_async_connection() as connection:
+                return await _fetch_users(connection, select_users(fields) + " ORDER BY cedula_identidad ASC")
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    @Metrics.instrument("page")
+    async def page(self, limit, after=None, fields=None):
+        """
+        Recupera una página de usuarios ordenados por (cedula_identidad, id) usando paginación por clave, igual que
+        UserModel.page().
+
+        Parámetros:
+        limit (int): Número máximo de usuarios de la página.
+        after (tuple, opcional): Última clave (cedula_identidad, id) vista en la página anterior.
+        fields (iterable, opcional): Campos a seleccionar; la cédula y el id se seleccionan siempre.
+
+        Retorna:
+        tuple: Lista de objetos User y la clave (cedula_identidad, id) del último
+               usuario de la página, o None si no hay más páginas.
+        """
+        snapshot = UserMirror.current("page", ordered=True)
+        if snapshot is not None:
+            return snapshot.page(limit, after)
+        columns = select_users(fields, required=("id", "cedula_identidad"))
+        try:
+            async with get_async_connection() as connection:
+                # Se pide una fila más de las necesarias para saber si existe una página siguiente.
+                if after is None:
+                    users = await _fetch_users(
+                        connection, columns + " ORDER BY cedula_identidad ASC, id ASC LIMIT %s", (limit + 1,)
+                    )
+                elif after[0] is not None:
+                    users = await _fetch_users(
+                        connection,
+                        columns
+                        + " WHERE (cedula_identidad, id) > (%s, %s::uuid) ORDER BY cedula_identidad ASC, id ASC LIMIT %s",
+                        (after[0], after[1], limit + 1),
+                    )
+                    # Al agotarse las cédulas se continúa con los usuarios sin cédula, que van al final.
+                    if len(users) <= limit:
+                        users += await _fetch_users(
+                            connection,
+                            columns + " WHERE cedula_identidad IS NULL ORDER BY id ASC LIMIT %s",
+                            (limit + 1 - len(users),),
+                        )
+                else:
+                    users = await _fetch_users(
+                        connection,
+                        columns + " WHERE cedula_identidad IS NULL AND id > %s::uuid ORDER BY id ASC LIMIT %s",
+                        (after[1], limit + 1),
+                    )
+
+            next_key = None
+            if len(users) > limit:
+                users = users[:limit]
+                next_key = (users[-1].cedula_identidad, users[-1].id)
+
+            return users, next_key
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    @Metrics.instrument("version")
+    async def version(self):
+        """
+        Recupera el contador de versión de la tabla 'users'.
+
+        Retorna:
+        tuple: Número de versión (int) y fecha de la última modificación (datetime).
+        """
+        snapshot = UserMirror.current("version")
+        if snapshot is not None:
+            return snapshot.version, snapshot.updated_at
+        try:
+            async with get_async_connection() as connection:
+                row = (await connection.execute(VERSION_QUERY)).fetchone()
+
+            if row is None:
+                raise Exception("No existe el contador de versión de la tabla users")
+            return row[0], row[1]
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    @Metrics.instrument("find")
+    async def find(self, id, fields=None):
+        """
+        Busca un usuario por su id en la base de datos.
+
+        Parámetros:
+        id (str): id del usuario a buscar.
+        fields (iterable, opcional): Campos a seleccionar; por defecto, todos.
+
+        Retorna:
+        User or None: Objeto User encontrado, o None si no se encontró.
+        """
+        snapshot = UserMirror.current("find")
+        if snapshot is not None:
+            try:
+                # Un id inválido se deja a la base de datos, que responde con su propio error.
+                return snapshot.users.get(str(uuid.UUID(id)))
+            except (TypeError, ValueError, AttributeError):
+                pass
+        try:
+            async with get_async_connection() as connection:
+                users = await _fetch_users(connection, select_users(fields) + " WHERE id = %s", (id,))
+
+            return users[0] if users else None
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    @Metrics.instrument("find_many")
+    async def find_many(self, ids, fields=None):
+        """
+        Busca varios usuarios por su id con una sola consulta (WHERE id = ANY(...)).
+
+        Parámetros:
+        ids (list): ids de los usuarios a buscar, en formato UUID canónico (minúsculas con guiones).
+        fields (iterable, opcional): Campos a seleccionar; el id se selecciona siempre para ordenar el resultado.
+
+        Retorna:
+        list: Objetos User encontrados, en el mismo orden de `ids`. Los ids que no existen se omiten.
+        """
+        snapshot = UserMirror.current("find_many")
+        if snapshot is not None:
+            return [snapshot.users[id] for id in ids if id in snapshot.users]
+        try:
+            async with get_async_connection() as connection:
+                users = await _fetch_users(
+                    connection,
+                    select_users(fields, required=("id",)) + " WHERE id = ANY(%s::text[]::uuid[])",
+                    (list(ids),),
+                )
+            found = {user.id: user for user in users}
+
+            return [found[id] for id in ids if id in found]
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    @Metrics.instrument("age_counts")
+    async def age_counts(self):
+        """
+        Recupera el almacén agregado de fechas de nacimiento, leyéndolo de la base de datos solo si la tabla
+        'users' cambió desde la última lectura. Comparte la caché de AgeStatsModel, así que el resultado puede
+        pasarse a AgeStatsModel.average(), histogram() o percentiles().
+
+        Retorna:
+        tuple: Tuplas (fecha de nacimiento, número de usuarios) ordenadas por fecha.
+        """
+        snapshot = UserMirror.current("age_counts")
+        if snapshot is not None:
+            return snapshot.counts()
+        try:
+            async with get_async_connection() as connection:
+                row = (await connection.execute(VERSION_QUERY)).fetchone()
+                version = row[0] if row is not None else None
+                cached_version, cached_counts = AgeStatsModel._cache
+                if version is not None and version == cached_version:
+                    return cached_counts
+
+                cursor = await connection.execute(
+                    "SELECT fecha_nacimiento, total FROM users_birth_counts WHERE total > 0 ORDER BY fecha_nacimiento"
+                )
+                counts = tuple(cursor.fetchall())
+
+            AgeStatsModel._cache = (version, counts)
+            return counts
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    @Metrics.instrument("store")
+    async def store(self, user):
+        """
+        Agrega un nuevo usuario a la base de datos.
+
+        Parámetros:
+        user (User): Objeto User a agregar a la base de datos.
+
+        Retorna:
+        int: Número de filas afectadas en la base de datos.
+        """
+        async with get_async_connection() as connection:
+            cursor = await connection.execute(
+                INSERT_USER,
+                (
+                    user.id,
+                    user.cedula_identidad,
+                    user.nombre,
+                    user.primer_apellido,
+                    user.segundo_apellido,
+                    user.fecha_nacimiento,
+                ),
+            )
+            await _remember_write(connection)
+            return cursor.rowcount
+
+    @classmethod
+    @Metrics.instrument("update")
+    async def update(self, user):
+        """
+        Actualiza un usuario existente en la base de datos.
+
+        Parámetros:
+        user (User): Objeto User con los nuevos datos a actualizar.
+
+        Retorna:
+        int: Número de filas afectadas en la base de datos.
+        """
+        async with get_async_connection() as connection:
+            cursor = await connection.execute(
+                UPDATE_USER,
+                (
+                    user.cedula_identidad,
+                    user.nombre,
+                    user.primer_apellido,
+                    user.segundo_apellido,
+                    user.fecha_nacimiento,
+                    user.id,
+                ),
+            )
+            await _remember_write(connection)
+            return cursor.rowcount
+
+    @classmethod
+    @Metrics.instrument("delete")
+    async def delete(self, user):
+        """
+        Elimina un usuario de la base de datos.
+
+        Parámetros:
+        user (User): Objeto User a eliminar de la base de datos.
+
+        Retorna:
+        int: Número de filas afectadas en la base de datos.
+        """
+        async with get_async_connection() as connection:
+            cursor = await connection.execute(DELETE_USER, (user.id,))
+            await _remember_write(connection)
+            return cursor.rowcount
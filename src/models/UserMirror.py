@@ -0,0 +1,372 @@
+"""
+Este módulo mantiene en cada proceso una copia en memoria de la tabla 'users' para atender las lecturas sin
+consultar PostgreSQL. Es opcional y está pensado para tablas de usuarios pequeñas con muchas lecturas.
+
+Un hilo de fondo carga la tabla completa y escucha (LISTEN) los avisos que los triggers de
+database/sql/users_notify.sql envían al confirmarse cada escritura. Por cada aviso vuelve a leer del primario las
+filas cuyos ids cambiaron y reemplaza la copia de una sola vez, así que las lecturas nunca ven una copia a medias
+ni necesitan candados. Las escrituras siguen yendo a la base de datos.
+
+La copia solo se usa mientras se sabe que está al día: cada USERS_MIRROR_CHECK_INTERVAL segundos el hilo compara la
+versión de la tabla (table_versions) con la de la copia. Si la copia no se confirma al día durante más de
+USERS_MIRROR_MAX_STALENESS segundos (por ejemplo, porque se cortó la conexión del hilo), las lecturas vuelven a ir a
+la base de datos hasta que el hilo se reconecta y carga la tabla de nuevo.
+
+Quien acaba de escribir lee sus propias escrituras: cada comprobación guarda también la posición del WAL del primario
+hasta la que la copia está al día, y mientras no supere la de la última escritura del cliente (ver
+database.replicas) sus lecturas van a la base de datos.
+
+Variables de entorno opcionales:
+- USERS_MIRROR: Si es True, las lecturas de usuarios se atienden desde la copia en memoria (por defecto False).
+  Requiere users_version.sql y users_notify.sql.
+- USERS_MIRROR_MAX_STALENESS: Segundos máximos de retraso de la copia para atender lecturas (por defecto 5).
+- USERS_MIRROR_CHECK_INTERVAL: Segundos entre comprobaciones de la versión de la tabla (por defecto 1).
+"""
+
+import bisect
+import collections
+import datetime
+import os
+import select
+import threading
+import time
+
+import psycopg2
+from decouple import config
+
+from database import replicas
+from database.db import get_pool
+from utils.Metrics import Metrics
+from .entities.User import User
+
+ENABLED = config("USERS_MIRROR", default=False, cast=bool)
+MAX_STALENESS = config("USERS_MIRROR_MAX_STALENESS", default=5.0, cast=float)
+CHECK_INTERVAL = config("USERS_MIRROR_CHECK_INTERVAL", default=1.0, cast=float)
+CHANNEL = "users_changes"
+# Ids cambiados a partir de los cuales es más barato volver a cargar la tabla que actualizar la copia fila a fila.
+RELOAD_THRESHOLD = 2000
+# Cédulas de prueba que PostgreSQL ordena con la intercalación de la columna cedula_identidad para saber si coincide
+# con el orden por punto de código de la copia. Cualquier intercalación lingüística (libc o ICU) ordena distinto al
+# menos las mayúsculas y minúsculas y los signos de puntuación.
+COLLATION_PROBE = ("V-12.345", "V12345", "v-1", "a", "B", "1", "-1", "é", "Z")
+
+
+def _key(user):
+    # Orden de all() y page(): por cédula, con los usuarios sin cédula al final, y luego por id. Python compara
+    # las cadenas por punto de código, igual que PostgreSQL con la intercalación "C"; con otra intercalación la
+    # copia no atiende las lecturas ordenadas (ver _Snapshot.code_point_order).
+    return (user.cedula_identidad is None, user.cedula_identidad or "", user.id)
+
+
+class _Snapshot:
+    """
+    Estado inmutable de la copia: los usuarios por id y ordenados por cédula, con la versión de la tabla a la
+    que corresponden. Cada cambio crea un estado nuevo.
+
+    `code_point_order` indica si PostgreSQL ordena las cédulas igual que la copia (por punto de código). Si no, el
+    orden de `ordered` no coincide con el de las consultas y la copia no atiende all(), stream() ni page(): un
+    cursor de paginación emitido por un lado y continuado por el otro saltaría o repetiría usuarios.
+    """
+
+    __slots__ = ("version", "updated_at", "users", "keys", "ordered", "code_point_order", "_counts")
+
+    def __init__(self, version, updated_at, users, keys, ordered, code_point_order):
+        self.version = version
+        self.updated_at = updated_at
+        self.users = users
+        self.keys = keys
+        self.ordered = ordered
+        self.code_point_order = code_point_order
+        self._counts = None
+
+    @classmethod
+    def build(self, version, updated_at, users, code_point_order):
+        ordered = sorted(users, key=_key)
+        users = {user.id: user for user in ordered}
+        return _Snapshot(version, updated_at, users, [_key(user) for user in ordered], ordered, code_point_order)
+
+    def apply(self, version, updated_at, ids, rows):
+        """
+        Retorna un estado nuevo en el que los usuarios de `ids` se reemplazan por `rows` (los que ya no están en
+        `rows` se eliminaron).
+        """
+        users, keys, ordered = dict(self.users), list(self.keys), list(self.ordered)
+        for id in ids:
+            old = users.pop(id, None)
+            if old is not None:
+                index = bisect.bisect_left(keys, _key(old))
+                del keys[index], ordered[index]
+        for user in rows:
+            users[user.id] = user
+            key = _key(user)
+            index = bisect.bisect_left(keys, key)
+            keys.insert(index, key)
+            ordered.insert(index, user)
+        return _Snapshot(version, updated_at, users, keys, ordered, self.code_point_order)
+
+    def page(self, limit, after=None):
+        # Igual que UserModel.page(): usuarios posteriores a la clave `after` y la clave del último, o None.
+        start = 0 if after is None else bisect.bisect_right(self.keys, (after[0] is None, after[0] or "", after[1]))
+        users = self.ordered[start : start + limit + 1]
+        next_key = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_key = (users[-1].cedula_identidad, users[-1].id)
+        return users, next_key
+
+    def counts(self):
+        # Igual que AgeStatsModel.counts(): número de usuarios por fecha de nacimiento, ordenado por fecha.
+        if self._counts is None:
+            counter = collections.Counter(user.fecha_nacimiento for user in self.ordered)
+            counter.pop(None, None)
+            self._counts = tuple(sorted(counter.items()))
+        return self._counts
+
+
+class UserMirror:
+    """
+    Copia en memoria de la tabla 'users' mantenida al día por un hilo que escucha los avisos de cambios.
+    """
+
+    def __init__(self, max_staleness=5.0, check_interval=1.0):
+        """
+        Constructor de la clase UserMirror. Arranca el hilo que carga la tabla; hasta que termina la carga,
+        current() retorna None.
+
+        Parámetros:
+        - max_staleness (float): Segundos máximos sin confirmar que la copia está al día para usarla.
+        - check_interval (float): Segundos entre comprobaciones de la versión de la tabla.
+        """
+        self.max_staleness = max_staleness
+        self.check_interval = check_interval
+        self.error = None
+        self._snapshot = None
+        self._synced_at = None
+        # Posición del WAL del primario hasta la que la copia está al día.
+        self._synced_lsn = None
+        # Versión de la tabla vista en una comprobación que la copia todavía no alcanzó, y cuándo y en qué posición
+        # del WAL se vio.
+        self._target = None
+        threading.Thread(target=self._run, name="users-mirror", daemon=True).start()
+
+    def current(self, ordered=False, read_after=None):
+        """
+        Retorna el estado actual de la copia si se confirmó al día hace menos de `max_staleness` segundos.
+
+        Parámetros:
+        ordered (bool): Si es True, la lectura depende del orden por cédula y la copia solo se usa si ese orden
+                        coincide con el de la base de datos.
+        read_after (int, opcional): Posición del WAL de la última escritura del cliente; la copia solo se usa si
+                                    ya la incluye.
+
+        Retorna:
+        _Snapshot or None: Estado de la copia, o None si las lecturas deben ir a la base de datos.
+        """
+        # La posición se lee antes que la copia: la copia solo avanza, así que la leída después es igual o posterior
+        # a la confirmada en esa posición.
+        synced_lsn = self._synced_lsn
+        snapshot, synced_at = self._snapshot, self._synced_at
+        if snapshot is None or synced_at is None or time.monotonic() - synced_at > self.max_staleness:
+            return None
+        if ordered and not snapshot.code_point_order:
+            return None
+        # La posición de la escritura se leyó después de confirmarla; si la de la copia es igual, pudo leerse
+        # antes de que la escritura fuera visible, así que debe ser estrictamente mayor.
+        if read_after is not None and (synced_lsn is None or synced_lsn <= read_after):
+            return None
+        return snapshot
+
+    def staleness(self):
+        """
+        Retorna los segundos transcurridos desde la última vez que se confirmó la copia al día, o None si todavía
+        no se cargó.
+        """
+        synced_at = self._synced_at
+        return time.monotonic() - synced_at if synced_at is not None else None
+
+    def _run(self):
+        # Cada vuelta abre una conexión propia (fuera del pool, porque queda ocupada escuchando), se suscribe al
+        # canal antes de cargar la tabla para no perder cambios y atiende los avisos hasta que la conexión falla.
+        while True:
+            connection = None
+            try:
+                connection = psycopg2.connect(**get_pool().connect_kwargs)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute("LISTEN " + CHANNEL)
+                self._load(connection)
+                self.error = None
+                self._listen(connection)
+            except Exception as ex:
+                self.error = str(ex).strip()
+                Metrics.inc("api_mirror_errors_total")
+            finally:
+                if connection is not None:
+                    connection.close()
+            time.sleep(self.check_interval)
+
+    def _load(self, connection):
+        # Lee la versión y todas las filas en una misma instantánea, para que la versión corresponda a las filas.
+        # La posición del WAL se lee antes de tomar la instantánea, que incluye todo lo confirmado hasta ella.
+        with connection.cursor() as cursor:
+            lsn = self._current_lsn(cursor)
+            cursor.execute("BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            cursor.execute("SELECT version, updated_at FROM table_versions WHERE table_name = 'users'")
+            version, updated_at = cursor.fetchone()
+            # Las cédulas de prueba se unen a la columna para que tomen su intercalación efectiva (la de la columna
+            # o la de la base de datos, con cualquier proveedor).
+            cursor.execute(
+                "SELECT array_agg(value ORDER BY value) FROM ("
+                " SELECT cedula_identidad AS value FROM users WHERE false"
+                " UNION ALL SELECT unnest(%s::text[])) probe",
+                (list(COLLATION_PROBE),),
+            )
+            code_point_order = cursor.fetchone()[0] == sorted(COLLATION_PROBE)
+            cursor.execute("SELECT " + ", ".join(User.FIELDS) + " FROM users")
+            users = [User(*row) for row in cursor]
+            cursor.execute("COMMIT")
+        self._snapshot = _Snapshot.build(version, updated_at, users, code_point_order)
+        self._synced_at, self._synced_lsn = time.monotonic(), lsn
+        self._target = None
+        Metrics.inc("api_mirror_loads_total")
+
+    def _listen(self, connection):
+        checked = time.monotonic()
+        while True:
+            if select.select([connection], [], [], self.check_interval) != ([], [], []):
+                connection.poll()
+                notifies = list(connection.notifies)
+                del connection.notifies[:]
+                if notifies:
+                    self._apply(connection, notifies)
+            if time.monotonic() - checked >= self.check_interval:
+                self._check(connection)
+                checked = time.monotonic()
+
+    def _apply(self, connection, notifies):
+        snapshot = self._snapshot
+        version, updated_at, ids, reload = snapshot.version, snapshot.updated_at, set(), False
+        for notify in notifies:
+            parts = notify.payload.split(" ", 2)
+            if len(parts) != 3:
+                reload = True
+                continue
+            if int(parts[0]) <= snapshot.version:
+                # El cambio ya estaba en la copia cargada.
+                continue
+            if int(parts[0]) > version:
+                version = int(parts[0])
+                updated_at = datetime.datetime.fromtimestamp(float(parts[1]), datetime.timezone.utc)
+            if parts[2] == "*":
+                reload = True
+            else:
+                ids.update(id for id in parts[2].split(",") if id)
+
+        if reload or len(ids) > RELOAD_THRESHOLD:
+            self._load(connection)
+            return
+        if version == snapshot.version:
+            return
+        rows = []
+        if ids:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT " + ", ".join(User.FIELDS) + " FROM users WHERE id = ANY(%s::uuid[])", (list(ids),)
+                )
+                rows = [User(*row) for row in cursor]
+        self._snapshot = snapshot.apply(version, updated_at, ids, rows)
+        Metrics.inc("api_mirror_changes_total", len(ids))
+
+    def _current_lsn(self, cursor):
+        cursor.execute("SELECT pg_current_wal_lsn()::text")
+        return replicas.parse_lsn(cursor.fetchone()[0])
+
+    def _check(self, connection):
+        # La copia está al día hasta el momento de una comprobación si ya alcanzó la versión que la tabla tenía
+        # entonces. Con escrituras continuas la versión de la tabla siempre va un poco por delante de la copia, así
+        # que se compara con la versión vista en la comprobación anterior.
+        now = time.monotonic()
+        with connection.cursor() as cursor:
+            # Igual que en _load, la posición del WAL se lee antes que la versión.
+            lsn = self._current_lsn(cursor)
+            cursor.execute("SELECT version FROM table_versions WHERE table_name = 'users'")
+            version = cursor.fetchone()[0]
+        current = self._snapshot.version
+        if version < current:
+            # La tabla retrocedió (por ejemplo, se restauró la base de datos): se vuelve a cargar.
+            self._load(connection)
+        elif version == current:
+            self._synced_at, self._synced_lsn, self._target = now, lsn, None
+        elif self._target is None:
+            self._target = (version, now, lsn)
+        elif current >= self._target[0]:
+            self._synced_at, self._synced_lsn, self._target = self._target[1], self._target[2], (version, now, lsn)
+        elif now - self._target[1] > self.max_staleness:
+            # Falta un aviso que ya debería haber llegado: se vuelve a cargar la tabla.
+            self._load(connection)
+
+
+_mirror = None
+_mirror_pid = None
+_mirror_lock = threading.Lock()
+
+
+def get_user_mirror():
+    """
+    Retorna la copia en memoria del proceso, creándola (y arrancando su carga) la primera vez, o None si
+    USERS_MIRROR está desactivado. Igual que el pool de conexiones, un proceso bifurcado crea la suya.
+
+    Retorna:
+    UserMirror or None: Copia en memoria del proceso actual.
+    """
+    global _mirror, _mirror_pid
+    if not ENABLED:
+        return None
+    pid = os.getpid()
+    if _mirror_pid != pid:
+        with _mirror_lock:
+            if _mirror_pid != pid:
+                _mirror = UserMirror(MAX_STALENESS, CHECK_INTERVAL)
+                _mirror_pid = pid
+    return _mirror
+
+
+def current(operation=None, ordered=False):
+    """
+    Retorna el estado de la copia en memoria si puede usarse para una lectura.
+
+    Parámetros:
+    operation (str, opcional): Operación del modelo que se atiende desde memoria, para la métrica
+                               api_mirror_reads_total.
+    ordered (bool): Si es True, la lectura depende del orden por cédula (all(), stream() y page()).
+
+    Retorna:
+    _Snapshot or None: Estado de la copia, o None si está desactivada, cargándose, desactualizada, si todavía no
+    tiene la última escritura del cliente o, para las lecturas ordenadas, si la base de datos no ordena las
+    cédulas por punto de código.
+    """
+    mirror = get_user_mirror()
+    snapshot = mirror.current(ordered, replicas.read_after()) if mirror is not None else None
+    if snapshot is not None and operation is not None:
+        Metrics.inc("api_mirror_reads_total", operation=operation)
+    return snapshot
+
+
+def status():
+    """
+    Retorna el estado de la copia del proceso, sin crearla si el proceso todavía no la usó.
+
+    Retorna:
+    dict or None: Número de usuarios, versión, segundos desde la última confirmación y último error, o None.
+    """
+    mirror = _mirror if _mirror_pid == os.getpid() else None
+    if mirror is None:
+        return None
+    snapshot = mirror._snapshot
+    return {
+        "users": len(snapshot.users) if snapshot is not None else 0,
+        "version": snapshot.version if snapshot is not None else None,
+        "code_point_order": snapshot.code_point_order if snapshot is not None else None,
+        "staleness_seconds": mirror.staleness(),
+        "error": mirror.error,
+    }
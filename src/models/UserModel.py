@@ -1,99 +1,621 @@
-from database.db import get_connection
+import csv
+import io
+import queue
+import threading
+import time
+import uuid
+
+from psycopg2.extras import execute_values
+
+from database.batch import RETRYABLE_ERRORS, execute_write
+from database.db import ProfiledCursor, get_connection
+from database.replicas import current_lsn, get_read_connection, remember_write
+from utils.Metrics import Metrics
+from . import UserMirror
+from .AgeStatsModel import AgeStatsModel
 from .entities.User import User
 
+# Expresiones SQL del valor JSON de cada campo de un usuario, en orden alfabético como las claves de
+# User.to_JSON(). La fecha de nacimiento va en formato dd/mm/YYYY (el año sin ceros a la izquierda, igual que
+# strftime). to_json() escapa las cadenas.
+JSON_FIELDS = (
+    ("cedula_identidad", "COALESCE(to_json(cedula_identidad)::text, 'null')"),
+    # Las fechas con formato y los UUID solo tienen dígitos, letras, guiones y barras: se entrecomillan sin
+    # to_json(), que es la parte más costosa de la expresión.
+    ("fecha_nacimiento", "COALESCE('\"' || to_char(fecha_nacimiento, 'DD/MM/FMYYYY') || '\"', 'null')"),
+    ("id", "'\"' || id::text || '\"'"),
+    ("nombre", "COALESCE(to_json(nombre)::text, 'null')"),
+    ("primer_apellido", "COALESCE(to_json(primer_apellido)::text, 'null')"),
+    ("segundo_apellido", "COALESCE(to_json(segundo_apellido)::text, 'null')"),
+)
+
+
+def json_row(fields=None):
+    """
+    Construye la expresión SQL que genera el JSON de un usuario con la misma forma que User.to_JSON(fields): claves
+    en orden alfabético y sin espacios.
+
+    Parámetros:
+    fields (iterable, opcional): Campos a incluir; por defecto, todos.
+
+    Retorna:
+    str: Expresión SQL de tipo text.
+    """
+    pieces = []
+    for name, expression in JSON_FIELDS:
+        if fields is None or name in fields:
+            pieces.append("'%s\"%s\":' || %s" % ("," if pieces else "{", name, expression))
+    return " || ".join(pieces) + " || '}'"
+
+
+# Expresión SQL que construye el JSON completo de un usuario.
+JSON_ROW = json_row()
+
+# Expresiones normalizadas (sin mayúsculas ni acentos) de las columnas de texto en las que busca search(). Deben
+# coincidir con las expresiones de los índices de database/sql/users_search.sql.
+SEARCH_COLUMNS = (
+    "lower(f_unaccent(nombre))",
+    "lower(f_unaccent(primer_apellido))",
+    "lower(f_unaccent(segundo_apellido))",
+)
+
+
+# Sentencias de escritura de un usuario, compartidas con la variante asíncrona del modelo (ver AsyncUserModel).
+INSERT_USER = (
+    "INSERT INTO users (id, cedula_identidad, nombre, primer_apellido, segundo_apellido, fecha_nacimiento)"
+    " VALUES(%s,%s,%s,%s,%s,%s)"
+)
+UPDATE_USER = (
+    "UPDATE users SET cedula_identidad = %s, nombre = %s, primer_apellido = %s, segundo_apellido = %s,"
+    " fecha_nacimiento = %s WHERE id = %s"
+)
+DELETE_USER = "DELETE FROM users WHERE id = %s"
+# Consulta del contador de versión de la tabla 'users' (ver database/sql/users_version.sql).
+VERSION_QUERY = "SELECT version, updated_at FROM table_versions WHERE table_name = 'users'"
+
+
+def user_factory(description):
+    """
+    Retorna la función que convierte una fila de la tabla 'users' en un objeto User.
+
+    Las columnas se asignan a los atributos de User por nombre, así que admite consultas que seleccionan solo
+    algunas columnas (proyecciones); los atributos no seleccionados quedan en None.
+
+    Parámetros:
+    description (tuple): Descripción de las columnas del resultado (cursor.description).
+
+    Retorna:
+    function: Función que recibe una fila y retorna un User.
+    """
+    # Con todas las columnas en orden la fila se pasa tal cual; con una proyección se asigna por nombre.
+    names = tuple(column.name for column in description)
+    if names == User.FIELDS:
+        return lambda row: User(*row)
+    return lambda row: User(**{"id": None, **dict(zip(names, row))})
+
+
+class UserCursor(ProfiledCursor):
+    """
+    Cursor de psycopg2 que entrega cada fila de la tabla 'users' directamente como un objeto User (ver
+    user_factory()).
+    """
+
+    def _factory(self):
+        return user_factory(self.description)
+
+    def fetchone(self):
+        row = super().fetchone()
+        return self._factory()(row) if row is not None else None
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        return list(map(self._factory(), rows)) if rows else []
+
+    def fetchall(self):
+        rows = super().fetchall()
+        return list(map(self._factory(), rows)) if rows else []
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(self.itersize)
+            if not rows:
+                return
+            yield from rows
+
+
+class _ChunkWriter:
+    """
+    Archivo de destino de COPY ... TO STDOUT que junta las filas en fragmentos de `size` bytes y los pasa por una
+    cola acotada al hilo que escribe la respuesta.
+    """
+
+    __slots__ = ("chunks", "size", "buffer", "length", "cancelled")
+
+    def __init__(self, chunks, size):
+        self.chunks = chunks
+        self.size = size
+        self.buffer = []
+        self.length = 0
+        self.cancelled = False
+
+    def write(self, data):
+        # psycopg2 llama a write() una vez por fila.
+        self.buffer.append(data)
+        self.length += len(data)
+        if self.length >= self.size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            chunk = b"".join(self.buffer)
+            self.buffer, self.length = [], 0
+            self.put(chunk)
+
+    def put(self, item):
+        # Espera lugar en la cola; si quien lee la exportación la abandonó, se interrumpe el COPY.
+        while True:
+            if self.cancelled:
+                raise InterruptedError("La exportación fue cancelada")
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+# Marca de fin de la exportación en la cola de fragmentos.
+_EXPORT_DONE = object()
+
+
+def select_users(fields=None, required=()):
+    """
+    Construye el inicio de un SELECT sobre la tabla 'users' con las columnas de la proyección indicada.
+
+    Parámetros:
+    fields (iterable, opcional): Campos de User a seleccionar; por defecto, todos.
+    required (iterable): Campos que se seleccionan siempre, aunque no estén en la proyección.
+
+    Retorna:
+    str: Texto "SELECT <columnas> FROM users" con las columnas en el orden de User.FIELDS.
+    """
+    wanted = set(User.FIELDS if fields is None else fields) | set(required)
+    return "SELECT " + ", ".join(field for field in User.FIELDS if field in wanted) + " FROM users"
+
 
 class UserModel:
     """
     Modelo de base de datos para la entidad User.
     Proporciona métodos para interactuar con la tabla 'users' en la base de datos.
 
+    Todas las operaciones toman una conexión prestada del pool de `database.db` y la devuelven
+    al terminar, incluso si ocurre un error. Las lecturas pueden ir a una réplica y las escrituras van siempre al
+    primario (ver database.replicas). Las consultas por id y las escrituras de un usuario se ejecutan como
+    sentencias preparadas en cada conexión física (ver PooledConnection.execute_prepared()). Con
+    PGSQL_WRITE_BATCHING, las escrituras de un usuario concurrentes se confirman juntas (ver database.batch). Con
+    USERS_MIRROR, all(), stream(), page(), version(), find() y find_many() se atienden desde una copia en memoria
+    de la tabla mientras esté al día (ver models.UserMirror).
+
     Métodos de Clase:
     - all(): Recupera todos los usuarios de la base de datos.
+    - all_json(): Recupera todos los usuarios como un arreglo JSON generado por PostgreSQL.
+    - stream(batch_size): Recorre todos los usuarios por lotes usando un cursor del lado del servidor.
+    - export(format): Exporta los usuarios en CSV o NDJSON con COPY ... TO STDOUT.
+    - page(limit, after): Recupera una página de usuarios usando paginación por clave (keyset).
+    - version(): Recupera el contador de versión de la tabla 'users'.
     - find(id): Busca un usuario por su id en la base de datos.
+    - find_many(ids): Busca varios usuarios por id con una sola consulta.
+    - search(terms, limit): Busca usuarios por prefijo de nombre, apellidos o cédula.
+    - find_json(id): Busca un usuario por su id y lo retorna como JSON generado por PostgreSQL.
     - store(user): Agrega un nuevo usuario a la base de datos.
+    - bulk_store(users, method): Agrega un lote de usuarios en una sola transacción.
     - update(user): Actualiza un usuario existente en la base de datos.
     - delete(user): Elimina un usuario de la base de datos.
+    - bulk_update(changes): Actualiza parcialmente un lote de usuarios con una sentencia por conjunto de campos.
+    - bulk_delete(ids): Elimina un lote de usuarios con una sola sentencia.
     """
 
     @classmethod
-    def all(self):
+    @Metrics.instrument("all")
+    def all(self, fields=None):
         """
         Recupera todos los usuarios de la base de datos.
 
+        Parámetros:
+        fields (iterable, opcional): Campos a seleccionar; por defecto, todos.
+
         Retorna:
-        list: Lista de diccionarios JSON representando usuarios.
+        list: Lista de objetos User.
         """
+        snapshot = UserMirror.current("all", ordered=True)
+        if snapshot is not None:
+            return list(snapshot.ordered)
         try:
-            connection = get_connection()
-            users = []
+            with get_read_connection() as connection, connection.cursor(cursor_factory=UserCursor) as cursor:
+                cursor.execute(select_users(fields) + " ORDER BY cedula_identidad ASC")
+                users = cursor.fetchall()
 
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "SELECT id, cedula_identidad, nombre, primer_apellido, segundo_apellido, fecha_nacimiento FROM users ORDER BY cedula_identidad ASC"
-                )
-                resultset = cursor.fetchall()
-                for row in resultset:
-                    user = User(row[0], row[1], row[2], row[3], row[4], row[5])
-                    users.append(user.to_JSON())
-
-            connection.close()
             return users
         except Exception as ex:
             raise Exception(ex)
 
     @classmethod
-    def find(self, id):
+    @Metrics.instrument("all_json")
+    def all_json(self):
+        """
+        Recupera todos los usuarios de la base de datos como un arreglo JSON construido por PostgreSQL, sin crear
+        objetos User ni diccionarios en Python.
+
+        Retorna:
+        str: Texto del arreglo JSON con los usuarios ordenados por cédula de identidad.
+        """
+        try:
+            with get_read_connection() as connection, connection.cursor() as cursor:
+                cursor.execute("SELECT string_agg(" + JSON_ROW + ", ',' ORDER BY cedula_identidad ASC) FROM users")
+                row = cursor.fetchone()
+
+            return "[" + (row[0] or "") + "]"
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    @Metrics.instrument("stream")
+    def stream(self, batch_size=1000, fields=None):
+        """
+        Recorre todos los usuarios de la base de datos por lotes usando un cursor con nombre
+        (del lado del servidor), de modo que nunca se cargue la tabla completa en memoria.
+
+        La conexión permanece prestada mientras el generador esté activo y se devuelve al pool
+        cuando se agota o se cierra.
+
+        Parámetros:
+        batch_size (int): Número de filas que se leen del servidor en cada viaje.
+        fields (iterable, opcional): Campos a seleccionar; por defecto, todos.
+
+        Retorna:
+        generator: Generador de listas de objetos User.
+        """
+        snapshot = UserMirror.current("stream", ordered=True)
+        if snapshot is not None:
+            for start in range(0, len(snapshot.ordered), batch_size):
+                yield snapshot.ordered[start : start + batch_size]
+            return
+        with get_read_connection() as connection, connection.cursor(name="users_stream", cursor_factory=UserCursor) as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(select_users(fields) + " ORDER BY cedula_identidad ASC")
+            while True:
+                users = cursor.fetchmany(batch_size)
+                if not users:
+                    break
+                yield users
+
+    @classmethod
+    def export(self, format="csv", fields=None, born_from=None, born_to=None, cedula_prefix=None, chunk_size=262144):
+        """
+        Exporta los usuarios en CSV o NDJSON con COPY ... TO STDOUT, sin crear objetos User ni diccionarios en
+        Python: PostgreSQL genera el texto de cada fila y este se reenvía por fragmentos.
+
+        Un hilo aparte ejecuta el COPY y pasa los fragmentos por una cola acotada, así que la memoria usada no
+        depende del número de usuarios. La conexión permanece prestada mientras el generador esté activo; si se
+        cierra antes de terminar, el COPY se cancela.
+
+        Parámetros:
+        format (str): "csv" (con cabecera y fechas YYYY-MM-DD, como la carga masiva) o "ndjson" (un objeto JSON
+                      por línea, con la misma forma que User.to_JSON()).
+        fields (iterable, opcional): Campos a exportar; por defecto, todos.
+        born_from (date, opcional): Solo usuarios nacidos desde esta fecha.
+        born_to (date, opcional): Solo usuarios nacidos hasta esta fecha.
+        cedula_prefix (str, opcional): Solo usuarios cuya cédula comienza por este texto.
+        chunk_size (int): Tamaño aproximado en bytes de cada fragmento.
+
+        Retorna:
+        generator: Fragmentos (bytes) del archivo exportado, sin un orden de usuarios garantizado.
+        """
+        conditions, params = [], []
+        if born_from is not None:
+            conditions.append("fecha_nacimiento >= %s")
+            params.append(born_from)
+        if born_to is not None:
+            conditions.append("fecha_nacimiento <= %s")
+            params.append(born_to)
+        if cedula_prefix:
+            conditions.append("cedula_identidad LIKE %s")
+            params.append(cedula_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+        if format == "csv":
+            copy = "COPY (" + select_users(fields) + where + ") TO STDOUT WITH (FORMAT csv, HEADER)"
+        else:
+            # Cada fila es una sola columna de texto JSON. to_json() escapa los caracteres de control, así que con
+            # un delimitador y unas comillas de control el CSV de COPY nunca entrecomilla ni escapa la línea.
+            copy = (
+                "COPY (SELECT " + json_row(fields) + " FROM users" + where + ")"
+                " TO STDOUT WITH (FORMAT csv, DELIMITER E'\\x02', QUOTE E'\\x01')"
+            )
+
+        started = time.perf_counter()
+        chunks = queue.Queue(maxsize=8)
+        writer = _ChunkWriter(chunks, chunk_size)
+        result = {"rows": 0}
+        connection = get_read_connection()
+
+        def run():
+            try:
+                with connection.cursor() as cursor:
+                    # COPY escribe las fechas según DateStyle; se fija ISO para que el CSV no dependa del servidor.
+                    cursor.execute("SET LOCAL DateStyle = 'ISO, YMD'")
+                    cursor.copy_expert(cursor.mogrify(copy, params), writer)
+                    result["rows"] = cursor.rowcount
+                writer.flush()
+                writer.put(_EXPORT_DONE)
+            except BaseException as ex:
+                try:
+                    writer.put(ex)
+                except InterruptedError:
+                    pass
+
+        thread = threading.Thread(target=run, name="users-export", daemon=True)
+        thread.start()
+        finished = False
+        error = None
+        try:
+            while True:
+                item = chunks.get()
+                if item is _EXPORT_DONE:
+                    break
+                if isinstance(item, BaseException):
+                    error = item
+                    raise item
+                yield item
+            finished = True
+        finally:
+            if not finished and error is None:
+                # Quien lee abandonó la exportación: se detiene el COPY en el servidor y en el hilo.
+                writer.cancelled = True
+                connection.cancel()
+            thread.join()
+            # Una conexión con un COPY interrumpido se descarta en lugar de volver al pool.
+            connection.close(discard=not finished and error is None)
+            Metrics.observe("api_db_query_duration_seconds", time.perf_counter() - started, operation="export")
+            if error is not None:
+                Metrics.inc("api_db_errors_total", operation="export", error=type(error).__name__)
+            Metrics.inc("api_db_rows_total", result["rows"], operation="export")
+
+    @classmethod
+    @Metrics.instrument("page")
+    def page(self, limit, after=None, fields=None):
+        """
+        Recupera una página de usuarios ordenados por (cedula_identidad, id) usando paginación por clave.
+
+        En lugar de OFFSET se filtra con un predicado sobre la última clave vista, de modo que cualquier
+        página se resuelve recorriendo el índice users_cedula_id_idx desde esa posición. Los usuarios sin
+        cédula se ordenan al final, igual que en all().
+
+        Parámetros:
+        limit (int): Número máximo de usuarios de la página.
+        after (tuple, opcional): Última clave (cedula_identidad, id) vista en la página anterior.
+        fields (iterable, opcional): Campos a seleccionar; la cédula y el id se seleccionan siempre porque
+                                     forman la clave de la página siguiente.
+
+        Retorna:
+        tuple: Lista de objetos User y la clave (cedula_identidad, id) del último
+               usuario de la página, o None si no hay más páginas.
+        """
+        snapshot = UserMirror.current("page", ordered=True)
+        if snapshot is not None:
+            return snapshot.page(limit, after)
+        columns = select_users(fields, required=("id", "cedula_identidad"))
+        try:
+            with get_read_connection() as connection, connection.cursor(cursor_factory=UserCursor) as cursor:
+                # Se pide una fila más de las necesarias para saber si existe una página siguiente.
+                if after is None:
+                    cursor.execute(columns + " ORDER BY cedula_identidad ASC, id ASC LIMIT %s", (limit + 1,))
+                    users = cursor.fetchall()
+                elif after[0] is not None:
+                    cursor.execute(
+                        columns
+                        + " WHERE (cedula_identidad, id) > (%s, %s::uuid) ORDER BY cedula_identidad ASC, id ASC LIMIT %s",
+                        (after[0], after[1], limit + 1),
+                    )
+                    users = cursor.fetchall()
+                    # Al agotarse las cédulas se continúa con los usuarios sin cédula, que van al final.
+                    if len(users) <= limit:
+                        cursor.execute(
+                            columns + " WHERE cedula_identidad IS NULL ORDER BY id ASC LIMIT %s",
+                            (limit + 1 - len(users),),
+                        )
+                        users += cursor.fetchall()
+                else:
+                    cursor.execute(
+                        columns + " WHERE cedula_identidad IS NULL AND id > %s::uuid ORDER BY id ASC LIMIT %s",
+                        (after[1], limit + 1),
+                    )
+                    users = cursor.fetchall()
+
+            next_key = None
+            if len(users) > limit:
+                users = users[:limit]
+                next_key = (users[-1].cedula_identidad, users[-1].id)
+
+            return users, next_key
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    @Metrics.instrument("version")
+    def version(self):
+        """
+        Recupera el contador de versión de la tabla 'users', que el trigger users_bump_version incrementa en
+        cada escritura (ver database/sql/users_version.sql).
+
+        Retorna:
+        tuple: Número de versión (int) y fecha de la última modificación (datetime).
+        """
+        snapshot = UserMirror.current("version")
+        if snapshot is not None:
+            return snapshot.version, snapshot.updated_at
+        try:
+            with get_read_connection() as connection, connection.cursor() as cursor:
+                connection.execute_prepared(cursor, VERSION_QUERY)
+                row = cursor.fetchone()
+
+            if row is None:
+                raise Exception("No existe el contador de versión de la tabla users")
+            return row[0], row[1]
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    @Metrics.instrument("find")
+    def find(self, id, fields=None):
         """
         Busca un usuario por su id en la base de datos.
 
         Parámetros:
         id (str): id del usuario a buscar.
+        fields (iterable, opcional): Campos a seleccionar; por defecto, todos.
 
         Retorna:
-        dict or None: Diccionario JSON representando el usuario encontrado, o None si no se encontró.
+        User or None: Objeto User encontrado, o None si no se encontró.
         """
+        snapshot = UserMirror.current("find")
+        if snapshot is not None:
+            try:
+                # Los ids de la copia están en formato canónico; un id inválido se deja a la base de datos, que
+                # responde con su propio error.
+                return snapshot.users.get(str(uuid.UUID(id)))
+            except (TypeError, ValueError, AttributeError):
+                pass
         try:
-            connection = get_connection()
+            with get_read_connection() as connection, connection.cursor(cursor_factory=UserCursor) as cursor:
+                connection.execute_prepared(cursor, select_users(fields) + " WHERE id = %s", (id,))
+                user = cursor.fetchone()
 
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "SELECT id, cedula_identidad, nombre, primer_apellido, segundo_apellido, fecha_nacimiento FROM users WHERE id = %s",
-                    (id,),
+            return user
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    @Metrics.instrument("find_many")
+    def find_many(self, ids, fields=None):
+        """
+        Busca varios usuarios por su id con una sola consulta (WHERE id = ANY(...)).
+
+        Parámetros:
+        ids (list): ids de los usuarios a buscar, en formato UUID canónico (minúsculas con guiones).
+        fields (iterable, opcional): Campos a seleccionar; el id se selecciona siempre para ordenar el resultado.
+
+        Retorna:
+        list: Objetos User encontrados, en el mismo orden de `ids`. Los ids que no existen se omiten.
+        """
+        snapshot = UserMirror.current("find_many")
+        if snapshot is not None:
+            return [snapshot.users[id] for id in ids if id in snapshot.users]
+        try:
+            with get_read_connection() as connection, connection.cursor(cursor_factory=UserCursor) as cursor:
+                connection.execute_prepared(
+                    cursor, select_users(fields, required=("id",)) + " WHERE id = ANY(%s::text[]::uuid[])", (list(ids),)
                 )
-                row = cursor.fetchone()
-                user = None
-                if row != None:
-                    user = User(row[0], row[1], row[2], row[3], row[4], row[5])
-                    user = user.to_JSON()
+                found = {user.id: user for user in cursor.fetchall()}
 
-            connection.close()
-            return user
+            return [found[id] for id in ids if id in found]
         except Exception as ex:
             raise Exception(ex)
 
     @classmethod
-    def averageAge(self):
+    @Metrics.instrument("search")
+    def search(self, terms, limit=20, candidates=1000, fields=None):
         """
-        Calcula el promedio de edades de todos los usuarios en la base de datos.
+        Busca usuarios cuyo nombre, apellidos o cédula comiencen por los términos indicados, sin distinguir
+        mayúsculas ni acentos. Cada término debe coincidir con alguno de esos campos.
+
+        Las coincidencias se resuelven con los índices de database/sql/users_search.sql. Para acotar el costo de
+        los términos muy comunes, se toman como máximo `candidates` coincidencias exactas y `candidates`
+        coincidencias por prefijo, y se ordenan solo esas.
+
+        Parámetros:
+        terms (list): Términos de búsqueda.
+        limit (int): Número máximo de usuarios a retornar.
+        candidates (int): Número máximo de coincidencias que se ordenan por cada tipo de coincidencia.
+        fields (iterable, opcional): Campos a seleccionar; por defecto, todos.
 
         Retorna:
-        dict: Un diccionario con la clave 'promedio_edad' y el valor del promedio de edades calculado.
+        list: Objetos User ordenados de mayor a menor relevancia: primero las coincidencias exactas y después
+        las de prefijo, y a igual relevancia por apellidos, nombre e id.
         """
+        params = {"limit": limit, "candidates": candidates}
+        exact, prefix, score = [], [], []
+        for index, term in enumerate(terms):
+            # Los comodines de LIKE del término se escapan para que se busquen literalmente.
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.update({"t%d" % index: term, "p%d" % index: escaped + "%"})
+            # El término se normaliza en SQL con la misma expresión de los índices; al ser IMMUTABLE,
+            # PostgreSQL la evalúa al planificar y puede usar el prefijo constante en el índice.
+            equals = ["%s = lower(f_unaccent(%%(t%d)s))" % (column, index) for column in SEARCH_COLUMNS]
+            equals.append("cedula_identidad = %%(t%d)s" % index)
+            likes = ["%s LIKE lower(f_unaccent(%%(p%d)s))" % (column, index) for column in SEARCH_COLUMNS]
+            likes.append("cedula_identidad LIKE %%(p%d)s" % index)
+            exact.append("(" + " OR ".join(equals) + ")")
+            prefix.append("(" + " OR ".join(likes) + ")")
+            score.extend("2 * (%s)::int" % condition for condition in equals)
+            score.extend("(%s)::int" % condition for condition in likes)
+
+        query = (
+            select_users(fields)
+            + " WHERE id IN ((SELECT id FROM users WHERE " + " AND ".join(exact) + " LIMIT %(candidates)s)"
+            + " UNION ALL (SELECT id FROM users WHERE " + " AND ".join(prefix) + " LIMIT %(candidates)s))"
+            + " ORDER BY " + " + ".join(score) + " DESC, primer_apellido, segundo_apellido, nombre, id"
+            + " LIMIT %(limit)s"
+        )
         try:
-            connection = get_connection()
+            with get_read_connection() as connection, connection.cursor(cursor_factory=UserCursor) as cursor:
+                # Con LIMIT y términos que suelen aparecer juntos, el planificador puede estimar mal la selectividad
+                # y preferir un recorrido secuencial de la tabla. Todas las condiciones tienen índice, así que se
+                # descarta esa opción solo para esta transacción.
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute(query, params)
+                return cursor.fetchall()
+        except Exception as ex:
+            raise Exception(ex)
 
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "SELECT AVG(EXTRACT(YEAR FROM AGE(NOW(), fecha_nacimiento))) as promedio_edad FROM users"
-                )
+    @classmethod
+    @Metrics.instrument("find_json")
+    def find_json(self, id):
+        """
+        Busca un usuario por su id en la base de datos y lo retorna como un objeto JSON construido por PostgreSQL.
+
+        Parámetros:
+        id (str): id del usuario a buscar.
+
+        Retorna:
+        str or None: Texto del objeto JSON representando el usuario encontrado, o None si no se encontró.
+        """
+        try:
+            with get_read_connection() as connection, connection.cursor() as cursor:
+                connection.execute_prepared(cursor, "SELECT " + JSON_ROW + " FROM users WHERE id = %s", (id,))
                 row = cursor.fetchone()
 
-            connection.close()
-            return row[0]
+            return row[0] if row is not None else None
         except Exception as ex:
             raise Exception(ex)
 
     @classmethod
+    def averageAge(self, as_of=None):
+        """
+        Calcula el promedio de edades de todos los usuarios en la base de datos.
+
+        El promedio se obtiene del almacén agregado de fechas de nacimiento (ver AgeStatsModel) en lugar de
+        recorrer toda la tabla 'users'.
+
+        Parámetros:
+        as_of (date, opcional): Fecha a la que se calculan las edades; por defecto, hoy.
+
+        Retorna:
+        float or None: Promedio de edades calculado, o None si no hay usuarios.
+        """
+        return AgeStatsModel.average(as_of)
+
+    @classmethod
+    @Metrics.instrument("store")
     def store(self, user):
         """
         Agrega un nuevo usuario a la base de datos.
@@ -105,29 +627,77 @@ class UserModel:
         int: Número de filas afectadas en la base de datos.
         """
         try:
-            connection = get_connection()
-
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "INSERT INTO users (id, cedula_identidad, nombre, primer_apellido, segundo_apellido, fecha_nacimiento) VALUES(%s,%s,%s,%s,%s,%s)",
-                    (
-                        user.id,
-                        user.cedula_identidad,
-                        user.nombre,
-                        user.primer_apellido,
-                        user.segundo_apellido,
-                        user.fecha_nacimiento,
-                    ),
-                )
-                affected_rows = cursor.rowcount
-                connection.commit()
+            affected_rows = execute_write(
+                INSERT_USER,
+                (
+                    user.id,
+                    user.cedula_identidad,
+                    user.nombre,
+                    user.primer_apellido,
+                    user.segundo_apellido,
+                    user.fecha_nacimiento,
+                ),
+            )
 
-            connection.close()
             return affected_rows
         except Exception as ex:
             raise ex
 
     @classmethod
+    @Metrics.instrument("bulk_store")
+    def bulk_store(self, users, method="copy"):
+        """
+        Agrega un lote de usuarios a la base de datos en una sola transacción.
+
+        Con el método "copy" las filas se envían con COPY FROM STDIN en formato CSV; con "values" se
+        insertan con sentencias INSERT de varias filas (execute_values). Si alguna fila falla se deshace
+        el lote completo.
+
+        Parámetros:
+        users (list): Lista de objetos User a agregar.
+        method (str): "copy" o "values".
+
+        Retorna:
+        int: Número de filas insertadas en la base de datos.
+        """
+        rows = [
+            (
+                user.id,
+                user.cedula_identidad,
+                user.nombre,
+                user.primer_apellido,
+                user.segundo_apellido,
+                user.fecha_nacimiento,
+            )
+            for user in users
+        ]
+        try:
+            with get_connection() as connection, connection.cursor() as cursor:
+                if method == "copy":
+                    # QUOTE_NONNUMERIC entrecomilla las cadenas, así que un valor vacío se distingue de NULL.
+                    buffer = io.StringIO()
+                    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+                    buffer.seek(0)
+                    cursor.copy_expert(
+                        "COPY users (id, cedula_identidad, nombre, primer_apellido, segundo_apellido, fecha_nacimiento) FROM STDIN WITH (FORMAT csv)",
+                        buffer,
+                    )
+                else:
+                    execute_values(
+                        cursor,
+                        "INSERT INTO users (id, cedula_identidad, nombre, primer_apellido, segundo_apellido, fecha_nacimiento) VALUES %s",
+                        rows,
+                        page_size=1000,
+                    )
+                connection.commit()
+                remember_write(current_lsn(connection))
+
+            return len(rows)
+        except Exception as ex:
+            raise ex
+
+    @classmethod
+    @Metrics.instrument("update")
     def update(self, user):
         """
         Actualiza un usuario existente en la base de datos.
@@ -139,29 +709,24 @@ class UserModel:
         int: Número de filas afectadas en la base de datos.
         """
         try:
-            connection = get_connection()
-
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "UPDATE users SET cedula_identidad = %s, nombre = %s, primer_apellido = %s, segundo_apellido = %s, fecha_nacimiento = %s WHERE id = %s",
-                    (
-                        user.cedula_identidad,
-                        user.nombre,
-                        user.primer_apellido,
-                        user.segundo_apellido,
-                        user.fecha_nacimiento,
-                        user.id,
-                    ),
-                )
-                affected_rows = cursor.rowcount
-                connection.commit()
+            affected_rows = execute_write(
+                UPDATE_USER,
+                (
+                    user.cedula_identidad,
+                    user.nombre,
+                    user.primer_apellido,
+                    user.segundo_apellido,
+                    user.fecha_nacimiento,
+                    user.id,
+                ),
+            )
 
-            connection.close()
             return affected_rows
         except Exception as ex:
             raise ex
 
     @classmethod
+    @Metrics.instrument("delete")
     def delete(self, user):
         """
         Elimina un usuario de la base de datos.
@@ -173,14 +738,98 @@ class UserModel:
         int: Número de filas afectadas en la base de datos.
         """
         try:
-            connection = get_connection()
-
-            with connection.cursor() as cursor:
-                cursor.execute("DELETE FROM users WHERE id = %s", (user.id,))
-                affected_rows = cursor.rowcount
-                connection.commit()
+            affected_rows = execute_write(DELETE_USER, (user.id,))
 
-            connection.close()
             return affected_rows
         except Exception as ex:
             raise ex
+
+    @classmethod
+    @Metrics.instrument("bulk_update")
+    def bulk_update(self, changes):
+        """
+        Actualiza parcialmente un lote de usuarios en una sola transacción.
+
+        Los cambios se agrupan por el conjunto de campos que modifican y cada grupo se aplica con una sola sentencia
+        UPDATE ... FROM (VALUES ...), que solo asigna esos campos. Si alguna sentencia falla se deshace el lote
+        completo.
+
+        Antes de actualizar se bloquean todas las filas del lote en orden de id, y los grupos y sus filas también
+        van en orden, para que dos actualizaciones masivas que se solapan tomen los candados en el mismo orden. Si
+        aun así la transacción pierde un interbloqueo (por ejemplo, con los candados que toman los triggers en
+        table_versions y users_birth_counts), el lote se repite una vez.
+
+        Parámetros:
+        changes (list): Tuplas (id, dict) con el id del usuario en formato UUID canónico y los campos a modificar
+                        con su nuevo valor. Cada id debe aparecer una sola vez.
+
+        Retorna:
+        list: ids de los usuarios actualizados; los que no existen se omiten.
+        """
+        shapes = {}
+        for id, values in changes:
+            # Los campos de cada grupo van en el orden de User.FIELDS, para que el mismo conjunto de campos genere
+            # siempre la misma sentencia.
+            columns = tuple(field for field in User.FIELDS if field in values)
+            shapes.setdefault(columns, []).append((id,) + tuple(values[field] for field in columns))
+        groups = [(columns, sorted(rows, key=lambda row: row[0])) for columns, rows in sorted(shapes.items())]
+
+        try:
+            for attempt in (1, 2):
+                updated = []
+                try:
+                    with get_connection() as connection, connection.cursor() as cursor:
+                        cursor.execute(
+                            "SELECT 1 FROM users WHERE id = ANY(%s::uuid[]) ORDER BY id FOR UPDATE",
+                            ([id for id, _ in changes],),
+                        )
+                        for columns, rows in groups:
+                            # VALUES no conoce los tipos de las columnas de destino: el id y la fecha se convierten
+                            # en la plantilla, y las cadenas se asignan como texto.
+                            template = "(%s::uuid" + "".join(
+                                ", %s::date" if column == "fecha_nacimiento" else ", %s" for column in columns
+                            ) + ")"
+                            updated += execute_values(
+                                cursor,
+                                "UPDATE users AS u SET "
+                                + ", ".join("%s = v.%s" % (column, column) for column in columns)
+                                + " FROM (VALUES %s) AS v (id, " + ", ".join(columns) + ")"
+                                + " WHERE u.id = v.id RETURNING u.id::text",
+                                rows,
+                                template=template,
+                                page_size=len(rows),
+                                fetch=True,
+                            )
+                        connection.commit()
+                        remember_write(current_lsn(connection))
+
+                    return [row[0] for row in updated]
+                except RETRYABLE_ERRORS:
+                    # La otra transacción ya tiene sus candados y termina; el lote se deshizo completo.
+                    if attempt == 2:
+                        raise
+        except Exception as ex:
+            raise Exception(ex)
+
+    @classmethod
+    @Metrics.instrument("bulk_delete")
+    def bulk_delete(self, ids):
+        """
+        Elimina un lote de usuarios con una sola sentencia DELETE ... WHERE id = ANY(...).
+
+        Parámetros:
+        ids (list): ids de los usuarios a eliminar, en formato UUID canónico.
+
+        Retorna:
+        list: ids de los usuarios eliminados; los que no existen se omiten.
+        """
+        try:
+            with get_connection() as connection, connection.cursor() as cursor:
+                cursor.execute("DELETE FROM users WHERE id = ANY(%s::uuid[]) RETURNING id::text", (list(ids),))
+                deleted = [row[0] for row in cursor.fetchall()]
+                connection.commit()
+                remember_write(current_lsn(connection))
+
+            return deleted
+        except Exception as ex:
+            raise Exception(ex)
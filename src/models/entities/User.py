@@ -12,8 +12,16 @@ class User:
     - primer_apellido (str): Primer apellido del usuario.
     - segundo_apellido (str): Segundo apellido del usuario.
     - fecha_nacimiento (str): Fecha de nacimiento del usuario en formato de cadena (YYYY-MM-DD).
+
+    Usa __slots__ para no crear un diccionario de atributos por instancia, lo que reduce la memoria y el tiempo
+    de creación en los listados grandes.
     """
 
+    # Atributos del usuario en el orden de las columnas de la tabla 'users'.
+    FIELDS = ("id", "cedula_identidad", "nombre", "primer_apellido", "segundo_apellido", "fecha_nacimiento")
+
+    __slots__ = FIELDS
+
     def __init__(
         self,
         id,
@@ -41,18 +49,18 @@ class User:
         self.segundo_apellido = segundo_apellido
         self.fecha_nacimiento = fecha_nacimiento
 
-    def to_JSON(self):
+    def to_JSON(self, fields=None):
         """
         Convierte el objeto User a un diccionario JSON.
 
+        Parámetros:
+        fields (iterable, opcional): Atributos a incluir; por defecto, todos.
+
         Retorna:
         dict: Diccionario JSON con los atributos del usuario.
         """
-        return {
-            "id": self.id,
-            "cedula_identidad": self.cedula_identidad,
-            "nombre": self.nombre,
-            "primer_apellido": self.primer_apellido,
-            "segundo_apellido": self.segundo_apellido,
-            "fecha_nacimiento": DateFormat.convert_date(self.fecha_nacimiento),
-        }
+        data = {}
+        for field in fields if fields is not None else self.FIELDS:
+            value = getattr(self, field)
+            data[field] = DateFormat.convert_date(value) if field == "fecha_nacimiento" else value
+        return data
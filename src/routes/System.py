@@ -1,6 +1,10 @@
 # Importa las bibliotecas necesarias de Flask y decouple.
-from flask import Blueprint, jsonify
+import hmac
+
+from flask import Blueprint, Response, jsonify, request
 from decouple import config
+from utils.Metrics import Metrics
+from utils.SlowQueryLog import SlowQueryLog
 
 # Crea un Blueprint para las rutas del sistema. Un Blueprint es una forma de organizar las rutas en una aplicación Flask.
 main = Blueprint("System_blueprint", __name__)
@@ -40,3 +44,63 @@ def system_info():
             jsonify({"message": str(ex)}),
             500,
         )  # Código de estado HTTP 500 en caso de error
+
+
+# Define una ruta para "/metrics" que expone las métricas de la API en el formato de texto de Prometheus.
+@main.route("/metrics")
+def metrics():
+    """
+    Retorna las métricas de latencia, errores y filas de la API, sumadas entre todos los procesos trabajadores
+    que comparten METRICS_DIR.
+
+    Retorna:
+    Response: Texto en el formato de exposición de Prometheus (version 0.0.4).
+    """
+    try:
+        return Response(Metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500.
+        return jsonify({"message": str(ex)}), 500
+
+
+# Define una función que verifica el token de administración de la solicitud (cabecera "Authorization: Bearer
+# <token>"). Retorna None si es válido, o la respuesta de error si no lo es. Sin ADMIN_TOKEN configurado, las rutas
+# de administración no existen.
+def require_admin():
+    token = config("ADMIN_TOKEN", default="")
+    if not token:
+        return jsonify({"message": "Not found"}), 404
+    scheme, _, value = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(value.strip().encode("utf-8"), token.encode("utf-8")):
+        return jsonify({"message": "Token de administración inválido"}), 401, {"WWW-Authenticate": "Bearer"}
+    return None
+
+
+# Define una ruta de administración para "/consultas-lentas" que muestra las últimas consultas lentas.
+@main.route("/consultas-lentas")
+def slow_queries():
+    """
+    Retorna las últimas consultas que superaron SLOW_QUERY_THRESHOLD_MS, de la más reciente a la más antigua, con
+    sus parámetros, su duración, la ruta que las ejecutó y, para una muestra, su plan de ejecución. Requiere el token
+    de administración (ADMIN_TOKEN).
+
+    Parámetros de consulta:
+    - limit (int, opcional): Número máximo de consultas a retornar; por defecto, SLOW_QUERY_LOG_SIZE.
+
+    Retorna:
+    tuple: Diccionario JSON con el umbral en milisegundos y la lista de consultas, y el código de estado HTTP.
+    """
+    denied = require_admin()
+    if denied is not None:
+        return denied
+    try:
+        limit = request.args.get("limit", type=int)
+        if limit is not None and limit < 1:
+            return jsonify({"message": "limit debe ser un entero positivo"}), 400
+        return (
+            jsonify({"threshold_ms": SlowQueryLog.THRESHOLD * 1000, "queries": SlowQueryLog.entries(limit)}),
+            200,
+        )
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500.
+        return jsonify({"message": str(ex)}), 500
@@ -1,50 +1,520 @@
-# Importa las bibliotecas necesarias de Flask, uuid y los modelos de usuario.
-from flask import Blueprint, jsonify, request
+# Importa las bibliotecas necesarias de Flask, decouple, uuid y los modelos de usuario.
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from decouple import config
+import datetime
+import itertools
+import math
 import uuid
 from models.entities.User import User
+from models.AgeStatsModel import AgeStatsModel
+from models import UserMirror
 from models.UserModel import UserModel
+from utils.Admission import Admission
+from utils.BulkReader import BulkReader
+from utils.Compression import Compression
+from utils.Cursor import Cursor
+from utils.HttpCache import HttpCache
+from utils.JsonText import JsonText
+from utils.UserValidator import UserValidator
 
 # Crea un Blueprint para las rutas de usuario. Un Blueprint es una forma de organizar las rutas en una aplicación Flask.
 main = Blueprint("user_blueprint", __name__)
 
+# Comprime las respuestas grandes de este Blueprint según el encabezado Accept-Encoding del cliente.
+main.after_request(Compression.compress_response)
+# Limita las solicitudes concurrentes de cada ruta y rechaza con 503 las que no pueden atenderse a tiempo.
+Admission.init_app(main)
+
+# Número de filas que se leen por lote al transmitir el listado de usuarios.
+STREAM_BATCH_SIZE = config("USERS_STREAM_BATCH_SIZE", default=1000, cast=int)
+# Tamaño de página por defecto y máximo permitido en la paginación por clave.
+PAGE_DEFAULT_LIMIT = config("USERS_PAGE_DEFAULT_LIMIT", default=100, cast=int)
+PAGE_MAX_LIMIT = config("USERS_PAGE_MAX_LIMIT", default=1000, cast=int)
+# Filas por transacción y método de inserción ("copy" o "values") de la carga masiva.
+BULK_BATCH_SIZE = config("USERS_BULK_BATCH_SIZE", default=5000, cast=int)
+BULK_METHOD = config("USERS_BULK_METHOD", default="copy")
+# Número máximo de ids por consulta de varios usuarios.
+MULTIGET_MAX_IDS = config("USERS_MULTIGET_MAX_IDS", default=1000, cast=int)
+# Número máximo de cambios o ids por solicitud de actualización o eliminación masiva.
+BULK_MUTATION_MAX = config("USERS_BULK_MUTATION_MAX", default=10000, cast=int)
+# Resultados por defecto y máximos de la búsqueda, longitud mínima del texto buscado, número máximo de términos y
+# número máximo de coincidencias que se ordenan por relevancia.
+SEARCH_DEFAULT_LIMIT = config("USERS_SEARCH_DEFAULT_LIMIT", default=20, cast=int)
+SEARCH_MAX_LIMIT = config("USERS_SEARCH_MAX_LIMIT", default=100, cast=int)
+SEARCH_MIN_LENGTH = config("USERS_SEARCH_MIN_LENGTH", default=2, cast=int)
+SEARCH_MAX_TERMS = config("USERS_SEARCH_MAX_TERMS", default=5, cast=int)
+SEARCH_CANDIDATES = config("USERS_SEARCH_CANDIDATES", default=1000, cast=int)
+# Si es True, las lecturas de usuarios envían el JSON generado por PostgreSQL sin decodificarlo en Python.
+JSON_PASSTHROUGH = config("USERS_JSON_PASSTHROUGH", default=False, cast=bool)
+# Tipos de contenido de los formatos de exportación.
+EXPORT_MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _passthrough_enabled():
+    """
+    Indica si las lecturas pueden enviar el JSON generado por PostgreSQL tal cual.
+
+    Solo se activa si USERS_JSON_PASSTHROUGH está habilitado y jsonify produciría exactamente el mismo texto:
+    claves ordenadas, escapes ASCII y salida compacta (fuera del modo de depuración), de modo que el cuerpo
+    de la respuesta no cambie ni un byte. Tampoco se usa mientras la copia en memoria (USERS_MIRROR) está al
+    día, porque entonces las lecturas se atienden desde ella sin consultar la base de datos.
+
+    Retorna:
+    bool: True si se puede usar el JSON generado por la base de datos.
+    """
+    return JSON_PASSTHROUGH and current_app.json.compact_output() and UserMirror.current() is None
+
+
+def _passthrough_response(text):
+    """
+    Construye una respuesta con el JSON generado por PostgreSQL, terminado en salto de línea como jsonify.
+
+    Parámetros:
+    text (str): Texto JSON.
+
+    Retorna:
+    Response: Respuesta con el mimetype de JSON de la aplicación.
+    """
+    return Response(JsonText.to_ascii(text + "\n"), mimetype=current_app.json.mimetype)
+
+
+def _fields(value=None):
+    """
+    Lee la proyección de campos pedida en el parámetro de consulta `fields` (separados por comas) o en el valor
+    indicado (lista de nombres o texto separado por comas).
+
+    Retorna:
+    tuple or None: Campos de User pedidos, o None si no se indicó una proyección.
+
+    Raises:
+    ValueError: Si algún campo no existe o el valor no es una lista de textos ni un texto.
+    """
+    if value is None:
+        value = request.args.get("fields")
+    if value is None:
+        return None
+    if isinstance(value, str):
+        fields = [field.strip() for field in value.split(",")]
+    elif isinstance(value, list) and not [field for field in value if not isinstance(field, str)]:
+        # (La función all() de Python queda oculta por la vista all de este módulo.)
+        fields = value
+    else:
+        raise ValueError("fields debe ser una lista de nombres de campos o un texto separado por comas")
+    fields = tuple(dict.fromkeys(field for field in fields if field))
+    unknown = [field for field in fields if field not in User.FIELDS]
+    if not fields or unknown:
+        raise ValueError("Campos inválidos en fields; use: %s" % ", ".join(User.FIELDS))
+    return fields
+
+
+def _ids(values):
+    """
+    Valida y normaliza una lista de ids de usuario.
+
+    Parámetros:
+    values (list): ids recibidos.
+
+    Retorna:
+    list: ids en formato UUID canónico, sin repetir y en el orden recibido.
+
+    Raises:
+    ValueError: Si algún id no es un UUID o se supera USERS_MULTIGET_MAX_IDS.
+    """
+    if not isinstance(values, list):
+        raise ValueError("Se esperaba una lista de ids")
+    if len(values) > MULTIGET_MAX_IDS:
+        raise ValueError("Se permiten como máximo %d ids por consulta" % MULTIGET_MAX_IDS)
+    try:
+        return list(dict.fromkeys(str(uuid.UUID(value)) for value in values))
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError("Todos los ids deben ser UUID válidos")
+
+
+def _bulk_items(description):
+    """
+    Lee el cuerpo de una actualización o eliminación masiva: un arreglo JSON de hasta USERS_BULK_MUTATION_MAX
+    elementos.
+
+    Parámetros:
+    description (str): Qué debe contener el arreglo, para el mensaje de error.
+
+    Retorna:
+    list: Elementos del arreglo.
+
+    Raises:
+    ValueError: Si el cuerpo no es un arreglo o supera el máximo.
+    """
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        raise ValueError("Se esperaba una lista de %s" % description)
+    if len(items) > BULK_MUTATION_MAX:
+        raise ValueError("Se permiten como máximo %d elementos por solicitud" % BULK_MUTATION_MAX)
+    return items
+
+
+def _bulk_apply(entries, results, apply, done):
+    """
+    Aplica las operaciones válidas de una actualización o eliminación masiva en partes de USERS_BULK_BATCH_SIZE,
+    cada una en su propia transacción, y registra el resultado de cada una. Si la base de datos rechaza una parte,
+    todas sus operaciones se marcan con el error y las demás partes no se ven afectadas.
+
+    Si no hay una conexión libre a tiempo, el error se propaga para que la ruta responda 503: las dos operaciones
+    son idempotentes, así que el cliente puede repetir la solicitud completa aunque se hayan aplicado algunas partes.
+
+    Parámetros:
+    entries (list): Tuplas (número de elemento, id, operación) de las operaciones válidas.
+    results (list): Resultados por elemento del arreglo recibido; se completan los de `entries`.
+    apply (function): Función del modelo que recibe las operaciones de una parte y retorna los ids afectados.
+    done (str): Estado de los elementos cuyo usuario fue afectado ("updated" o "deleted").
+
+    Retorna:
+    int: Número total de usuarios afectados.
+    """
+    total = 0
+    for start in range(0, len(entries), BULK_BATCH_SIZE):
+        chunk = entries[start : start + BULK_BATCH_SIZE]
+        try:
+            affected = set(apply([operation for _, _, operation in chunk]))
+        except Exception as ex:
+            if Admission.saturated(ex):
+                raise
+            for row, id, _ in chunk:
+                results[row - 1] = {"row": row, "id": id, "status": "error", "error": str(ex)}
+            continue
+        total += len(affected)
+        for row, id, _ in chunk:
+            results[row - 1] = {"row": row, "id": id, "status": done if id in affected else "not_found"}
+    return total
+
+
+def _stream_users(batches, fields=None):
+    """
+    Genera el listado de usuarios como un arreglo JSON escrito por partes, un fragmento por lote.
+
+    Parámetros:
+    batches (iterable): Lotes de objetos User (ver UserModel.stream()).
+    fields (tuple, opcional): Campos a incluir; por defecto, todos.
+
+    Retorna:
+    generator: Generador de fragmentos de texto que juntos forman el arreglo JSON.
+    """
+    encode = current_app.json.encoder(fields)
+    separator = ""
+    yield "["
+    for batch in batches:
+        yield separator + ",".join(map(encode, batch))
+        separator = ","
+    yield "]\n"
+
+
+def _as_of():
+    """
+    Lee la fecha de referencia de las estadísticas de edad del parámetro de consulta `fecha`.
+
+    Retorna:
+    date: Fecha indicada en formato "YYYY-MM-DD", o la fecha actual si no se indicó.
+
+    Raises:
+    ValueError: Si la fecha no tiene el formato esperado.
+    """
+    fecha = request.args.get("fecha")
+    if not fecha:
+        return datetime.date.today()
+    try:
+        return datetime.date.fromisoformat(fecha)
+    except ValueError:
+        raise ValueError("El parámetro fecha debe tener el formato YYYY-MM-DD")
+
+
+def _age_variant():
+    """
+    Retorna el texto que distingue la ETag de las estadísticas de edad: la fecha de referencia pedida o, si no
+    se indicó, el día actual, ya que las edades cambian con la fecha aunque la tabla no cambie.
+    """
+    return request.args.get("fecha") or datetime.date.today().isoformat()
+
+
+def _page_users(fields=None):
+    """
+    Responde una página del listado de usuarios según los parámetros `limit` y `after`.
+
+    Parámetros:
+    fields (tuple, opcional): Campos a incluir; por defecto, todos.
+
+    El token de la página siguiente se envía en la cabecera X-Next-Cursor y en una cabecera Link con rel="next";
+    si no hay más páginas, ambas se omiten.
+
+    Retorna:
+    tuple: Respuesta JSON con la lista de usuarios y el código de estado HTTP.
+    """
+    try:
+        limit = int(request.args.get("limit", PAGE_DEFAULT_LIMIT))
+        if limit < 1 or limit > PAGE_MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return jsonify({"message": "El parámetro limit debe ser un entero entre 1 y %d" % PAGE_MAX_LIMIT}), 400
+
+    after = request.args.get("after")
+    try:
+        after = Cursor.decode(after) if after else None
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+
+    users, next_key = UserModel.page(limit, after, fields)
+    response = current_app.json.users_response(users, fields)
+    if next_key is not None:
+        token = Cursor.encode(*next_key)
+        response.headers["X-Next-Cursor"] = token
+        response.headers["Link"] = '<%s?limit=%d&after=%s>; rel="next"' % (request.base_url, limit, token)
+    return response, 200
+
 
 # Define una ruta para "/" que recupera todos los usuarios de la base de datos.
 @main.route("/")
+@HttpCache.conditional(UserModel.version)
 def all():
     """
     Recupera todos los usuarios de la base de datos.
 
+    Parámetros de consulta:
+    - stream (str, opcional): Si es "1" o "true", el listado se transmite por partes (chunked)
+      leyendo la tabla por lotes con un cursor del lado del servidor.
+    - limit (int, opcional): Activa la paginación por clave y fija el tamaño de la página.
+    - after (str, opcional): Token opaco de la página anterior (cabecera X-Next-Cursor).
+    - ids (str, opcional): ids separados por comas; retorna solo esos usuarios, en el mismo orden.
+    - fields (str, opcional): Campos a incluir separados por comas; por defecto, todos.
+
     Retorna:
     list: Lista de diccionarios JSON representando usuarios.
     """
     try:
+        fields = _fields()
+        ids = _ids(request.args["ids"].split(",")) if "ids" in request.args else None
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+    try:
+        # Si se piden ids concretos se resuelven con una sola consulta.
+        if ids is not None:
+            return current_app.json.users_response(UserModel.find_many(ids, fields), fields)
+        # En modo streaming la respuesta se escribe por lotes, así que la memoria no crece con la tabla.
+        if request.args.get("stream", "").lower() in ("1", "true"):
+            batches = UserModel.stream(STREAM_BATCH_SIZE, fields)
+            # Igual que en la exportación, se espera el primer lote antes de responder, para que un error de la base
+            # de datos llegue como un 500 (o un 503) y no como un arreglo cortado.
+            first = next(batches, None)
+            body = _stream_users(itertools.chain(() if first is None else (first,), batches), fields)
+            response = Response(stream_with_context(body), mimetype="application/json")
+            # Si el cliente se desconecta antes del final, cerrar el generador libera la conexión.
+            response.call_on_close(batches.close)
+            return response
+        # Si se pide una página, se resuelve con paginación por clave en lugar de recuperar toda la tabla.
+        if "limit" in request.args or "after" in request.args:
+            return _page_users(fields)
+        # En modo de paso directo PostgreSQL genera el JSON y se envía sin convertirlo a objetos de Python.
+        if fields is None and _passthrough_enabled():
+            return _passthrough_response(UserModel.all_json())
         # Utiliza el método all() del modelo de usuario para recuperar todos los usuarios.
-        users = UserModel.all()
-        return jsonify(users)
+        users = UserModel.all(fields)
+        return current_app.json.users_response(users, fields)
     except Exception as ex:
-        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500.
-        return jsonify({"mesage": str(ex)}), 500
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
 
 
 # Define una ruta para "/promedio-edad" que calcula el promedio de edad de todos los usuarios.
 @main.route("/promedio-edad")
+@HttpCache.conditional(UserModel.version, variant=_age_variant)
 def promedio_edad():
     """
     Obtiene el promedio de edad de todos los usuarios en la base de datos.
 
+    Parámetros de consulta:
+    - fecha (str, opcional): Fecha "YYYY-MM-DD" a la que se calculan las edades; por defecto, hoy.
+
     Retorna:
     dict: Un diccionario con la clave 'promedio_edad' y el valor del promedio de edades calculado.
     """
+    try:
+        as_of = _as_of()
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
     try:
         # Utiliza el método averageAge() del modelo de usuario para calcular el promedio de edad.
-        return jsonify({"promedio_edad": UserModel.averageAge()})
+        return jsonify({"promedio_edad": UserModel.averageAge(as_of)})
     except Exception as ex:
-        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500.
-        return jsonify({"message": str(ex)}), 500
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+# Define una ruta para "/edades/histograma" que agrupa las edades de los usuarios en intervalos.
+@main.route("/edades/histograma")
+@HttpCache.conditional(UserModel.version, variant=_age_variant)
+def histograma_edad():
+    """
+    Obtiene el histograma de edades de los usuarios.
+
+    Parámetros de consulta:
+    - ancho (int, opcional): Ancho de cada intervalo en años; por defecto 10.
+    - fecha (str, opcional): Fecha "YYYY-MM-DD" a la que se calculan las edades; por defecto, hoy.
+
+    Retorna:
+    dict: Un diccionario con la clave 'histograma' y la lista de intervalos ('desde', 'hasta', 'total').
+    """
+    try:
+        as_of = _as_of()
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+    try:
+        width = int(request.args.get("ancho", 10))
+        if width < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"message": "El parámetro ancho debe ser un entero positivo"}), 400
+    try:
+        return jsonify({"histograma": AgeStatsModel.histogram(as_of, width)})
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+# Define una ruta para "/edades/percentiles" que calcula percentiles de edad (por defecto la mediana y el p90).
+@main.route("/edades/percentiles")
+@HttpCache.conditional(UserModel.version, variant=_age_variant)
+def percentiles_edad():
+    """
+    Obtiene percentiles de la edad de los usuarios.
+
+    Parámetros de consulta:
+    - p (str, opcional): Percentiles separados por comas, entre 0 y 100; por defecto "50,90".
+    - fecha (str, opcional): Fecha "YYYY-MM-DD" a la que se calculan las edades; por defecto, hoy.
+
+    Retorna:
+    dict: Un diccionario con la clave 'percentiles' que asocia cada percentil con la edad calculada.
+    """
+    try:
+        as_of = _as_of()
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+    try:
+        ps = [float(p) for p in request.args.get("p", "50,90").split(",")]
+        # float() acepta "nan", que no es menor que 0 ni mayor que 100.
+        if any(not math.isfinite(p) or p < 0 or p > 100 for p in ps):
+            raise ValueError
+    except ValueError:
+        return jsonify({"message": "El parámetro p debe ser una lista de números entre 0 y 100"}), 400
+    try:
+        result = AgeStatsModel.percentiles(as_of, ps)
+        return jsonify({"percentiles": {"%g" % p: age for p, age in result.items()}})
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+# Define una ruta para "/buscar" que busca usuarios por nombre, apellidos o cédula.
+@main.route("/buscar")
+@HttpCache.conditional(UserModel.version)
+def search():
+    """
+    Busca usuarios cuyo nombre, apellidos o cédula comiencen por los términos del texto buscado, sin distinguir
+    mayúsculas ni acentos. Cada término (palabra) debe coincidir con alguno de esos campos.
+
+    Parámetros de consulta:
+    - q (str): Texto a buscar.
+    - limit (int, opcional): Número máximo de resultados.
+    - fields (str, opcional): Campos a incluir separados por comas; por defecto, todos.
+
+    Retorna:
+    list: Lista de diccionarios JSON representando los usuarios encontrados, de mayor a menor relevancia.
+    """
+    try:
+        fields = _fields()
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+
+    terms = request.args.get("q", "").split()
+    if len("".join(terms)) < SEARCH_MIN_LENGTH:
+        return jsonify({"message": "El parámetro q debe tener al menos %d caracteres" % SEARCH_MIN_LENGTH}), 400
+    if len(terms) > SEARCH_MAX_TERMS:
+        return jsonify({"message": "El parámetro q admite como máximo %d palabras" % SEARCH_MAX_TERMS}), 400
+    try:
+        limit = int(request.args.get("limit", SEARCH_DEFAULT_LIMIT))
+        if limit < 1 or limit > SEARCH_MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return jsonify({"message": "El parámetro limit debe ser un entero entre 1 y %d" % SEARCH_MAX_LIMIT}), 400
+
+    try:
+        users = UserModel.search(terms, limit, SEARCH_CANDIDATES, fields)
+        return current_app.json.users_response(users, fields)
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+# Define una ruta para "/export" que exporta los usuarios en CSV o NDJSON.
+@main.route("/export")
+def export():
+    """
+    Exporta los usuarios en CSV (con cabecera, compatible con POST /usuarios/bulk) o NDJSON (un usuario por línea).
+    El archivo se genera en PostgreSQL con COPY ... TO STDOUT y se transmite por partes mientras se produce, sin
+    cargar los usuarios en memoria. Si el cliente acepta gzip, se comprime mientras se transmite.
+
+    Parámetros de consulta:
+    - format (str, opcional): "csv" (por defecto) o "ndjson".
+    - fields (str, opcional): Campos a incluir separados por comas; por defecto, todos.
+    - fecha_nacimiento_desde, fecha_nacimiento_hasta (str, opcional): Rango de fechas de nacimiento (YYYY-MM-DD).
+    - cedula (str, opcional): Prefijo de la cédula de identidad.
+
+    Retorna:
+    Response: Archivo de usuarios transmitido por partes, sin un orden garantizado.
+    """
+    format = request.args.get("format", "csv")
+    if format not in EXPORT_MIMETYPES:
+        return jsonify({"message": "El parámetro format debe ser csv o ndjson"}), 400
+    try:
+        fields = _fields()
+        born = []
+        for name in ("fecha_nacimiento_desde", "fecha_nacimiento_hasta"):
+            value = request.args.get(name)
+            try:
+                born.append(datetime.date.fromisoformat(value) if value else None)
+            except ValueError:
+                raise ValueError("El parámetro %s debe tener el formato YYYY-MM-DD" % name)
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+
+    try:
+        chunks = UserModel.export(format, fields, born[0], born[1], request.args.get("cedula"))
+        # Se espera el primer fragmento antes de responder, para que un error de la base de datos llegue como un
+        # 500 y no como un archivo cortado.
+        first = next(chunks, b"")
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+    body = itertools.chain((first,), chunks)
+    encoding = Compression.negotiate(["gzip"])
+    if encoding is not None:
+        body = Compression.stream(body)
+    response = Response(body, mimetype=EXPORT_MIMETYPES[format])
+    response.headers["Content-Disposition"] = 'attachment; filename="usuarios.%s"' % format
+    response.vary.add("Accept-Encoding")
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    # Si el cliente se desconecta antes del final, cerrar el generador cancela el COPY y libera la conexión.
+    response.call_on_close(chunks.close)
+    return response
 
 
 # Define una ruta para "/<id>" que busca un usuario por su id.
 @main.route("/<id>")
+@HttpCache.conditional(UserModel.version)
 def find(id):
     """
     Busca un usuario por su id en la base de datos.
@@ -52,20 +522,61 @@ def find(id):
     Parámetros:
     id (str): id del usuario a buscar.
 
+    Parámetros de consulta:
+    - fields (str, opcional): Campos a incluir separados por comas; por defecto, todos.
+
     Retorna:
     dict or 404: Diccionario JSON representando el usuario encontrado, o respuesta 404 si no se encontró.
     """
     try:
+        fields = _fields()
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+    try:
+        # En modo de paso directo PostgreSQL genera el JSON y se envía sin convertirlo a objetos de Python.
+        if fields is None and _passthrough_enabled():
+            user = UserModel.find_json(id)
+            return _passthrough_response(user) if user is not None else (jsonify({}), 404)
         # Utiliza el método find() del modelo de usuario para buscar el usuario por su id.
-        user = UserModel.find(id)
+        user = UserModel.find(id, fields)
         if user != None:
-            return jsonify(user)
+            return current_app.json.users_response(user, fields)
         else:
             # Si no se encontró el usuario, retorna un objeto JSON vacío y un código de estado HTTP 404.
             return jsonify({}), 404
     except Exception as ex:
-        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500.
-        return jsonify({"message": str(ex)}), 500
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+# Define una ruta para "/lote" que busca varios usuarios por id. Esta ruta acepta solicitudes POST para listas largas.
+@main.route("/lote", methods=["POST"])
+def find_many():
+    """
+    Busca varios usuarios por su id con una sola consulta.
+
+    Parámetros en el cuerpo de la solicitud (JSON):
+    - ids (list): ids de los usuarios a buscar.
+    - fields (list, opcional): Campos a incluir; por defecto, todos.
+
+    Retorna:
+    list: Lista de diccionarios JSON representando los usuarios encontrados, en el orden de `ids`.
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            raise ValueError("Se esperaba un objeto con la clave ids")
+        fields = _fields(body.get("fields")) if body.get("fields") is not None else _fields()
+        ids = _ids(body.get("ids"))
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+    try:
+        return current_app.json.users_response(UserModel.find_many(ids, fields), fields)
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
 
 
 # Define una ruta para "/" que agrega un nuevo usuario a la base de datos. Esta ruta acepta solicitudes POST.
@@ -111,8 +622,9 @@ def store():
             # Si la inserción falló, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 404.
             return jsonify({"mesage": "Error al insertar el usuario"}), 404
     except Exception as ex:
-        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500.
-        return jsonify({"message": str(ex)}), 500
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
 
 
 # Define una ruta para "/<id>" que actualiza un usuario en la base de datos. Esta ruta acepta solicitudes PUT.
@@ -159,8 +671,9 @@ def update(id):
             # Si la actualización falló, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 404.
             return jsonify({"mesage": "Ningun usuario actualizado."}), 404
     except Exception as ex:
-        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500.
-        return jsonify({"message": str(ex)}), 500
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
 
 
 # Define una ruta para "/<id>" que elimina un usuario de la base de datos. Esta ruta acepta solicitudes DELETE.
@@ -187,5 +700,162 @@ def delete(id):
             # Si la eliminación falló, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 404.
             return jsonify({"mesage": "Ningun usuario eliminado."}), 404
     except Exception as ex:
-        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500.
-        return jsonify({"message": str(ex)}), 500
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+# Define una ruta para "/bulk" que agrega usuarios de forma masiva. Esta ruta acepta solicitudes POST.
+@main.route("/bulk", methods=["POST"])
+def bulk_store():
+    """
+    Agrega usuarios de forma masiva a partir de un cuerpo NDJSON (application/x-ndjson) o CSV (text/csv)
+    que se lee por partes. Cada registro tiene los mismos campos que POST /usuarios y el id se genera en el
+    servidor. Los registros válidos se insertan en transacciones de USERS_BULK_BATCH_SIZE filas.
+
+    Retorna:
+    dict: Total de filas insertadas, resultado de cada lote y los números de registro rechazados con su motivo.
+    """
+    format = BulkReader.detect_format(request.mimetype)
+    if format is None:
+        return jsonify({"message": "Tipo de contenido no soportado; use application/x-ndjson o text/csv"}), 415
+
+    try:
+        inserted = 0
+        batches = []
+        rejected = []
+        batch = []
+        numbers = []
+
+        def flush():
+            # Inserta el lote pendiente; si la base de datos lo rechaza se marcan todos sus registros.
+            nonlocal inserted
+            try:
+                count = UserModel.bulk_store(batch, BULK_METHOD)
+                inserted += count
+                batches.append({"batch": len(batches) + 1, "rows": len(batch), "inserted": count})
+            except Exception as ex:
+                batches.append({"batch": len(batches) + 1, "rows": len(batch), "inserted": 0, "error": str(ex)})
+                rejected.extend({"row": number, "error": str(ex)} for number in numbers)
+            batch.clear()
+            numbers.clear()
+
+        for number, record in BulkReader.rows(request.stream, format):
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                values = UserValidator.validate(record)
+            except ValueError as ex:
+                rejected.append({"row": number, "error": str(ex)})
+                continue
+            # Genera un id único para cada usuario, igual que POST /usuarios.
+            batch.append(User(str(uuid.uuid4()), *values))
+            numbers.append(number)
+            if len(batch) >= BULK_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+
+        rejected.sort(key=lambda item: item["row"])
+        return jsonify({"inserted": inserted, "batches": batches, "rejected": rejected})
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+# Define una ruta para "/" que actualiza parcialmente varios usuarios. Esta ruta acepta solicitudes PATCH.
+@main.route("/", methods=["PATCH"])
+def bulk_update():
+    """
+    Actualiza parcialmente varios usuarios. Solo se modifican los campos indicados en cada cambio; los cambios con
+    los mismos campos se aplican con una sola sentencia UPDATE por cada parte de USERS_BULK_BATCH_SIZE cambios.
+
+    Parámetros en el cuerpo de la solicitud (JSON):
+    Lista de objetos con el `id` del usuario y los campos a modificar (los mismos de POST /usuarios).
+
+    Retorna:
+    dict: Total de usuarios actualizados y el resultado de cada elemento ("updated", "not_found", "invalid" o
+    "error"), en el orden recibido.
+    """
+    try:
+        items = _bulk_items("cambios")
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+
+    try:
+        results = [None] * len(items)
+        entries = []
+        seen = set()
+        for row, item in enumerate(items, start=1):
+            id = item.get("id") if isinstance(item, dict) else None
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError("Se esperaba un objeto con el id y los campos a modificar")
+                try:
+                    id = str(uuid.UUID(id))
+                except (TypeError, ValueError, AttributeError):
+                    raise ValueError("El id debe ser un UUID válido")
+                values = {
+                    field: UserValidator.validate_field(field, value) for field, value in item.items() if field != "id"
+                }
+                if not values:
+                    raise ValueError("No se indicó ningún campo a modificar")
+                if id in seen:
+                    raise ValueError("El id está repetido en la solicitud")
+            except ValueError as ex:
+                results[row - 1] = {"row": row, "id": id, "status": "invalid", "error": str(ex)}
+                continue
+            seen.add(id)
+            entries.append((row, id, (id, values)))
+
+        updated = _bulk_apply(entries, results, UserModel.bulk_update, "updated")
+        return jsonify({"updated": updated, "results": results})
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
+
+
+# Define una ruta para "/" que elimina varios usuarios. Esta ruta acepta solicitudes DELETE.
+@main.route("/", methods=["DELETE"])
+def bulk_delete():
+    """
+    Elimina varios usuarios con una sola sentencia DELETE por cada parte de USERS_BULK_BATCH_SIZE ids.
+
+    Parámetros en el cuerpo de la solicitud (JSON):
+    Lista de ids de los usuarios a eliminar.
+
+    Retorna:
+    dict: Total de usuarios eliminados y el resultado de cada id ("deleted", "not_found", "invalid" o "error"), en
+    el orden recibido.
+    """
+    try:
+        items = _bulk_items("ids")
+    except ValueError as ex:
+        return jsonify({"message": str(ex)}), 400
+
+    try:
+        results = [None] * len(items)
+        entries = []
+        seen = set()
+        for row, id in enumerate(items, start=1):
+            try:
+                try:
+                    id = str(uuid.UUID(id))
+                except (TypeError, ValueError, AttributeError):
+                    raise ValueError("El id debe ser un UUID válido")
+                if id in seen:
+                    raise ValueError("El id está repetido en la solicitud")
+            except ValueError as ex:
+                results[row - 1] = {"row": row, "id": id, "status": "invalid", "error": str(ex)}
+                continue
+            seen.add(id)
+            entries.append((row, id, id))
+
+        deleted = _bulk_apply(entries, results, UserModel.bulk_delete, "deleted")
+        return jsonify({"deleted": deleted, "results": results})
+    except Exception as ex:
+        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP 500, o 503
+        # si la base de datos está saturada.
+        return Admission.error_response(ex)
@@ -0,0 +1,125 @@
+"""
+Servidor de producción del API sobre gunicorn, con procesos trabajadores (prefork) de varios hilos.
+
+El proceso maestro de gunicorn precarga la aplicación (create_app), abre el socket de escucha y bifurca (fork) N
+procesos trabajadores que comparten ese socket. Cada trabajador atiende solicitudes con varios hilos (worker
+gthread) y abre su propio pool de conexiones a la base de datos después del fork.
+
+Señales del proceso maestro (las de gunicorn):
+- SIGUSR2 y luego SIGTERM al maestro anterior: Recarga en caliente. SIGUSR2 levanta un maestro nuevo con el
+  código nuevo sobre el mismo socket; SIGTERM al anterior detiene sus trabajadores de forma ordenada, sin
+  rechazar conexiones durante el cambio. SIGHUP solo renueva los trabajadores: con la aplicación precargada no
+  lee el código nuevo.
+- SIGTERM: Detiene los trabajadores de forma ordenada (terminan las solicitudes en curso) y sale.
+- SIGTTIN / SIGTTOU: Agrega o quita un trabajador.
+
+Variables de entorno:
+- APP_ENV: Configuración de la aplicación (por defecto "production").
+- SERVER_HOST / SERVER_PORT: Dirección de escucha (por defecto 0.0.0.0:5000).
+- WEB_CONCURRENCY: Número de procesos trabajadores (por defecto, el número de núcleos disponibles).
+- SERVER_THREADS: Hilos por trabajador (por defecto 8).
+- SERVER_BACKLOG: Tamaño de la cola de conexiones pendientes del socket (por defecto 2048).
+- GRACEFUL_TIMEOUT: Segundos que se espera a que un trabajador termine sus solicitudes (por defecto 30).
+- METRICS_DIR: Directorio donde cada trabajador escribe sus métricas y sus consultas lentas, para que
+  /estado/metrics y /estado/consultas-lentas muestren las de todos. Se vacía al arrancar en frío, pero no en una
+  recarga.
+
+Uso:
+    python src/serve.py
+"""
+
+import os
+
+from decouple import config
+from gunicorn.app.base import BaseApplication
+
+from app import create_app
+from database import db
+from models import UserMirror
+from utils.Metrics import Metrics
+from utils.SlowQueryLog import SlowQueryLog
+
+APP_ENV = config("APP_ENV", default="production")
+HOST = config("SERVER_HOST", default="0.0.0.0")
+PORT = config("SERVER_PORT", default=5000, cast=int)
+THREADS = config("SERVER_THREADS", default=8, cast=int)
+BACKLOG = config("SERVER_BACKLOG", default=2048, cast=int)
+GRACEFUL_TIMEOUT = config("GRACEFUL_TIMEOUT", default=30, cast=int)
+
+# Variable de entorno con la que gunicorn pasa el socket al maestro nuevo durante una recarga (SIGUSR2).
+LISTEN_FD_ENV = "GUNICORN_FD"
+
+
+def default_workers():
+    """
+    Retorna el número de trabajadores por defecto: los núcleos de CPU que puede usar este proceso.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def post_fork(server, worker):
+    """
+    Inicializa los recursos propios de cada trabajador después del fork (hook post_fork de gunicorn).
+    """
+    db.after_fork()
+    # Con USERS_MIRROR, empieza a cargar la copia en memoria de la tabla antes de la primera solicitud.
+    UserMirror.get_user_mirror()
+
+
+def worker_exit(server, worker):
+    """
+    Escribe las últimas métricas y consultas lentas del trabajador antes de que termine (hook worker_exit de
+    gunicorn).
+    """
+    Metrics.flush()
+    SlowQueryLog.flush()
+
+
+class Server(BaseApplication):
+    """
+    Aplicación de gunicorn que sirve la aplicación Flask precargada con la configuración de este módulo.
+    """
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+        super().__init__()
+
+    def load_config(self):
+        host = "[%s]" % HOST if ":" in HOST else HOST
+        settings = {
+            "bind": "%s:%d" % (host, PORT),
+            "workers": self.workers,
+            "worker_class": "gthread",
+            "threads": THREADS,
+            "backlog": BACKLOG,
+            "graceful_timeout": GRACEFUL_TIMEOUT,
+            "preload_app": True,
+            "post_fork": post_fork,
+            "worker_exit": worker_exit,
+        }
+        for name, value in settings.items():
+            self.cfg.set(name, value)
+
+    def load(self):
+        return self.app
+
+
+def main():
+    """
+    Precarga la aplicación y arranca el proceso maestro de gunicorn.
+    """
+    app = create_app(APP_ENV)
+    # Las métricas y las consultas lentas de un arranque anterior se descartan; en una recarga se conservan para
+    # que los contadores no retrocedan.
+    if LISTEN_FD_ENV not in os.environ:
+        Metrics.clear_directory()
+        SlowQueryLog.clear_directory()
+    Server(app, config("WEB_CONCURRENCY", default=default_workers(), cast=int)).run()
+
+
+if __name__ == "__main__":
+    main()
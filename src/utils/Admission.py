@@ -0,0 +1,284 @@
+# Importa las bibliotecas para limitar la concurrencia entre hilos o corrutinas y leer la configuración.
+import asyncio
+import collections
+import os
+import threading
+import time
+
+from decouple import Csv, config
+from flask import g, jsonify, request
+
+from database.db import PoolTimeoutError
+from utils.Metrics import Metrics
+
+
+class _Limiter:
+    """
+    Límite de solicitudes concurrentes de una ruta, con una cola de espera acotada. Al terminar una solicitud, su
+    lugar pasa directamente a la que más tiempo lleva esperando.
+    """
+
+    __slots__ = ("limit", "queue_size", "active", "waiters", "lock")
+
+    def __init__(self, limit, queue_size):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiters = collections.deque()
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """
+        Ocupa un lugar, esperando como máximo `timeout` segundos en la cola.
+
+        Retorna:
+        str or None: None si se obtuvo el lugar, o el motivo del rechazo ("queue_full" o "timeout").
+        """
+        with self.lock:
+            if self.active < self.limit and not self.waiters:
+                self.active += 1
+                return None
+            if len(self.waiters) >= self.queue_size:
+                return "queue_full"
+            waiter = threading.Lock()
+            waiter.acquire()
+            self.waiters.append(waiter)
+
+        if waiter.acquire(timeout=timeout):
+            return None
+        with self.lock:
+            try:
+                self.waiters.remove(waiter)
+                return "timeout"
+            except ValueError:
+                # release() entregó el lugar justo después de agotarse la espera: la solicitud ya lo tiene.
+                return None
+
+    def release(self):
+        with self.lock:
+            if self.waiters:
+                # El lugar pasa a la siguiente solicitud de la cola sin quedar libre, para que no se lo gane una
+                # solicitud recién llegada.
+                self.waiters.popleft().release()
+            else:
+                self.active -= 1
+
+    @property
+    def queued(self):
+        return len(self.waiters)
+
+
+class _AsyncLimiter:
+    """
+    Variante de _Limiter para las vistas asíncronas del modo ASGI: las solicitudes esperan su lugar en el bucle de
+    eventos, sin bloquear el hilo. asyncio.Semaphore entrega los lugares en orden de llegada.
+    """
+
+    __slots__ = ("limit", "queue_size", "active", "queued", "semaphore")
+
+    def __init__(self, limit, queue_size):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self.queued = 0
+        self.semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self, timeout):
+        """
+        Ocupa un lugar, esperando como máximo `timeout` segundos en la cola.
+
+        Retorna:
+        str or None: None si se obtuvo el lugar, o el motivo del rechazo ("queue_full" o "timeout").
+        """
+        if self.semaphore.locked():
+            if self.queued >= self.queue_size:
+                return "queue_full"
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                return "timeout"
+            finally:
+                self.queued -= 1
+        else:
+            await self.semaphore.acquire()
+        self.active += 1
+        return None
+
+    def release(self):
+        self.active -= 1
+        self.semaphore.release()
+
+
+def _limit_key(rule):
+    # Normaliza una regla de ADMISSION_ROUTE_LIMITS: "METODO regla" (por ejemplo "GET /usuarios/<id>") o solo la regla.
+    parts = rule.split()
+    return "%s %s" % (parts[0].upper(), parts[1]) if len(parts) == 2 else rule.strip()
+
+
+# Define una clase Admission que limita las solicitudes concurrentes de cada ruta y rechaza con 503 las que no
+# pueden atenderse a tiempo, en lugar de dejar que se acumulen esperando una conexión a la base de datos.
+class Admission:
+    # Solicitudes concurrentes por método, ruta y proceso; 0 desactiva el control de admisión.
+    CONCURRENCY = config("ADMISSION_CONCURRENCY", default=0, cast=int)
+    # Límites propios de algunas rutas, como "METODO regla=límite" separados por comas (por ejemplo
+    # "GET /usuarios/export=2,POST /usuarios/bulk=1"). Una regla sin método fija el límite de cada uno de sus
+    # métodos. Se aplican aunque ADMISSION_CONCURRENCY sea 0.
+    ROUTE_LIMITS = {
+        _limit_key(rule): int(limit)
+        for rule, _, limit in (item.partition("=") for item in config("ADMISSION_ROUTE_LIMITS", default="", cast=Csv()))
+        if rule.strip() and limit.strip()
+    }
+    # Solicitudes que pueden esperar un lugar en cada ruta; con la cola llena se rechazan sin esperar.
+    QUEUE_SIZE = config("ADMISSION_QUEUE_SIZE", default=32, cast=int)
+    # Segundos máximos de espera en la cola.
+    QUEUE_TIMEOUT = config("ADMISSION_QUEUE_TIMEOUT_MS", default=250.0, cast=float) / 1000
+    # Segundos que se sugieren al cliente en la cabecera Retry-After de las respuestas 503.
+    RETRY_AFTER = config("ADMISSION_RETRY_AFTER", default=1, cast=int)
+
+    _lock = threading.Lock()
+    _limiters = {}
+    # Limitadores de las vistas asíncronas, que pertenecen al bucle de eventos en el que se crean.
+    _async_limiters = {}
+    _async_loop = None
+
+    # Define un método de clase que descarta los límites heredados del proceso padre tras un fork.
+    @classmethod
+    def _reset(self):
+        Admission._lock = threading.Lock()
+        Admission._limiters = {}
+        Admission._async_limiters = {}
+        Admission._async_loop = None
+
+    # Define un método de clase que retorna el límite de un método y una ruta: el de "METODO regla" en
+    # ROUTE_LIMITS, el de la regla sola o, si no hay ninguno, CONCURRENCY.
+    @classmethod
+    def _limit(self, method, route):
+        return self.ROUTE_LIMITS.get("%s %s" % (method, route), self.ROUTE_LIMITS.get(route, self.CONCURRENCY))
+
+    # Define un método de clase que retorna el limitador de un método y una ruta, creándolo la primera vez, o None
+    # si no tienen límite. Cada método tiene el suyo, para que por ejemplo las escrituras de /usuarios/<id> no
+    # ocupen los lugares de las lecturas.
+    @classmethod
+    def _limiter(self, method, route):
+        limiter = self._limiters.get((method, route))
+        if limiter is None:
+            limit = self._limit(method, route)
+            if limit <= 0:
+                return None
+            with self._lock:
+                limiter = self._limiters.setdefault((method, route), _Limiter(limit, self.QUEUE_SIZE))
+        return limiter
+
+    # Define un método de clase que retorna el limitador asíncrono de un método y una ruta en el bucle de eventos
+    # en curso, creándolo la primera vez, o None si no tienen límite. Un bucle nuevo crea los suyos.
+    @classmethod
+    def _async_limiter(self, method, route):
+        loop = asyncio.get_running_loop()
+        if Admission._async_loop is not loop:
+            Admission._async_limiters, Admission._async_loop = {}, loop
+        limiter = self._async_limiters.get((method, route))
+        if limiter is None:
+            limit = self._limit(method, route)
+            if limit <= 0:
+                return None
+            limiter = self._async_limiters[(method, route)] = _AsyncLimiter(limit, self.QUEUE_SIZE)
+        return limiter
+
+    # Define un método de clase que registra la espera de una solicitud en la cola y, según el resultado, guarda el
+    # lugar obtenido en `g` o construye la respuesta 503.
+    @classmethod
+    def _admitted(self, method, route, limiter, reason, started):
+        Metrics.observe("api_admission_wait_seconds", time.perf_counter() - started, route=route, method=method)
+        if reason is not None:
+            Metrics.inc("api_admission_shed_total", route=route, method=method, reason=reason)
+            return self.unavailable()
+        g.admission = limiter
+        return None
+
+    # Define un método de clase para usarse como before_request: ocupa un lugar de la ruta o responde 503.
+    @classmethod
+    def admit(self):
+        method, route = request.method, Metrics.route()
+        limiter = self._limiter(method, route)
+        if limiter is None:
+            return None
+        started = time.perf_counter()
+        return self._admitted(method, route, limiter, limiter.acquire(self.QUEUE_TIMEOUT), started)
+
+    # Define un método de clase con la variante de admit() para las vistas asíncronas del modo ASGI (ver
+    # src/asgi.py), que no ejecutan los before_request. El lugar se libera con los mismos after_request y
+    # teardown_request que en las rutas síncronas.
+    @classmethod
+    async def admit_async(self):
+        method, route = request.method, Metrics.route()
+        limiter = self._async_limiter(method, route)
+        if limiter is None:
+            return None
+        started = time.perf_counter()
+        return self._admitted(method, route, limiter, await limiter.acquire(self.QUEUE_TIMEOUT), started)
+
+    # Define un método de clase para usarse como after_request: libera el lugar cuando termina de enviarse la
+    # respuesta, para que las respuestas transmitidas por partes lo ocupen hasta el final.
+    @classmethod
+    def release_on_close(self, response):
+        limiter = g.pop("admission", None)
+        if limiter is not None:
+            response.call_on_close(limiter.release)
+        return response
+
+    # Define un método de clase para usarse como teardown_request: libera el lugar si la solicitud terminó con una
+    # excepción y no llegó a after_request.
+    @classmethod
+    def release(self, error=None):
+        limiter = g.pop("admission", None)
+        if limiter is not None:
+            limiter.release()
+
+    # Define un método de clase que registra el control de admisión en una aplicación o un Blueprint.
+    @classmethod
+    def init_app(self, app):
+        app.before_request(self.admit)
+        app.after_request(self.release_on_close)
+        app.teardown_request(self.release)
+
+    # Define un método de clase que construye la respuesta 503 para una solicitud que no puede atenderse ahora.
+    @classmethod
+    def unavailable(self):
+        response = jsonify({"message": "El servicio está saturado; intente nuevamente en unos segundos"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(self.RETRY_AFTER)
+        return response
+
+    # Define un método de clase que construye la respuesta de error de una vista: 503 si no hubo una conexión libre
+    # a tiempo (la base de datos está saturada y reintentar más tarde puede funcionar) o 500 en otro caso.
+    @classmethod
+    def error_response(self, ex):
+        if self.saturated(ex):
+            Metrics.inc("api_admission_shed_total", route=Metrics.route(), method=request.method, reason="pool_timeout")
+            return self.unavailable()
+        return jsonify({"message": str(ex)}), 500
+
+    # Define un método de clase que indica si un error de un modelo se debe a que no hubo una conexión libre a
+    # tiempo. Los modelos envuelven los errores de la base de datos en Exception(ex).
+    @classmethod
+    def saturated(self, ex):
+        cause = ex.args[0] if type(ex) is Exception and ex.args and isinstance(ex.args[0], BaseException) else ex
+        return isinstance(cause, PoolTimeoutError)
+
+    # Define un método de clase que retorna, por método y ruta (tuplas), las solicitudes en curso y las que esperan
+    # en la cola.
+    @classmethod
+    def status(self):
+        with self._lock:
+            limiters = list(self._limiters.items())
+        # En el modo ASGI, las vistas asíncronas y las síncronas atienden rutas distintas.
+        limiters += list(self._async_limiters.items())
+        return {
+            route: {"limit": limiter.limit, "active": limiter.active, "queued": limiter.queued}
+            for route, limiter in limiters
+        }
+
+
+# Descarta en el proceso hijo los límites heredados del padre al bifurcar (fork).
+os.register_at_fork(after_in_child=Admission._reset)
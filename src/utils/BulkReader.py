@@ -0,0 +1,63 @@
+# Importa los módulos csv, io y json para leer cargas masivas en formato CSV o NDJSON.
+import csv
+import io
+import json
+
+
+# Define una clase BulkReader que lee por partes el cuerpo de una carga masiva de usuarios.
+class BulkReader:
+    # Tipos de contenido aceptados y el formato al que corresponden.
+    CONTENT_TYPES = {
+        "application/x-ndjson": "ndjson",
+        "application/ndjson": "ndjson",
+        "application/jsonl": "ndjson",
+        "text/csv": "csv",
+    }
+
+    # Define un método de clase que determina el formato de la carga a partir del tipo de contenido.
+    # Retorna "ndjson", "csv" o None si el tipo no está soportado.
+    @classmethod
+    def detect_format(self, mimetype):
+        return self.CONTENT_TYPES.get((mimetype or "").lower())
+
+    # Define un método de clase que recorre los registros del cuerpo sin cargarlo completo en memoria.
+    # Genera tuplas (número de registro, diccionario o excepción); los registros se numeran desde 1
+    # sin contar la cabecera del CSV ni las líneas vacías.
+    @classmethod
+    def rows(self, stream, format):
+        lines = io.BufferedReader(stream)
+
+        if format == "csv":
+            yield from self._csv_rows(lines)
+            return
+
+        number = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line.decode("utf-8"))
+            except UnicodeDecodeError:
+                yield number, ValueError("El registro no es texto UTF-8 válido")
+            except ValueError:
+                yield number, ValueError("JSON inválido")
+
+    # Define un método de clase que recorre los registros de un cuerpo CSV con cabecera. Un campo entre comillas
+    # puede ocupar varias líneas, así que si el texto no es UTF-8 válido o el CSV está mal formado no se sabe dónde
+    # empieza el registro siguiente: el registro donde falla la lectura se genera como excepción y se deja de leer.
+    @classmethod
+    def _csv_rows(self, lines):
+        reader = csv.DictReader(line.decode("utf-8") for line in lines)
+        number = 0
+        try:
+            for record in reader:
+                number += 1
+                if None in record:
+                    yield number, ValueError("El registro tiene más columnas que la cabecera")
+                else:
+                    yield number, record
+        except UnicodeDecodeError:
+            yield number + 1, ValueError("El registro no es texto UTF-8 válido; no se leyó el resto de la carga")
+        except csv.Error as ex:
+            yield number + 1, ValueError("CSV inválido (%s); no se leyó el resto de la carga" % ex)
@@ -0,0 +1,81 @@
+# Importa gzip y zlib para comprimir las respuestas y decouple para leer la configuración.
+import gzip
+import zlib
+
+from decouple import config
+from flask import request
+
+# Brotli es opcional: si la biblioteca no está instalada solo se ofrece gzip.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Define una clase Compression que comprime las respuestas grandes según el encabezado Accept-Encoding.
+class Compression:
+    # Tamaño mínimo en bytes para comprimir una respuesta y niveles de compresión.
+    MIN_SIZE = config("COMPRESS_MIN_SIZE", default=1024, cast=int)
+    GZIP_LEVEL = config("COMPRESS_GZIP_LEVEL", default=6, cast=int)
+    BROTLI_QUALITY = config("COMPRESS_BROTLI_QUALITY", default=4, cast=int)
+    # Nivel de gzip de las respuestas transmitidas por partes (exportaciones), que se comprimen mientras se
+    # generan: un nivel bajo para que la compresión no limite la velocidad de la transmisión.
+    STREAM_GZIP_LEVEL = config("COMPRESS_STREAM_GZIP_LEVEL", default=1, cast=int)
+    MIMETYPES = ("application/json", "text/csv", "application/x-ndjson")
+
+    # Define un método de clase que elige la codificación preferida por el cliente entre las disponibles.
+    @classmethod
+    def negotiate(self, offered=None):
+        if offered is None:
+            offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+        best = None
+        for encoding in offered:
+            quality = request.accept_encodings[encoding]
+            if quality > 0 and (best is None or quality > best[1]):
+                best = (encoding, quality)
+        return best[0] if best else None
+
+    # Define un método de clase para usarse como after_request: comprime el cuerpo si conviene y ajusta
+    # la ETag para que cada codificación tenga la suya.
+    @classmethod
+    def compress_response(self, response):
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in self.MIMETYPES
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        if response.content_length is not None and response.content_length < self.MIN_SIZE:
+            return response
+
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if encoding == "br":
+            data = brotli.compress(data, quality=self.BROTLI_QUALITY)
+        else:
+            data = gzip.compress(data, compresslevel=self.GZIP_LEVEL)
+        response.set_data(data)
+        response.headers["Content-Encoding"] = encoding
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag("%s+%s" % (etag, encoding))
+        return response
+
+    # Define un método de clase que comprime con gzip una respuesta transmitida por partes, fragmento a fragmento,
+    # sin tener el cuerpo completo en memoria.
+    @classmethod
+    def stream(self, chunks):
+        compressor = zlib.compressobj(self.STREAM_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
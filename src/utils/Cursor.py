@@ -0,0 +1,32 @@
+# Importa los módulos base64, json y uuid para construir y validar los tokens de paginación.
+import base64
+import json
+import uuid
+
+
+# Define una clase Cursor para codificar y decodificar los tokens opacos de la paginación por clave (keyset).
+class Cursor:
+    # Define un método de clase que codifica la última clave vista en un token opaco.
+    @classmethod
+    def encode(self, cedula_identidad, id):
+        # Serializa la clave (cedula_identidad, id) en JSON y la codifica en base64 apta para URLs, sin relleno.
+        raw = json.dumps([cedula_identidad, str(id)], separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    # Define un método de clase que recupera la clave a partir de un token; lanza ValueError si el token no es válido.
+    @classmethod
+    def decode(self, token):
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            cedula_identidad, id = json.loads(raw.decode("utf-8"))
+        except Exception:
+            raise ValueError("Cursor de paginación inválido")
+        if not (cedula_identidad is None or isinstance(cedula_identidad, str)) or not isinstance(id, str):
+            raise ValueError("Cursor de paginación inválido")
+        # Un id que no es un UUID haría fallar la consulta con un error 500; se retorna en formato canónico, igual
+        # que los ids de la base de datos.
+        try:
+            id = str(uuid.UUID(id))
+        except ValueError:
+            raise ValueError("Cursor de paginación inválido")
+        return cedula_identidad, id
@@ -0,0 +1,113 @@
+# Importa functools e inspect para conservar los metadatos de las vistas decoradas y reconocer las corrutinas, y
+# los objetos de Flask necesarios.
+import functools
+import inspect
+
+from flask import make_response, request
+
+from utils.Admission import Admission
+
+
+# Define una clase HttpCache que resuelve las solicitudes condicionales (If-None-Match / If-Modified-Since)
+# a partir de un contador de versión de la tabla, sin ejecutar la consulta de la vista.
+class HttpCache:
+    # Sufijos que la compresión agrega a la ETag de cada codificación del mismo recurso.
+    ENCODING_SUFFIXES = ("", "+gzip", "+br")
+
+    # Define un método de clase que retorna un decorador para vistas de solo lectura.
+    # - version: Función sin parámetros que retorna (versión, fecha de última modificación) de la tabla. Si la
+    #   vista es una corrutina (modo ASGI), `version` también debe serlo.
+    # - variant: Función opcional que retorna un texto que se agrega a la ETag, para respuestas que
+    #   dependen de algo más que la tabla (por ejemplo, la fecha actual).
+    @classmethod
+    def conditional(self, version, variant=None):
+        def decorator(view):
+            if inspect.iscoroutinefunction(view):
+
+                @functools.wraps(view)
+                async def coroutine(*args, **kwargs):
+                    try:
+                        current, updated_at = await version()
+                    except Exception as ex:
+                        # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado
+                        # HTTP 500, o 503 si la base de datos está saturada.
+                        return Admission.error_response(ex)
+
+                    etag = self._etag(current, variant)
+                    not_modified = self._not_modified(etag, updated_at, variant is None)
+                    if not_modified is not None:
+                        return not_modified
+                    return self._finish(await view(*args, **kwargs), etag, updated_at)
+
+                return coroutine
+
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    current, updated_at = version()
+                except Exception as ex:
+                    # Si ocurre algún error, retorna un objeto JSON con un mensaje de error y un código de estado HTTP
+                    # 500, o 503 si la base de datos está saturada.
+                    return Admission.error_response(ex)
+
+                etag = self._etag(current, variant)
+                # Si el cliente ya tiene esta versión responde 304 sin llamar a la vista.
+                not_modified = self._not_modified(etag, updated_at, variant is None)
+                if not_modified is not None:
+                    return not_modified
+                return self._finish(view(*args, **kwargs), etag, updated_at)
+
+            return wrapper
+
+        return decorator
+
+    # Define un método de clase que construye la ETag de una versión de la tabla.
+    @classmethod
+    def _etag(self, current, variant=None):
+        etag = "users-%d" % current
+        if variant is not None:
+            etag += "-" + variant()
+        return etag
+
+    # Define un método de clase que retorna la respuesta 304 si el cliente ya tiene esta versión, o None. Con
+    # `by_date` en False solo se compara la ETag: las respuestas con variante (por ejemplo, las edades, que cambian
+    # con la fecha actual) pueden cambiar sin que cambie la fecha de modificación de la tabla.
+    @classmethod
+    def _not_modified(self, etag, updated_at, by_date=True):
+        matched = self._matched_etag(etag)
+        if matched is not None or (
+            by_date
+            and not request.if_none_match
+            and request.if_modified_since is not None
+            and updated_at.replace(microsecond=0) <= request.if_modified_since
+        ):
+            response = make_response("", 304)
+            response.set_etag(matched or etag)
+            self._set_headers(response, updated_at)
+            return response
+        return None
+
+    # Define un método de clase que agrega la ETag y las cabeceras de caché a la respuesta de la vista.
+    @classmethod
+    def _finish(self, result, etag, updated_at):
+        response = make_response(result)
+        if response.status_code == 200:
+            response.set_etag(etag)
+            self._set_headers(response, updated_at)
+        return response
+
+    # Define un método de clase que busca la ETag (en cualquiera de sus codificaciones) en If-None-Match.
+    @classmethod
+    def _matched_etag(self, etag):
+        if not request.if_none_match:
+            return None
+        for suffix in self.ENCODING_SUFFIXES:
+            if request.if_none_match.contains(etag + suffix):
+                return etag + suffix
+        return None
+
+    # Define un método de clase que agrega Last-Modified y obliga a revalidar la respuesta en cada uso.
+    @classmethod
+    def _set_headers(self, response, updated_at):
+        response.last_modified = updated_at
+        response.headers["Cache-Control"] = "no-cache"
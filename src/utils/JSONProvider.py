@@ -0,0 +1,149 @@
+# Importa las bibliotecas necesarias para serializar usuarios a JSON sin pasar por diccionarios intermedios.
+import functools
+import json
+import time
+from json.encoder import encode_basestring_ascii
+
+from flask.json.provider import DefaultJSONProvider
+
+from models.entities.User import User
+from utils.DateFormat import DateFormat
+from utils.Metrics import Metrics
+
+
+# Define una función que codifica una fecha de nacimiento como cadena JSON "dd/mm/YYYY". El resultado se guarda en
+# caché porque en los listados grandes las mismas fechas se repiten muchas veces.
+@functools.lru_cache(maxsize=65536)
+def _encode_date(date):
+    return encode_basestring_ascii(DateFormat.convert_date(date))
+
+
+# Define un proveedor JSON para Flask que serializa los objetos User con codificadores precompilados.
+class UserJSONProvider(DefaultJSONProvider):
+    """
+    Proveedor JSON de la aplicación.
+
+    Para los objetos User (y las listas de ellos) genera el mismo texto que jsonify produciría a partir de
+    User.to_JSON(), pero sin crear un diccionario por usuario: cada combinación de campos tiene una función de
+    codificación generada una sola vez que concatena las claves ya escapadas con los valores. Cualquier otro
+    objeto se serializa igual que con el proveedor por defecto de Flask.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._encoders = {}
+
+    # Los objetos User que no pasan por el codificador rápido se serializan a partir de to_JSON().
+    @staticmethod
+    def default(o):
+        if isinstance(o, User):
+            return o.to_JSON()
+        return DefaultJSONProvider.default(o)
+
+    def _encode_value(self, value):
+        # Codifica un valor con las mismas opciones que dumps() en modo compacto.
+        if type(value) is str:
+            return encode_basestring_ascii(value)
+        if value is None:
+            return "null"
+        return json.dumps(value, default=self.default, ensure_ascii=True, sort_keys=True, separators=(",", ":"))
+
+    def _encode_date_value(self, value):
+        # Las fechas de la base de datos usan la caché; cualquier otro valor se codifica como tal.
+        if value is not None and type(value) is not str:
+            return _encode_date(value)
+        return self._encode_value(value)
+
+    def encoder(self, fields=None):
+        """
+        Retorna la función que codifica un User como objeto JSON compacto con los campos indicados.
+
+        La función se genera y compila la primera vez que se pide cada combinación de campos.
+
+        Parámetros:
+        fields (tuple, opcional): Campos a incluir; por defecto, todos los de User.FIELDS.
+
+        Retorna:
+        function: Función que recibe un User y retorna el texto JSON del objeto.
+        """
+        fields = tuple(sorted(fields if fields is not None else User.FIELDS))
+        encode = self._encoders.get(fields)
+        if encode is None:
+            parts = []
+            for index, field in enumerate(fields):
+                key = ("{" if index == 0 else ",") + encode_basestring_ascii(field) + ":"
+                convert = "_date" if field == "fecha_nacimiento" else "_value"
+                parts.append("%r + %s(user.%s)" % (key, convert, field))
+            body = " + ".join(parts) + " + '}'" if parts else "'{}'"
+            namespace = {"_date": self._encode_date_value, "_value": self._encode_value}
+            exec("def encode(user):\n    return " + body + "\n", namespace)
+            encode = self._encoders[fields] = namespace["encode"]
+        return encode
+
+    def dumps_users(self, users, fields=None):
+        """
+        Serializa una lista de usuarios como arreglo JSON compacto.
+
+        Parámetros:
+        users (iterable): Objetos User a serializar.
+        fields (tuple, opcional): Campos a incluir; por defecto, todos.
+
+        Retorna:
+        str: Texto del arreglo JSON.
+        """
+        return "[" + ",".join(map(self.encoder(fields), users)) + "]"
+
+    def compact_output(self):
+        """
+        Indica si response() produce JSON compacto con claves ordenadas y escapes ASCII, que es el formato que
+        generan los codificadores precompilados.
+
+        Retorna:
+        bool: True si los codificadores precompilados producen el mismo texto que el proveedor por defecto.
+        """
+        return (
+            self.sort_keys
+            and self.ensure_ascii
+            and (self.compact is True or (self.compact is None and not self._app.debug))
+        )
+
+    def users_response(self, obj, fields=None):
+        """
+        Construye la respuesta JSON de un User o de una lista de ellos incluyendo solo los campos indicados.
+
+        Parámetros:
+        obj (User or list): Usuario o lista de usuarios.
+        fields (tuple, opcional): Campos a incluir; por defecto, todos.
+
+        Retorna:
+        Response: Respuesta con el mimetype de JSON.
+        """
+        if fields is None:
+            return self.response(obj)
+        started = time.perf_counter()
+        if self.compact_output():
+            text = self.encoder(fields)(obj) if type(obj) is User else self.dumps_users(obj, fields)
+            response = self._app.response_class((text + "\n").encode("ascii"), mimetype=self.mimetype)
+        elif type(obj) is User:
+            response = super().response(obj.to_JSON(fields))
+        else:
+            response = super().response([user.to_JSON(fields) for user in obj])
+        Metrics.observe("api_serialization_duration_seconds", time.perf_counter() - started, route=Metrics.route())
+        return response
+
+    def response(self, *args, **kwargs):
+        started = time.perf_counter()
+        obj = self._prepare_response_obj(args, kwargs)
+        response = None
+        if self.compact_output():
+            text = None
+            if type(obj) is User:
+                text = self.encoder()(obj)
+            elif type(obj) is list and all(type(item) is User for item in obj):
+                text = self.dumps_users(obj)
+            if text is not None:
+                response = self._app.response_class((text + "\n").encode("ascii"), mimetype=self.mimetype)
+        if response is None:
+            response = super().response(obj)
+        Metrics.observe("api_serialization_duration_seconds", time.perf_counter() - started, route=Metrics.route())
+        return response
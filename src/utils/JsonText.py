@@ -0,0 +1,28 @@
+# Importa el módulo codecs para registrar el manejador de errores que escapa los caracteres no ASCII.
+import codecs
+
+
+# Define una función que reemplaza los caracteres no ASCII por secuencias \uXXXX, igual que json.dumps con
+# ensure_ascii=True (los caracteres fuera del plano básico se escriben como un par sustituto).
+def _escape_non_ascii(error):
+    escaped = []
+    for char in error.object[error.start : error.end]:
+        code = ord(char)
+        if code > 0xFFFF:
+            code -= 0x10000
+            escaped.append("\\u%04x\\u%04x" % (0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF)))
+        else:
+            escaped.append("\\u%04x" % code)
+    return "".join(escaped), error.end
+
+
+codecs.register_error("json_ascii", _escape_non_ascii)
+
+
+# Define una clase JsonText para ajustar texto JSON generado fuera de Python (por ejemplo, por PostgreSQL).
+class JsonText:
+    # Define un método de clase que convierte texto JSON en bytes ASCII con los mismos escapes que usa
+    # json.dumps(ensure_ascii=True): los caracteres no ASCII y el carácter DEL se escriben como \uXXXX.
+    @classmethod
+    def to_ascii(self, text):
+        return text.replace("\x7f", "\\u007f").encode("ascii", "json_ascii")
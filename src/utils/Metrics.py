@@ -0,0 +1,467 @@
+# Importa las bibliotecas para medir tiempos, compartir las métricas entre procesos y leer la configuración.
+import bisect
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import weakref
+
+from decouple import config
+from flask import g, has_request_context, request
+
+# Límites superiores (en segundos) de los intervalos de los histogramas de duración: de 0,5 ms a unos 16 s,
+# duplicándose en cada intervalo. El último intervalo (+Inf) cuenta todo lo que queda por encima.
+BUCKETS = tuple(0.0005 * 2**index for index in range(16))
+
+# Descripción y tipo de cada métrica, en el orden en que se exponen.
+METRICS = {
+    "api_requests_total": ("counter", "Solicitudes atendidas por ruta, método y código de estado."),
+    "api_request_duration_seconds": ("histogram", "Duración de las solicitudes hasta enviar las cabeceras."),
+    "api_serialization_duration_seconds": ("histogram", "Tiempo de conversión de las respuestas a JSON."),
+    "api_db_connect_duration_seconds": ("histogram", "Tiempo de espera para obtener una conexión del pool."),
+    "api_db_query_duration_seconds": ("histogram", "Duración de las operaciones del modelo, incluida la espera de conexión."),
+    "api_db_rows_total": ("counter", "Filas leídas o escritas por operación del modelo."),
+    "api_db_errors_total": ("counter", "Operaciones del modelo que terminaron con error, por tipo de error."),
+    "api_db_pool_connections": ("gauge", "Conexiones del pool por estado, sumadas entre procesos."),
+    "api_db_pool_timeouts_total": ("counter", "Solicitudes de conexión que agotaron la espera del pool."),
+    "api_db_reads_total": ("counter", "Conexiones de lectura prestadas por destino (réplica o primario)."),
+    "api_db_replica_lag_bytes": ("gauge", "Retraso de cada réplica respecto del primario, en bytes de WAL (máximo entre procesos)."),
+    "api_db_slow_queries_total": ("counter", "Consultas que superaron SLOW_QUERY_THRESHOLD_MS."),
+    "api_db_write_batches_total": ("counter", "Lotes ejecutados por el agrupamiento de escrituras."),
+    "api_db_write_batch_ops_total": ("counter", "Escrituras incluidas en los lotes del agrupamiento de escrituras."),
+    "api_db_write_batch_errors_total": ("counter", "Escrituras de un lote que fallaron y se deshicieron solas."),
+    "api_db_write_batch_retries_total": ("counter", "Escrituras de un lote abortadas por interbloqueo y repetidas solas."),
+    "api_mirror_users": ("gauge", "Usuarios en la copia en memoria de la tabla (USERS_MIRROR), máximo entre procesos."),
+    "api_mirror_staleness_seconds": ("gauge", "Segundos desde que se confirmó al día la copia en memoria, máximo entre procesos."),
+    "api_mirror_reads_total": ("counter", "Lecturas del modelo atendidas desde la copia en memoria, por operación."),
+    "api_mirror_changes_total": ("counter", "Usuarios actualizados en la copia en memoria por avisos de cambios."),
+    "api_mirror_loads_total": ("counter", "Cargas completas de la tabla en la copia en memoria."),
+    "api_mirror_errors_total": ("counter", "Conexiones del hilo de la copia en memoria que terminaron con error."),
+    "api_admission_active": ("gauge", "Solicitudes en curso por método y ruta con límite de concurrencia."),
+    "api_admission_queue_depth": ("gauge", "Solicitudes que esperan un lugar por método y ruta."),
+    "api_admission_wait_seconds": ("histogram", "Espera en la cola del control de admisión."),
+    "api_admission_shed_total": ("counter", "Solicitudes rechazadas con 503 por método, ruta y motivo."),
+}
+# Gauges que describen una copia del mismo estado en cada proceso (la tabla en memoria, el retraso medido de una
+# réplica): sumarlos entre procesos no tiene sentido, así que se expone el máximo.
+MAX_GAUGES = {"api_db_replica_lag_bytes", "api_mirror_users", "api_mirror_staleness_seconds"}
+# Percentiles que se estiman a partir de los histogramas de duración.
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _Shard:
+    """
+    Métricas registradas por un solo hilo. Solo ese hilo las modifica, así que registrar una medición no
+    necesita candados; el hilo que las expone las lee y las suma.
+    """
+
+    __slots__ = ("thread", "counters", "histograms")
+
+    def __init__(self, thread):
+        self.thread = weakref.ref(thread)
+        self.counters = {}
+        # Cada histograma es una lista con los conteos de cada intervalo (más +Inf), la suma y el conteo total.
+        self.histograms = {}
+
+
+# Define una clase Metrics que registra métricas de latencia, errores y filas y las expone en formato Prometheus.
+class Metrics:
+    # Directorio compartido por los procesos trabajadores donde cada uno escribe su instantánea de métricas.
+    # Si no se configura, cada proceso expone solo sus propias métricas.
+    DIRECTORY = config("METRICS_DIR", default="")
+    # Segundos entre escrituras de la instantánea de cada proceso.
+    FLUSH_INTERVAL = config("METRICS_FLUSH_INTERVAL", default=5.0, cast=float)
+    # Cada cuántos hilos nuevos se acumulan las métricas de los hilos terminados, para no conservar un fragmento
+    # por cada hilo de solicitud.
+    FOLD_EVERY = 256
+
+    _local = threading.local()
+    _lock = threading.Lock()
+    _shards = []
+    _retired = _Shard(threading.current_thread())
+    _registered = 0
+    _flusher = None
+
+    # Define un método de clase que descarta las métricas heredadas del proceso padre después de un fork, para que
+    # cada trabajador solo cuente sus propias solicitudes.
+    @classmethod
+    def _reset(self):
+        Metrics._local = threading.local()
+        Metrics._lock = threading.Lock()
+        Metrics._shards = []
+        Metrics._retired = _Shard(threading.current_thread())
+        Metrics._registered = 0
+        Metrics._flusher = None
+
+    # Define un método de clase que retorna el fragmento del hilo actual, creándolo la primera vez.
+    @classmethod
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+                Metrics._registered += 1
+                if self._registered % self.FOLD_EVERY == 0:
+                    self._fold()
+            if self.DIRECTORY and self._flusher is None:
+                self._start_flusher()
+        return shard
+
+    # Define un método de clase que suma en el fragmento de retirados los fragmentos de los hilos terminados.
+    # Debe llamarse con el candado tomado.
+    @classmethod
+    def _fold(self):
+        alive = []
+        for shard in self._shards:
+            thread = shard.thread()
+            if thread is not None and thread.is_alive():
+                alive.append(shard)
+            else:
+                self._merge(self._retired.counters, self._retired.histograms, shard.counters, shard.histograms)
+        Metrics._shards = alive
+
+    @staticmethod
+    def _merge(counters, histograms, other_counters, other_histograms):
+        for key, value in list(other_counters.items()):
+            counters[key] = counters.get(key, 0) + value
+        for key, values in list(other_histograms.items()):
+            target = histograms.get(key)
+            if target is None:
+                histograms[key] = list(values)
+            else:
+                for index, value in enumerate(values):
+                    target[index] += value
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    # Define un método de clase que incrementa un contador.
+    @classmethod
+    def inc(self, name, value=1, **labels):
+        counters = self._shard().counters
+        key = self._key(name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    # Define un método de clase que registra una duración (en segundos) en un histograma.
+    @classmethod
+    def observe(self, name, seconds, **labels):
+        histograms = self._shard().histograms
+        key = self._key(name, labels)
+        values = histograms.get(key)
+        if values is None:
+            values = histograms[key] = [0] * (len(BUCKETS) + 3)
+        values[bisect.bisect_left(BUCKETS, seconds)] += 1
+        values[-2] += seconds
+        values[-1] += 1
+
+    # Define un método de clase que retorna la ruta de la solicitud actual para usarla como etiqueta. Se usa la
+    # regla de la ruta (por ejemplo "/usuarios/<id>") y no la URL, para no crear una serie por cada id.
+    @classmethod
+    def route(self):
+        if not has_request_context():
+            return ""
+        rule = request.url_rule
+        return rule.rule if rule is not None else "<sin ruta>"
+
+    # Define un método de clase que retorna un decorador para las operaciones del modelo: mide su duración,
+    # cuenta las filas del resultado y los errores por tipo.
+    @classmethod
+    def instrument(self, operation):
+        def decorator(function):
+            if inspect.isgeneratorfunction(function):
+                # Los generadores (como stream()) se miden desde el primer lote hasta que se agotan o se cierran,
+                # y cuentan las filas de todos los lotes.
+                @functools.wraps(function)
+                def generator(*args, **kwargs):
+                    started = time.perf_counter()
+                    rows = 0
+                    batches = function(*args, **kwargs)
+                    try:
+                        for batch in batches:
+                            rows += len(batch)
+                            yield batch
+                    except Exception as ex:
+                        self.inc("api_db_errors_total", operation=operation, error=self._error(ex))
+                        raise
+                    finally:
+                        # Cierra el generador original para que devuelva su conexión aunque el consumidor no lo agote.
+                        batches.close()
+                        self.observe("api_db_query_duration_seconds", time.perf_counter() - started, operation=operation)
+                        self.inc("api_db_rows_total", rows, operation=operation)
+
+                return generator
+
+            if inspect.iscoroutinefunction(function):
+                # Las corrutinas (como las de AsyncUserModel) se miden hasta que terminan, no hasta que se crean.
+                @functools.wraps(function)
+                async def coroutine(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        result = await function(*args, **kwargs)
+                    except Exception as ex:
+                        self.observe("api_db_query_duration_seconds", time.perf_counter() - started, operation=operation)
+                        self.inc("api_db_errors_total", operation=operation, error=self._error(ex))
+                        raise
+                    self.observe("api_db_query_duration_seconds", time.perf_counter() - started, operation=operation)
+                    self.inc("api_db_rows_total", self._rows(result), operation=operation)
+                    return result
+
+                return coroutine
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = function(*args, **kwargs)
+                except Exception as ex:
+                    self.observe("api_db_query_duration_seconds", time.perf_counter() - started, operation=operation)
+                    self.inc("api_db_errors_total", operation=operation, error=self._error(ex))
+                    raise
+                self.observe("api_db_query_duration_seconds", time.perf_counter() - started, operation=operation)
+                self.inc("api_db_rows_total", self._rows(result), operation=operation)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    # Define un método estático que retorna el nombre del tipo de error. Los modelos envuelven los errores de la
+    # base de datos en Exception(ex), así que se informa el tipo del error original.
+    @staticmethod
+    def _error(ex):
+        if type(ex) is Exception and ex.args and isinstance(ex.args[0], BaseException):
+            ex = ex.args[0]
+        return type(ex).__name__
+
+    # Define un método estático que estima cuántas filas representa el resultado de una operación del modelo.
+    @staticmethod
+    def _rows(result):
+        if result is None:
+            return 0
+        if isinstance(result, bool):
+            return int(result)
+        if isinstance(result, int):
+            return result
+        if isinstance(result, tuple) and result and isinstance(result[0], list):
+            # Resultado de page(): (usuarios, clave siguiente).
+            return len(result[0])
+        if isinstance(result, list) or isinstance(result, tuple) and result and isinstance(result[0], tuple):
+            return len(result)
+        return 1
+
+    # Define un método de clase que registra la medición de las solicitudes en la aplicación (middleware).
+    @classmethod
+    def init_app(self, app):
+        @app.before_request
+        def start_timer():
+            g.metrics_started = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            started = g.pop("metrics_started", None)
+            if started is not None:
+                route = self.route()
+                self.observe(
+                    "api_request_duration_seconds", time.perf_counter() - started, route=route, method=request.method
+                )
+                self.inc("api_requests_total", route=route, method=request.method, status=str(response.status_code))
+            return response
+
+    # Define un método de clase que retorna la instantánea de las métricas de este proceso.
+    @classmethod
+    def snapshot(self):
+        counters, histograms = {}, {}
+        with self._lock:
+            self._fold()
+            for shard in [self._retired] + self._shards:
+                self._merge(counters, histograms, shard.counters, shard.histograms)
+
+        # Las estadísticas del pool se leen al momento; los gauges solo se suman entre procesos vivos.
+        from database.aio import async_pool_stats
+        from database.db import get_pool
+        from database.replicas import status
+        from models import UserMirror
+        from utils.Admission import Admission
+
+        stats = get_pool().stats()
+        gauges = {
+            self._key("api_db_pool_connections", {"state": "in_use"}): stats["in_use"],
+            self._key("api_db_pool_connections", {"state": "idle"}): stats["idle"],
+        }
+        counters[self._key("api_db_pool_timeouts_total", {})] = stats["timeouts"]
+        # En el modo ASGI, el pool asíncrono se expone en las mismas métricas con la etiqueta pool="async".
+        stats = async_pool_stats()
+        if stats is not None:
+            gauges[self._key("api_db_pool_connections", {"state": "in_use", "pool": "async"})] = stats["in_use"]
+            gauges[self._key("api_db_pool_connections", {"state": "idle", "pool": "async"})] = stats["idle"]
+            counters[self._key("api_db_pool_timeouts_total", {"pool": "async"})] = stats["timeouts"]
+        for (method, route), state in Admission.status().items():
+            gauges[self._key("api_admission_active", {"route": route, "method": method})] = state["active"]
+            gauges[self._key("api_admission_queue_depth", {"route": route, "method": method})] = state["queued"]
+        mirror = UserMirror.status()
+        if mirror is not None:
+            gauges[self._key("api_mirror_users", {})] = mirror["users"]
+            if mirror["staleness_seconds"] is not None:
+                gauges[self._key("api_mirror_staleness_seconds", {})] = mirror["staleness_seconds"]
+        for replica in status():
+            if replica["lag_bytes"] is not None:
+                gauges[self._key("api_db_replica_lag_bytes", {"replica": replica["name"]})] = replica["lag_bytes"]
+        return {"pid": os.getpid(), "counters": counters, "histograms": histograms, "gauges": gauges}
+
+    # Define un método de clase que escribe la instantánea de este proceso en el directorio compartido. Se escribe
+    # en un archivo temporal y se renombra, para que nunca se lea a medias.
+    @classmethod
+    def flush(self):
+        if not self.DIRECTORY:
+            return
+        data = self.snapshot()
+        serializable = {"pid": data["pid"]}
+        for kind in ("counters", "histograms", "gauges"):
+            serializable[kind] = [[name, labels, value] for (name, labels), value in data[kind].items()]
+        path = os.path.join(self.DIRECTORY, "metrics-%d.json" % data["pid"])
+        with open(path + ".tmp", "w") as file:
+            json.dump(serializable, file)
+        os.replace(path + ".tmp", path)
+
+    # Define un método de clase que arranca el hilo que escribe la instantánea periódicamente.
+    @classmethod
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            os.makedirs(self.DIRECTORY, exist_ok=True)
+
+            def run():
+                while True:
+                    time.sleep(self.FLUSH_INTERVAL)
+                    try:
+                        self.flush()
+                    except Exception:
+                        pass
+
+            Metrics._flusher = threading.Thread(target=run, name="metrics-flush", daemon=True)
+            Metrics._flusher.start()
+
+    # Define un método de clase que borra las instantáneas de un arranque anterior. Lo llama el proceso maestro
+    # al arrancar en frío (no en una recarga, para que los contadores no retrocedan).
+    @classmethod
+    def clear_directory(self):
+        if not self.DIRECTORY or not os.path.isdir(self.DIRECTORY):
+            return
+        for name in os.listdir(self.DIRECTORY):
+            if name.startswith("metrics-") and name.endswith((".json", ".tmp")):
+                os.remove(os.path.join(self.DIRECTORY, name))
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    # Define un método de clase que suma las instantáneas de todos los procesos. Los contadores e histogramas de
+    # los trabajadores que ya terminaron se conservan para que los totales no retrocedan.
+    @classmethod
+    def collect(self):
+        if not self.DIRECTORY:
+            return self.snapshot()
+
+        self.flush()
+        counters, histograms, gauges = {}, {}, {}
+        for name in os.listdir(self.DIRECTORY):
+            if not (name.startswith("metrics-") and name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.DIRECTORY, name)) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                continue
+            alive = self._alive(data["pid"])
+            for kind, target in (("counters", counters), ("histograms", histograms), ("gauges", gauges)):
+                if kind == "gauges" and not alive:
+                    continue
+                for metric, labels, value in data[kind]:
+                    key = (metric, tuple(tuple(label) for label in labels))
+                    if metric in MAX_GAUGES:
+                        target[key] = max(target.get(key, value), value)
+                    elif kind != "histograms":
+                        target[key] = target.get(key, 0) + value
+                    elif key in target:
+                        target[key] = [total + count for total, count in zip(target[key], value)]
+                    else:
+                        target[key] = value
+        return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+    # Define un método estático que estima un percentil a partir de los intervalos de un histograma, con
+    # interpolación lineal dentro del intervalo (igual que histogram_quantile() de Prometheus).
+    @staticmethod
+    def quantile(q, values):
+        total = values[-1]
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(values[: len(BUCKETS) + 1]):
+            if seen + count >= rank and count > 0:
+                if index == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                return lower + (BUCKETS[index] - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-1]
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (
+            '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for name, value in pairs
+        )
+        return "{" + ",".join(escaped) + "}"
+
+    # Define un método de clase que retorna todas las métricas en el formato de texto de Prometheus. Por cada
+    # histograma de duración se expone también el gauge <nombre>_quantile con los percentiles 50, 95 y 99.
+    @classmethod
+    def render(self):
+        data = self.collect()
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            source = data["histograms" if kind == "histogram" else "gauges" if kind == "gauge" else "counters"]
+            series = sorted((labels, value) for (metric, labels), value in source.items() if metric == name)
+            lines.append("# HELP %s %s" % (name, description))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for labels, value in series:
+                if kind != "histogram":
+                    lines.append("%s%s %s" % (name, self._labels(labels), repr(float(value))))
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), value):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append("%s_bucket%s %d" % (name, self._labels(labels, (("le", le),)), cumulative))
+                lines.append("%s_sum%s %s" % (name, self._labels(labels), repr(float(value[-2]))))
+                lines.append("%s_count%s %d" % (name, self._labels(labels), value[-1]))
+            if kind == "histogram":
+                lines.append("# HELP %s_quantile Percentiles estimados de %s." % (name, name))
+                lines.append("# TYPE %s_quantile gauge" % name)
+                for labels, value in series:
+                    for q in QUANTILES:
+                        estimate = self.quantile(q, value)
+                        if estimate is not None:
+                            lines.append(
+                                "%s_quantile%s %s" % (name, self._labels(labels, (("quantile", str(q)),)), repr(estimate))
+                            )
+        return "\n".join(lines) + "\n"
+
+
+# Descarta en el proceso hijo las métricas heredadas del padre al bifurcar (fork).
+os.register_at_fork(after_in_child=Metrics._reset)
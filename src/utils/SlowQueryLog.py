@@ -0,0 +1,203 @@
+# Importa las bibliotecas para medir tiempos, ejecutar los EXPLAIN en segundo plano y leer la configuración.
+import collections
+import datetime
+import itertools
+import json
+import os
+import queue
+import random
+import threading
+
+from decouple import config
+from psycopg2.extensions import cursor as BaseCursor
+
+from utils.Metrics import Metrics
+
+# Sentencias que pueden analizarse con EXPLAIN. Solo las consultas SELECT se ejecutan con ANALYZE; en las
+# escrituras ANALYZE ejecutaría la escritura (y sus triggers), así que se muestra solo el plan estimado.
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+# Define una clase SlowQueryLog que registra las consultas lentas con sus parámetros, su duración y su plan.
+class SlowQueryLog:
+    # Segundos a partir de los cuales una consulta se considera lenta; 0 desactiva el registro.
+    THRESHOLD = config("SLOW_QUERY_THRESHOLD_MS", default=500.0, cast=float) / 1000
+    # Número máximo de consultas lentas que se conservan por proceso; las más antiguas se descartan.
+    CAPACITY = config("SLOW_QUERY_LOG_SIZE", default=100, cast=int)
+    # Fracción de las consultas lentas cuyo plan se obtiene con EXPLAIN (ANALYZE, BUFFERS).
+    EXPLAIN_SAMPLE = config("SLOW_QUERY_EXPLAIN_SAMPLE", default=0.1, cast=float)
+    # Segundos máximos de ejecución de cada EXPLAIN, para que un plan no cargue la base de datos más que la
+    # consulta original.
+    EXPLAIN_TIMEOUT = config("SLOW_QUERY_EXPLAIN_TIMEOUT", default=10.0, cast=float)
+    # EXPLAIN pendientes como máximo; con la cola llena la consulta se registra sin plan.
+    EXPLAIN_QUEUE = 8
+
+    _lock = threading.Lock()
+    _save_lock = threading.Lock()
+    _entries = collections.deque(maxlen=CAPACITY)
+    _ids = itertools.count(1)
+    # Indica que hay consultas registradas o planes obtenidos que aún no se escriben en el directorio compartido.
+    _dirty = False
+    _queue = None
+    _worker = None
+
+    # Define un método de clase que descarta las consultas y el hilo heredados del proceso padre tras un fork.
+    @classmethod
+    def _reset(self):
+        SlowQueryLog._lock = threading.Lock()
+        SlowQueryLog._save_lock = threading.Lock()
+        SlowQueryLog._entries = collections.deque(maxlen=self.CAPACITY)
+        SlowQueryLog._ids = itertools.count(1)
+        SlowQueryLog._dirty = False
+        SlowQueryLog._queue = None
+        SlowQueryLog._worker = None
+
+    # Define un método estático que convierte los parámetros de una consulta en valores que pueden escribirse como
+    # JSON (las fechas y los UUID como texto).
+    @staticmethod
+    def _params(params):
+        if isinstance(params, dict):
+            return {str(key): SlowQueryLog._params(value) for key, value in params.items()}
+        if isinstance(params, (list, tuple)):
+            return [SlowQueryLog._params(value) for value in params]
+        if params is None or isinstance(params, (str, int, float, bool)):
+            return params
+        return str(params)
+
+    # Define un método de clase que registra una consulta que superó el umbral. Se llama en el hilo de la
+    # solicitud, así que solo guarda los datos en memoria; el EXPLAIN de una muestra de ellas y la escritura del
+    # archivo compartido se hacen en un hilo aparte.
+    @classmethod
+    def record(self, statement, params, seconds, error=None):
+        entry = {
+            "id": next(self._ids),
+            "pid": os.getpid(),
+            "at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "route": Metrics.route(),
+            "seconds": round(seconds, 6),
+            "statement": statement if isinstance(statement, str) else statement.decode("utf-8", "replace"),
+            "params": self._params(params),
+            "error": error,
+            "plan": None,
+            "explain": "omitido",
+        }
+        keyword = entry["statement"].split(None, 1)[0].upper() if entry["statement"].strip() else ""
+        if keyword in EXPLAINABLE and random.random() < self.EXPLAIN_SAMPLE:
+            try:
+                self._explainer().put_nowait(entry)
+                entry["explain"] = "pendiente"
+            except queue.Full:
+                pass
+        elif Metrics.DIRECTORY:
+            self._explainer()
+        with self._lock:
+            self._entries.append(entry)
+            SlowQueryLog._dirty = True
+        Metrics.inc("api_db_slow_queries_total")
+
+    # Define un método de clase que retorna la cola de EXPLAIN pendientes, arrancando la primera vez el hilo que
+    # los ejecuta. Con METRICS_DIR el mismo hilo escribe el archivo compartido cada METRICS_FLUSH_INTERVAL segundos
+    # si hay cambios.
+    @classmethod
+    def _explainer(self):
+        with self._lock:
+            if self._worker is None:
+                SlowQueryLog._queue = queue.Queue(self.EXPLAIN_QUEUE)
+
+                def run():
+                    timeout = Metrics.FLUSH_INTERVAL if Metrics.DIRECTORY else None
+                    while True:
+                        try:
+                            entry = self._queue.get(timeout=timeout)
+                        except queue.Empty:
+                            entry = None
+                        if entry is not None:
+                            self.explain(entry)
+                            with self._lock:
+                                SlowQueryLog._dirty = True
+                        self.flush()
+
+                SlowQueryLog._worker = threading.Thread(target=run, name="slow-query-explain", daemon=True)
+                SlowQueryLog._worker.start()
+            return self._queue
+
+    # Define un método de clase que obtiene el plan de una consulta lenta y lo guarda en su registro. La consulta
+    # se ejecuta en una transacción de solo lectura que luego se deshace, con un tiempo máximo.
+    @classmethod
+    def explain(self, entry):
+        # Se importa aquí porque database.db usa este módulo para medir las consultas.
+        from database.db import get_connection
+
+        analyze = entry["statement"].lstrip().upper().startswith("SELECT")
+        options = "ANALYZE, BUFFERS" if analyze else "COSTS"
+        try:
+            with get_connection() as connection:
+                # Un cursor básico, para que el propio EXPLAIN no se mida ni se registre como consulta lenta.
+                with connection.cursor(cursor_factory=BaseCursor) as cursor:
+                    cursor.execute("SET TRANSACTION READ ONLY")
+                    cursor.execute("SET LOCAL statement_timeout = %s", (int(self.EXPLAIN_TIMEOUT * 1000),))
+                    cursor.execute("EXPLAIN (" + options + ") " + entry["statement"], entry["params"] or None)
+                    plan = "\n".join(row[0] for row in cursor.fetchall())
+                connection.rollback()
+            entry["plan"], entry["explain"] = plan, "analyze" if analyze else "estimado"
+        except Exception as ex:
+            entry["plan"], entry["explain"] = str(ex).strip(), "error"
+
+    # Define un método de clase que escribe las consultas lentas de este proceso en el directorio compartido de
+    # las métricas, si cambiaron desde la última escritura, para que la ruta de administración muestre las de
+    # todos los trabajadores.
+    @classmethod
+    def flush(self):
+        if not Metrics.DIRECTORY:
+            return
+        # El hilo de los EXPLAIN y la ruta de administración escriben el mismo archivo; se escribe de a uno.
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = list(self._entries)
+                SlowQueryLog._dirty = False
+            try:
+                os.makedirs(Metrics.DIRECTORY, exist_ok=True)
+                path = os.path.join(Metrics.DIRECTORY, "slow-queries-%d.json" % os.getpid())
+                with open(path + ".tmp", "w") as file:
+                    json.dump(entries, file)
+                os.replace(path + ".tmp", path)
+            except OSError:
+                with self._lock:
+                    SlowQueryLog._dirty = True
+
+    # Define un método de clase que retorna las consultas lentas registradas, de la más reciente a la más
+    # antigua. Con METRICS_DIR incluye las de todos los procesos trabajadores.
+    @classmethod
+    def entries(self, limit=None):
+        if Metrics.DIRECTORY:
+            # Cada proceso guarda sus consultas en un archivo propio; se leen todos, incluido el de este proceso.
+            self.flush()
+            entries = []
+            for name in os.listdir(Metrics.DIRECTORY):
+                if not (name.startswith("slow-queries-") and name.endswith(".json")):
+                    continue
+                try:
+                    with open(os.path.join(Metrics.DIRECTORY, name)) as file:
+                        entries.extend(json.load(file))
+                except (OSError, ValueError):
+                    continue
+        else:
+            with self._lock:
+                entries = list(self._entries)
+        entries.sort(key=lambda entry: (entry["at"], entry["pid"], entry["id"]), reverse=True)
+        return entries[: limit or self.CAPACITY]
+
+    # Define un método de clase que borra los registros de un arranque anterior del directorio compartido.
+    @classmethod
+    def clear_directory(self):
+        if not Metrics.DIRECTORY or not os.path.isdir(Metrics.DIRECTORY):
+            return
+        for name in os.listdir(Metrics.DIRECTORY):
+            if name.startswith("slow-queries-") and name.endswith((".json", ".tmp")):
+                os.remove(os.path.join(Metrics.DIRECTORY, name))
+
+
+# Descarta en el proceso hijo las consultas lentas heredadas del padre al bifurcar (fork).
+os.register_at_fork(after_in_child=SlowQueryLog._reset)
@@ -0,0 +1,46 @@
+# Importa el módulo datetime para validar las fechas de nacimiento.
+import datetime
+
+
+# Define una clase UserValidator que valida los datos de un usuario recibidos en una solicitud.
+class UserValidator:
+    # Campos de un usuario (sin el id) y longitud máxima de cada uno según la tabla 'users'.
+    FIELDS = {
+        "cedula_identidad": 20,
+        "nombre": 100,
+        "primer_apellido": 100,
+        "segundo_apellido": 100,
+        "fecha_nacimiento": None,
+    }
+
+    # Define un método de clase que valida un diccionario con los datos de un usuario.
+    # Retorna una tupla con los valores en el orden de FIELDS o lanza ValueError con el motivo del rechazo.
+    @classmethod
+    def validate(self, data):
+        if not isinstance(data, dict):
+            raise ValueError("Se esperaba un objeto con los datos del usuario")
+
+        values = []
+        for field, max_length in self.FIELDS.items():
+            if field not in data:
+                raise ValueError("Falta el campo %s" % field)
+            values.append(self.validate_field(field, data[field]))
+        return tuple(values)
+
+    # Define un método de clase que valida el valor de un único campo y lo retorna normalizado.
+    @classmethod
+    def validate_field(self, field, value):
+        if field not in self.FIELDS:
+            raise ValueError("Campo desconocido %s" % field)
+        if not isinstance(value, str):
+            raise ValueError("El campo %s debe ser una cadena" % field)
+
+        if field == "fecha_nacimiento":
+            # La fecha debe venir en formato "YYYY-MM-DD", igual que en POST /usuarios.
+            try:
+                datetime.date.fromisoformat(value)
+            except ValueError:
+                raise ValueError("El campo fecha_nacimiento debe tener el formato YYYY-MM-DD")
+        elif len(value) > self.FIELDS[field]:
+            raise ValueError("El campo %s supera los %d caracteres" % (field, self.FIELDS[field]))
+        return value
@@ -0,0 +1,7 @@
+# Expone la aplicación para servidores WSGI externos (por ejemplo, `gunicorn --preload wsgi:app`).
+# El entorno se elige con la variable APP_ENV (por defecto "production").
+from decouple import config as env
+
+from app import create_app
+
+app = create_app(env("APP_ENV", default="production"))